@@ -0,0 +1,5 @@
+"""
+Performance benchmarks for the pull request tooling.
+
+Run ``python -m jenkins.benchmarks.run --help`` for the options.
+"""
@@ -0,0 +1,188 @@
+"""
+Benchmark the full pull request flow for many repositories against a FakeGitHub server.
+
+    python -m jenkins.benchmarks.end_to_end --repos 50 --workers 8 --latency 0.05
+
+Each repository is a real local git checkout whose requirements file has
+upgrades to commit, so the run goes through change detection, the commit,
+branch and pull request creation and ``verify_upgrade_packages``. The report
+has the throughput, the per-repository latency and the API calls made.
+"""
+import contextlib
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+import click
+
+from ..github_helpers import GitHubHelper
+from ..pull_request_fleet import run_fleet
+from ..rate_limit import MIN_WRITE_INTERVAL
+from .fake_github import FakeGitHub
+
+AUTOMERGE_VARIABLE = 'AUTOMERGE_PYTHON_DEPENDENCIES_UPGRADES_PR'
+
+
+@contextlib.contextmanager
+def environment(**variables):
+    """
+    Set environment variables for the duration of the block.
+    """
+    saved = {name: os.environ.get(name) for name in variables}
+    os.environ.update(variables)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _git(repo_root, *args):
+    return subprocess.run(
+        ['git', '-c', 'user.name=Benchmark', '-c', 'user.email=benchmark@example.com', *args],
+        cwd=repo_root, check=True, capture_output=True, text=True,
+    ).stdout.strip()
+
+
+def make_checkout(repo_root, full_name, requirement_count, rng):
+    """
+    Create a git checkout of ``full_name`` with upgraded, uncommitted requirements.
+
+    Returns the SHA of its HEAD commit and the committed files.
+    """
+    versions = {
+        'package-{}'.format(index): (rng.randint(1, 9), rng.randint(0, 30)) for index in range(requirement_count)
+    }
+    files = {'requirements/base.txt': ''.join(
+        '{}=={}.{}.0\n    # via -r requirements/base.in\n'.format(name, major, minor)
+        for name, (major, minor) in sorted(versions.items())
+    )}
+    os.makedirs(os.path.join(repo_root, 'requirements'))
+    for path, content in files.items():
+        with open(os.path.join(repo_root, path), 'w', encoding='utf-8') as output:
+            output.write(content)
+    _git(repo_root, 'init', '-q')
+    _git(repo_root, 'add', '.')
+    _git(repo_root, 'commit', '-q', '-m', 'Initial commit')
+    _git(repo_root, 'remote', 'add', 'origin', 'https://github.com/{}.git'.format(full_name))
+
+    # Upgrade every tenth requirement within its major version.
+    with open(os.path.join(repo_root, 'requirements/base.txt'), 'w', encoding='utf-8') as output:
+        for index, (name, (major, minor)) in enumerate(sorted(versions.items())):
+            minor += 1 if index % 10 == 0 else 0
+            output.write('{}=={}.{}.0\n    # via -r requirements/base.in\n'.format(name, major, minor))
+    return _git(repo_root, 'rev-parse', 'HEAD'), files
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_end_to_end(repos=10, requirements=200, workers=8, latency=0.0, failure_rate=0.0, rate_limit=5000,
+                   rate_limit_window=3600, search_rate_limit=30, search_rate_limit_window=60,
+                   write_interval=MIN_WRITE_INTERVAL, seed=0):
+    """
+    Create a pull request for each of ``repos`` fake repositories and return the report.
+
+    The rate limits and write interval default to GitHub's, so that the throughput is the one production would see.
+    """
+    rng = random.Random(seed)
+    work_dir = tempfile.mkdtemp()
+    fake = FakeGitHub(latency=latency, failure_rate=failure_rate, rate_limit=rate_limit,
+                      rate_limit_window=rate_limit_window, search_rate_limit=search_rate_limit,
+                      search_rate_limit_window=search_rate_limit_window, seed=seed)
+    try:
+        with fake, environment(GITHUB_API_URL=fake.url, GITHUB_GRAPHQL_URL=fake.url + '/graphql',
+                               GITHUB_TOKEN='fake-token', GITHUB_USER_EMAIL='benchmark@example.com'):
+            jobs = []
+            for index in range(repos):
+                full_name = 'benchmark/repo-{}'.format(index)
+                repo_root = os.path.join(work_dir, 'repo-{}'.format(index))
+                head_sha, files = make_checkout(repo_root, full_name, requirements, rng)
+                fake.add_repository(full_name, files, commit_sha=head_sha, variables={AUTOMERGE_VARIABLE: 'True'})
+                jobs.append({
+                    'repo_root': repo_root,
+                    'branch_name': 'upgrade-python-requirements',
+                    'commit_message': 'chore: Updating Python Requirements',
+                    'pr_title': 'Python Requirements Update',
+                    'pr_body': 'Python requirements update.',
+                })
+
+            helper = GitHubHelper()
+            helper.rate_limiter.min_write_interval = write_interval
+            start = time.perf_counter()
+            results = run_fleet(jobs, github_helper=helper, max_workers=workers)
+            wall_seconds = time.perf_counter() - start
+            request_counts = fake.stats()
+            # Pull requests labelled by verify_upgrade_packages, which runs last.
+            labelled = sum(
+                bool(pull['labels']) for repository in fake.repositories.values() for pull in repository.pulls.values()
+            )
+    finally:
+        shutil.rmtree(work_dir)
+
+    durations = [result.duration for result in results]
+    total_requests = sum(request_counts.values())
+    return {
+        'parameters': {
+            'repos': repos, 'requirements': requirements, 'workers': workers, 'latency': latency,
+            'failure_rate': failure_rate, 'rate_limit': rate_limit, 'rate_limit_window': rate_limit_window,
+            'search_rate_limit': search_rate_limit, 'search_rate_limit_window': search_rate_limit_window,
+            'write_interval': write_interval, 'seed': seed,
+        },
+        'created': sum(result.status == 'created' for result in results),
+        'failed': sum(result.status == 'failed' for result in results),
+        'labelled': labelled,
+        'wall_seconds': wall_seconds,
+        'repos_per_second': repos / wall_seconds if wall_seconds else None,
+        'latency_seconds': {
+            'median': statistics.median(durations),
+            'p95': percentile(durations, 0.95),
+            'max': max(durations),
+        },
+        'requests': total_requests,
+        'requests_per_repo': total_requests / repos,
+        'request_counts': request_counts,
+        'errors': sorted({result.error for result in results if result.error}),
+    }
+
+
+@click.command()
+@click.option('--output', type=click.Path(dir_okay=False, file_okay=True, writable=True), default=None,
+              help="If set, write the report to this file as JSON")
+@click.option('--repos', type=int, default=10, help="Number of repositories to create pull requests for")
+@click.option('--requirements', type=int, default=200, help="Number of pinned requirements in each repository")
+@click.option('--workers', type=int, default=8, help="Number of repositories processed concurrently")
+@click.option('--latency', type=float, default=0.0, help="Seconds the fake server waits before each response")
+@click.option('--failure-rate', type=float, default=0.0, help="Share of requests the fake server fails with a 502")
+@click.option('--rate-limit', type=int, default=5000, help="Core and GraphQL requests allowed per rate limit window")
+@click.option('--rate-limit-window', type=int, default=3600, help="Length of the rate limit window in seconds")
+@click.option('--search-rate-limit', type=int, default=30, help="Search requests allowed per search window")
+@click.option('--search-rate-limit-window', type=int, default=60, help="Length of the search window in seconds")
+@click.option('--write-interval', type=float, default=MIN_WRITE_INTERVAL,
+              help="Minimum seconds between content-creating requests; GitHub asks for 1")
+def main(output, **parameters):
+    """
+    Run the end to end benchmark and print the report.
+    """
+    # The helpers log every step for every repository, which would drown out the report.
+    logging.getLogger().setLevel(logging.WARNING)
+    report = run_end_to_end(**parameters)
+    if output:
+        with open(output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, indent=2)
+    click.echo(json.dumps({key: value for key, value in report.items() if key != 'request_counts'}, indent=2))
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,632 @@
+"""
+An in-process stand-in for the parts of the GitHub API that the pull request tools use.
+
+FakeGitHub serves repositories, refs, blobs, trees, commits, pull requests,
+review requests, comments, labels, pull request diffs, actions variables and
+issue search from memory, so that the whole ``PullRequestCreator.create`` flow
+can run offline. Point ``GitHubHelper`` at it with the GITHUB_API_URL and
+GITHUB_GRAPHQL_URL environment variables.
+
+Every response carries rate limit headers, and the server can add latency,
+enforce a rate limit and fail requests on purpose.
+"""
+# pylint: disable=missing-class-docstring,missing-function-docstring
+import base64
+import difflib
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+REPO = r'/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)'
+# Comment IDs are ``number * COMMENT_IDS_PER_PULL + position``, so that they are unique in a repository.
+COMMENT_IDS_PER_PULL = 1000
+
+
+def git_blob_sha(content):
+    return hashlib.sha1(b'blob %d\0' % len(content) + content).hexdigest()
+
+
+def _object_sha(kind, value):
+    return hashlib.sha1('{} {}'.format(kind, json.dumps(value, sort_keys=True)).encode('utf-8')).hexdigest()
+
+
+class FakeGitHubError(Exception):
+    """
+    An error response for the request being handled.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class FakeRepositoryState:
+    """
+    Everything stored for one repository.
+
+    Trees are kept flat, as a map from each file path to its ``(mode, blob sha)``.
+    """
+
+    def __init__(self, full_name, node_id):
+        self.full_name = full_name
+        self.node_id = node_id
+        self.default_branch = 'master'
+        self.blobs = {}
+        self.trees = {}
+        self.commits = {}
+        self.refs = {}
+        self.pulls = {}
+        self.variables = {}
+        self.numbers = itertools.count(1)
+
+    def add_blob(self, content):
+        blob_sha = git_blob_sha(content)
+        self.blobs[blob_sha] = content
+        return blob_sha
+
+    def add_tree(self, entries):
+        tree_sha = _object_sha('tree', entries)
+        self.trees[tree_sha] = entries
+        return tree_sha
+
+    def add_commit(self, tree_sha, parents, message, commit_sha=None):
+        commit_sha = commit_sha or _object_sha('commit', [tree_sha, parents, message, time.time()])
+        self.commits[commit_sha] = {'tree': tree_sha, 'parents': parents, 'message': message}
+        return commit_sha
+
+    def tree_of(self, commit_sha):
+        return self.trees[self.commits[commit_sha]['tree']]
+
+
+class FakeGitHub:
+    """
+    Fake GitHub API server running on a background thread.
+
+    ``latency`` seconds are added to every response. As on GitHub, each rate limit
+    resource has a limit of its own: ``rate_limit`` requests per ``rate_limit_window``
+    seconds for core and GraphQL, and ``search_rate_limit`` per ``search_rate_limit_window``
+    seconds for search. Requests beyond them get the 403 GitHub sends. A ``failure_rate`` share of requests
+    fail with a 502 before doing anything, and inject_failure() schedules failures
+    for particular requests.
+    """
+
+    def __init__(self, latency=0, rate_limit=5000, rate_limit_window=3600, failure_rate=0, user_login='fake-bot',
+                 seed=0, search_rate_limit=30, search_rate_limit_window=60):
+        self.latency = latency
+        self.rate_limits = {
+            'core': (rate_limit, rate_limit_window),
+            'graphql': (rate_limit, rate_limit_window),
+            'search': (search_rate_limit, search_rate_limit_window),
+        }
+        self.failure_rate = failure_rate
+        self.user_login = user_login
+        self.repositories = {}
+        self.request_counts = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._scheduled_failures = []
+        self._rate_limit_used = Counter()
+        self._rate_limit_reset = {}
+        self._server = None
+        self._thread = None
+        self._routes = [
+            ('GET', r'/user', self._get_user),
+            ('POST', r'/graphql', self._graphql),
+            ('GET', r'/search/issues', self._search_issues),
+            ('GET', REPO, self._get_repository),
+            ('GET', REPO + r'/branches/(?P<branch>.+)', self._get_branch),
+            ('POST', REPO + r'/git/blobs', self._create_blob),
+            ('GET', REPO + r'/git/trees/(?P<sha>\w+)', self._get_tree),
+            ('POST', REPO + r'/git/trees', self._create_tree),
+            ('GET', REPO + r'/git/commits/(?P<sha>\w+)', self._get_commit),
+            ('POST', REPO + r'/git/commits', self._create_commit),
+            ('POST', REPO + r'/git/refs', self._create_ref),
+            ('GET', REPO + r'/git/refs/(?P<ref>.+)', self._get_ref),
+            ('PATCH', REPO + r'/git/refs/(?P<ref>.+)', self._update_ref),
+            ('DELETE', REPO + r'/git/refs/(?P<ref>.+)', self._delete_ref),
+            ('GET', REPO + r'/pulls', self._list_pulls),
+            ('POST', REPO + r'/pulls', self._create_pull),
+            ('GET', REPO + r'/pulls/(?P<number>\d+)', self._get_pull),
+            ('PATCH', REPO + r'/pulls/(?P<number>\d+)', self._edit_pull),
+            ('GET', REPO + r'/pulls/(?P<number>\d+)/requested_reviewers', self._get_review_requests),
+            ('POST', REPO + r'/pulls/(?P<number>\d+)/requested_reviewers', self._request_reviews),
+            ('GET', REPO + r'/issues/(?P<number>\d+)/comments', self._list_comments),
+            ('POST', REPO + r'/issues/(?P<number>\d+)/comments', self._create_comment),
+            ('PATCH', REPO + r'/issues/comments/(?P<comment_id>\d+)', self._edit_comment),
+            ('DELETE', REPO + r'/issues/comments/(?P<comment_id>\d+)', self._delete_comment),
+            ('PUT', REPO + r'/issues/(?P<number>\d+)/labels', self._set_labels),
+            ('POST', REPO + r'/issues/(?P<number>\d+)/labels', self._add_labels),
+            ('DELETE', REPO + r'/issues/(?P<number>\d+)/labels/(?P<name>[^/]+)', self._remove_label),
+            ('GET', REPO + r'/actions/variables/(?P<name>[^/]+)', self._get_variable),
+        ]
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self._server.server_port)
+
+    def start(self):
+        """
+        Start serving on a free local port, and return the API root URL.
+        """
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _handle(self):
+                fake.handle(self)
+
+            do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def add_repository(self, full_name, files, commit_sha=None, branch='master', variables=None):
+        """
+        Create a repository whose ``branch`` holds ``files``, a map of paths to contents.
+
+        Pass the SHA of a local commit as ``commit_sha`` to make the fake history
+        match a local checkout. Returns the SHA of the commit.
+        """
+        with self._lock:
+            repository = FakeRepositoryState(full_name, 'R_{}'.format(len(self.repositories) + 1))
+            entries = {}
+            for path, content in files.items():
+                if isinstance(content, str):
+                    content = content.encode('utf-8')
+                entries[path] = ('100644', repository.add_blob(content))
+            commit_sha = repository.add_commit(repository.add_tree(entries), [], 'Initial commit', commit_sha)
+            repository.default_branch = branch
+            repository.refs['heads/{}'.format(branch)] = commit_sha
+            repository.variables.update(variables or {})
+            self.repositories[full_name.lower()] = repository
+            return commit_sha
+
+    def inject_failure(self, method, path_pattern, status=502, count=1):
+        """
+        Fail the next ``count`` requests whose method and path match with ``status``.
+        """
+        with self._lock:
+            self._scheduled_failures.append([method, re.compile(path_pattern), status, count])
+
+    def stats(self):
+        """
+        Return how many requests were served, by method and route.
+        """
+        with self._lock:
+            return dict(self.request_counts)
+
+    # Request handling
+
+    def handle(self, request):
+        """
+        Serve one request made to the server.
+        """
+        parsed = urlparse(request.path)
+        path = unquote(parsed.path)
+        query = parse_qs(parsed.query)
+        length = int(request.headers.get('Content-Length') or 0)
+        body = json.loads(request.rfile.read(length) or b'null') if length else None
+        resource = 'search' if path.startswith('/search/') else 'graphql' if path == '/graphql' else 'core'
+
+        if self.latency:
+            time.sleep(self.latency)
+        status, headers, payload = 200, {}, None
+        with self._lock:
+            rate_headers, limited = self._count_rate_limit(resource)
+            failure = self._take_failure(request.command, path)
+        if limited:
+            status, payload = 403, {'message': 'API rate limit exceeded'}
+        elif failure:
+            status, payload = failure, {'message': 'Injected failure'}
+        else:
+            try:
+                status, headers, payload = self._dispatch(request, path, query, body)
+            except FakeGitHubError as error:
+                status, payload = error.status, {'message': str(error)}
+        headers.update(rate_headers)
+        self._respond(request, status, headers, payload)
+
+    def _count_rate_limit(self, resource):
+        limit, window = self.rate_limits[resource]
+        now = time.time()
+        if now >= self._rate_limit_reset.get(resource, 0):
+            self._rate_limit_used[resource] = 0
+            self._rate_limit_reset[resource] = now + window
+        limited = self._rate_limit_used[resource] >= limit
+        if not limited:
+            self._rate_limit_used[resource] += 1
+        headers = {
+            'X-RateLimit-Limit': str(limit),
+            'X-RateLimit-Remaining': str(limit - self._rate_limit_used[resource]),
+            'X-RateLimit-Reset': str(int(self._rate_limit_reset[resource])),
+            'X-RateLimit-Resource': resource,
+        }
+        return headers, limited
+
+    def _take_failure(self, method, path):
+        for failure in self._scheduled_failures:
+            failure_method, pattern, status, count = failure
+            if count > 0 and failure_method == method and pattern.search(path):
+                failure[3] -= 1
+                return status
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            return 502
+        return None
+
+    def _dispatch(self, request, path, query, body):
+        for method, pattern, handler in self._routes:
+            match = re.fullmatch(pattern, path)
+            if match and method == request.command:
+                with self._lock:
+                    self.request_counts['{} {}'.format(method, pattern)] += 1
+                    params = match.groupdict()
+                    repository = None
+                    if 'owner' in params:
+                        repository = self.repositories.get('{owner}/{repo}'.format(**params).lower())
+                        if repository is None:
+                            raise FakeGitHubError(404, 'Not Found')
+                    result = handler(
+                        repository=repository, params=params, query=query, body=body, headers=request.headers
+                    )
+                if len(result) == 2:
+                    return result[0], {}, result[1]
+                return result
+        raise FakeGitHubError(404, 'Not Found')
+
+    def _respond(self, request, status, headers, payload):
+        if isinstance(payload, str):
+            data = payload.encode('utf-8')
+            headers.setdefault('Content-Type', 'text/plain; charset=utf-8')
+        else:
+            data = json.dumps(payload).encode('utf-8') if payload is not None else b''
+            headers.setdefault('Content-Type', 'application/json; charset=utf-8')
+        request.send_response(status)
+        for name, value in headers.items():
+            request.send_header(name, value)
+        request.send_header('Content-Length', str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+    # JSON documents
+
+    def _repo_url(self, repository):
+        return '{}/repos/{}'.format(self.url, repository.full_name)
+
+    def _user_json(self, login):
+        return {'login': login, 'id': 1, 'name': login, 'type': 'User', 'url': '{}/users/{}'.format(self.url, login)}
+
+    def _repository_json(self, repository):
+        owner, name = repository.full_name.split('/')
+        return {
+            'id': int(repository.node_id[2:]),
+            'node_id': repository.node_id,
+            'name': name,
+            'full_name': repository.full_name,
+            'owner': self._user_json(owner),
+            'private': False,
+            'url': self._repo_url(repository),
+            'html_url': 'https://github.com/{}'.format(repository.full_name),
+            'default_branch': repository.default_branch,
+        }
+
+    def _tree_json(self, repository, tree_sha):
+        return {
+            'sha': tree_sha,
+            'url': '{}/git/trees/{}'.format(self._repo_url(repository), tree_sha),
+            'truncated': False,
+            'tree': [
+                {'path': path, 'mode': mode, 'type': 'blob', 'sha': blob_sha,
+                 'size': len(repository.blobs[blob_sha]),
+                 'url': '{}/git/blobs/{}'.format(self._repo_url(repository), blob_sha)}
+                for path, (mode, blob_sha) in sorted(repository.trees[tree_sha].items())
+            ],
+        }
+
+    def _commit_json(self, repository, commit_sha):
+        commit = repository.commits[commit_sha]
+        url = self._repo_url(repository)
+        return {
+            'sha': commit_sha,
+            'url': '{}/git/commits/{}'.format(url, commit_sha),
+            'message': commit['message'],
+            'tree': {'sha': commit['tree'], 'url': '{}/git/trees/{}'.format(url, commit['tree'])},
+            'parents': [{'sha': parent, 'url': '{}/git/commits/{}'.format(url, parent)}
+                        for parent in commit['parents']],
+        }
+
+    def _ref_json(self, repository, ref):
+        return {
+            'ref': 'refs/{}'.format(ref),
+            'url': '{}/git/refs/{}'.format(self._repo_url(repository), ref),
+            'object': {'sha': repository.refs[ref], 'type': 'commit'},
+        }
+
+    def _pull_json(self, repository, pull):
+        url = self._repo_url(repository)
+        head_sha = repository.refs.get('heads/{}'.format(pull['head']), pull['head_sha'])
+        return {
+            'id': pull['number'],
+            'node_id': 'PR_{}'.format(pull['number']),
+            'number': pull['number'],
+            'url': '{}/pulls/{}'.format(url, pull['number']),
+            'issue_url': '{}/issues/{}'.format(url, pull['number']),
+            'html_url': 'https://github.com/{}/pull/{}'.format(repository.full_name, pull['number']),
+            'state': pull['state'],
+            'draft': pull['draft'],
+            'title': pull['title'],
+            'body': pull['body'],
+            'user': self._user_json(self.user_login),
+            'labels': [{'name': label} for label in pull['labels']],
+            'head': {'ref': pull['head'], 'sha': head_sha, 'repo': self._repository_json(repository)},
+            'base': {'ref': pull['base'], 'sha': pull['base_sha'], 'repo': self._repository_json(repository)},
+        }
+
+    def _issue_json(self, repository, pull):
+        url = self._repo_url(repository)
+        return {
+            'number': pull['number'],
+            'url': '{}/issues/{}'.format(url, pull['number']),
+            'title': pull['title'],
+            'state': pull['state'],
+            'user': self._user_json(self.user_login),
+            'pull_request': {'url': '{}/pulls/{}'.format(url, pull['number'])},
+        }
+
+    def _diff(self, repository, pull):
+        base = repository.tree_of(pull['base_sha'])
+        head = repository.tree_of(repository.refs.get('heads/{}'.format(pull['head']), pull['head_sha']))
+        lines = []
+        for path in sorted(set(base) | set(head)):
+            if base.get(path) == head.get(path):
+                continue
+            old = repository.blobs[base[path][1]].decode('utf-8', 'replace') if path in base else ''
+            new = repository.blobs[head[path][1]].decode('utf-8', 'replace') if path in head else ''
+            lines.append('diff --git a/{0} b/{0}'.format(path))
+            lines.extend(difflib.unified_diff(
+                old.splitlines(), new.splitlines(), 'a/{}'.format(path), 'b/{}'.format(path), lineterm=''
+            ))
+        return '\n'.join(lines) + '\n'
+
+    def _find_pull(self, repository, number):
+        pull = repository.pulls.get(int(number))
+        if pull is None:
+            raise FakeGitHubError(404, 'Not Found')
+        return pull
+
+    # Endpoints
+
+    def _get_user(self, **kwargs):  # pylint: disable=unused-argument
+        return 200, self._user_json(self.user_login)
+
+    def _graphql(self, **kwargs):  # pylint: disable=unused-argument
+        return 200, {'data': None, 'errors': [{'message': 'GraphQL is not supported by the fake server'}]}
+
+    def _search_issues(self, query, **kwargs):  # pylint: disable=unused-argument
+        qualifiers = dict(term.split(':', 1) for term in query.get('q', [''])[0].split() if ':' in term)
+        repository = self.repositories.get(qualifiers.get('repo', '').lower())
+        items = []
+        if repository is not None:
+            for pull in repository.pulls.values():
+                if qualifiers.get('is') == 'open' and pull['state'] != 'open':
+                    continue
+                if qualifiers.get('author', self.user_login) != self.user_login:
+                    continue
+                if qualifiers.get('base', pull['base']) != pull['base']:
+                    continue
+                if not pull['head'].startswith(qualifiers.get('head', '')):
+                    continue
+                items.append(self._issue_json(repository, pull))
+        return 200, {'total_count': len(items), 'incomplete_results': False, 'items': items}
+
+    def _get_repository(self, repository, **kwargs):  # pylint: disable=unused-argument
+        return 200, self._repository_json(repository)
+
+    def _get_branch(self, repository, params, **kwargs):  # pylint: disable=unused-argument
+        ref = 'heads/{}'.format(params['branch'])
+        if ref not in repository.refs:
+            raise FakeGitHubError(404, 'Branch not found')
+        return 200, {'name': params['branch'], 'commit': {'sha': repository.refs[ref]}}
+
+    def _create_blob(self, repository, body, **kwargs):  # pylint: disable=unused-argument
+        content = body['content']
+        if body.get('encoding') == 'base64':
+            content = base64.b64decode(content)
+        else:
+            content = content.encode('utf-8')
+        blob_sha = repository.add_blob(content)
+        return 201, {'sha': blob_sha, 'url': '{}/git/blobs/{}'.format(self._repo_url(repository), blob_sha)}
+
+    def _get_tree(self, repository, params, **kwargs):  # pylint: disable=unused-argument
+        tree_sha = params['sha']
+        if tree_sha in repository.commits:
+            tree_sha = repository.commits[tree_sha]['tree']
+        if tree_sha not in repository.trees:
+            raise FakeGitHubError(404, 'Not Found')
+        return 200, self._tree_json(repository, tree_sha)
+
+    def _create_tree(self, repository, body, **kwargs):  # pylint: disable=unused-argument
+        entries = dict(repository.trees.get(body.get('base_tree'), {}))
+        for element in body['tree']:
+            if 'content' in element:
+                entries[element['path']] = (element['mode'], repository.add_blob(element['content'].encode('utf-8')))
+            elif element.get('sha') is None:
+                entries.pop(element['path'], None)
+            elif element['sha'] not in repository.blobs:
+                raise FakeGitHubError(422, 'Unknown blob {}'.format(element['sha']))
+            else:
+                entries[element['path']] = (element['mode'], element['sha'])
+        return 201, self._tree_json(repository, repository.add_tree(entries))
+
+    def _get_commit(self, repository, params, **kwargs):  # pylint: disable=unused-argument
+        if params['sha'] not in repository.commits:
+            raise FakeGitHubError(404, 'Not Found')
+        return 200, self._commit_json(repository, params['sha'])
+
+    def _create_commit(self, repository, body, **kwargs):  # pylint: disable=unused-argument
+        if body['tree'] not in repository.trees:
+            raise FakeGitHubError(422, 'Unknown tree')
+        commit_sha = repository.add_commit(body['tree'], body.get('parents', []), body['message'])
+        return 201, self._commit_json(repository, commit_sha)
+
+    def _create_ref(self, repository, body, **kwargs):  # pylint: disable=unused-argument
+        ref = body['ref'][len('refs/'):]
+        if ref in repository.refs:
+            raise FakeGitHubError(422, 'Reference already exists')
+        repository.refs[ref] = body['sha']
+        return 201, self._ref_json(repository, ref)
+
+    def _get_ref(self, repository, params, **kwargs):  # pylint: disable=unused-argument
+        if params['ref'] not in repository.refs:
+            raise FakeGitHubError(404, 'Not Found')
+        return 200, self._ref_json(repository, params['ref'])
+
+    def _update_ref(self, repository, params, body, **kwargs):  # pylint: disable=unused-argument
+        if params['ref'] not in repository.refs:
+            raise FakeGitHubError(422, 'Reference does not exist')
+        repository.refs[params['ref']] = body['sha']
+        return 200, self._ref_json(repository, params['ref'])
+
+    def _delete_ref(self, repository, params, **kwargs):  # pylint: disable=unused-argument
+        if repository.refs.pop(params['ref'], None) is None:
+            raise FakeGitHubError(422, 'Reference does not exist')
+        return 204, None
+
+    def _list_pulls(self, repository, query, **kwargs):  # pylint: disable=unused-argument
+        state = query.get('state', ['open'])[0]
+        pulls = [pull for pull in repository.pulls.values() if state in ('all', pull['state'])]
+        if 'base' in query:
+            pulls = [pull for pull in pulls if pull['base'] == query['base'][0]]
+        if 'head' in query:
+            # Heads are given as ``owner:branch``, and all branches here belong to the owner.
+            pulls = [pull for pull in pulls if pull['head'] == query['head'][0].split(':', 1)[-1]]
+        return 200, [self._pull_json(repository, pull) for pull in pulls]
+
+    def _create_pull(self, repository, body, **kwargs):  # pylint: disable=unused-argument
+        head = re.sub('^refs/heads/', '', body['head'])
+        base = body['base']
+        if 'heads/{}'.format(head) not in repository.refs or 'heads/{}'.format(base) not in repository.refs:
+            raise FakeGitHubError(422, 'Validation Failed')
+        number = next(repository.numbers)
+        repository.pulls[number] = {
+            'number': number, 'title': body['title'], 'body': body.get('body') or '', 'head': head, 'base': base,
+            'head_sha': repository.refs['heads/{}'.format(head)], 'base_sha': repository.refs['heads/{}'.format(base)],
+            'draft': body.get('draft', False), 'state': 'open', 'labels': [], 'comments': [],
+            'users': [], 'teams': [],
+        }
+        pull_json = self._pull_json(repository, repository.pulls[number])
+        return 201, {'Location': pull_json['url']}, pull_json
+
+    def _get_pull(self, repository, params, headers, **kwargs):  # pylint: disable=unused-argument
+        pull = self._find_pull(repository, params['number'])
+        if 'diff' in headers.get('Accept', ''):
+            return 200, self._diff(repository, pull)
+        return 200, self._pull_json(repository, pull)
+
+    def _edit_pull(self, repository, params, body, **kwargs):  # pylint: disable=unused-argument
+        pull = self._find_pull(repository, params['number'])
+        for field in ('title', 'body', 'state', 'base'):
+            if field in body:
+                pull[field] = body[field]
+        return 200, self._pull_json(repository, pull)
+
+    def _review_requests_json(self, pull):
+        return {
+            'users': [self._user_json(login) for login in pull['users']],
+            'teams': [{'id': index, 'slug': slug, 'name': slug, 'url': '{}/teams/{}'.format(self.url, slug)}
+                      for index, slug in enumerate(pull['teams'], 1)],
+        }
+
+    def _get_review_requests(self, repository, params, **kwargs):  # pylint: disable=unused-argument
+        return 200, self._review_requests_json(self._find_pull(repository, params['number']))
+
+    def _request_reviews(self, repository, params, body, **kwargs):  # pylint: disable=unused-argument
+        pull = self._find_pull(repository, params['number'])
+        pull['users'] += [login for login in body.get('reviewers', []) if login not in pull['users']]
+        pull['teams'] += [slug for slug in body.get('team_reviewers', []) if slug not in pull['teams']]
+        return 201, self._pull_json(repository, pull)
+
+    def _comment_json(self, repository, pull, position):
+        comment_id = pull['number'] * COMMENT_IDS_PER_PULL + position
+        return {
+            'id': comment_id,
+            'url': '{}/issues/comments/{}'.format(self._repo_url(repository), comment_id),
+            'body': pull['comments'][position - 1],
+            'user': self._user_json(self.user_login),
+        }
+
+    def _find_comment(self, repository, comment_id):
+        number, position = divmod(int(comment_id), COMMENT_IDS_PER_PULL)
+        pull = self._find_pull(repository, number)
+        if not 0 < position <= len(pull['comments']) or pull['comments'][position - 1] is None:
+            raise FakeGitHubError(404, 'Not Found')
+        return pull, position
+
+    def _list_comments(self, repository, params, **kwargs):  # pylint: disable=unused-argument
+        pull = self._find_pull(repository, params['number'])
+        # Deleted comments are left in place as None, so that the IDs of the others stay the same.
+        return 200, [self._comment_json(repository, pull, position)
+                     for position, comment in enumerate(pull['comments'], 1) if comment is not None]
+
+    def _create_comment(self, repository, params, body, **kwargs):  # pylint: disable=unused-argument
+        pull = self._find_pull(repository, params['number'])
+        pull['comments'].append(body['body'])
+        return 201, self._comment_json(repository, pull, len(pull['comments']))
+
+    def _edit_comment(self, repository, params, body, **kwargs):  # pylint: disable=unused-argument
+        pull, position = self._find_comment(repository, params['comment_id'])
+        pull['comments'][position - 1] = body['body']
+        return 200, self._comment_json(repository, pull, position)
+
+    def _delete_comment(self, repository, params, **kwargs):  # pylint: disable=unused-argument
+        pull, position = self._find_comment(repository, params['comment_id'])
+        pull['comments'][position - 1] = None
+        return 204, None
+
+    def _set_labels(self, repository, params, body, **kwargs):  # pylint: disable=unused-argument
+        pull = self._find_pull(repository, params['number'])
+        pull['labels'] = list(body if isinstance(body, list) else body.get('labels', []))
+        return 200, [{'name': label} for label in pull['labels']]
+
+    def _add_labels(self, repository, params, body, **kwargs):  # pylint: disable=unused-argument
+        pull = self._find_pull(repository, params['number'])
+        for label in body if isinstance(body, list) else body.get('labels', []):
+            if label not in pull['labels']:
+                pull['labels'].append(label)
+        return 200, [{'name': label} for label in pull['labels']]
+
+    def _remove_label(self, repository, params, **kwargs):  # pylint: disable=unused-argument
+        pull = self._find_pull(repository, params['number'])
+        if params['name'] not in pull['labels']:
+            raise FakeGitHubError(404, 'Label does not exist')
+        pull['labels'].remove(params['name'])
+        return 200, [{'name': label} for label in pull['labels']]
+
+    def _get_variable(self, repository, params, **kwargs):  # pylint: disable=unused-argument
+        if params['name'] not in repository.variables:
+            raise FakeGitHubError(404, 'Not Found')
+        return 200, {'name': params['name'], 'value': repository.variables[params['name']]}
@@ -0,0 +1,212 @@
+"""
+Time the diff classification and tree building hot paths, and write the results as JSON.
+
+    python -m jenkins.benchmarks.run --output benchmark-results.json
+
+Every result records the best and median wall time over ``--repeat`` runs, so
+that runs of the same revision on the same machine can be compared over time.
+"""
+import functools
+import json
+import logging
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+import click
+
+from ..github_helpers import GitHubHelper
+from ..requirement_line import match_requirement_line
+from .synthetic import (FakeRepository, make_adversarial_lines,
+                        make_requirements_diff, make_working_tree)
+
+DEFAULT_DIFF_SIZES = '10,100,1000,10000,50000'
+DEFAULT_TREE_SIZES = '10,100,1000'
+DEFAULT_LINE_LENGTHS = '1000,10000,100000'
+
+# The pattern requirement lines were matched with before match_requirement_line, kept for comparison.
+LEGACY_REQUIREMENT_REGEX = re.compile(
+    r"(?P<change>[\-\+])(?P<name>[\w][\w\-\[\]]+)==(?P<version>\d+\.\d+(\.\d+)?(\.[\w]+)?)"
+)
+
+
+def time_call(func, repeat):
+    """
+    Call ``func`` ``repeat`` times and return the durations in seconds.
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def make_result(name, size, durations):
+    """
+    Summarize the durations of one benchmark at one input size.
+    """
+    best = min(durations)
+    return {
+        'name': name,
+        'size': size,
+        'repeat': len(durations),
+        'best_seconds': best,
+        'median_seconds': statistics.median(durations),
+        'best_microseconds_per_item': best * 1e6 / size if size else None,
+    }
+
+
+def benchmark_diff(helper, sizes, repeat):
+    """
+    Time compare_pr_differnce and make_readable_string on synthetic diffs.
+    """
+    results = []
+    for size in sizes:
+        diff = make_requirements_diff(size)
+        results.append(make_result('compare_pr_differnce', size, time_call(
+            lambda diff=diff: helper.compare_pr_differnce(diff), repeat
+        )))
+        results.append(make_result('compare_pr_differnce_streamed', size, time_call(
+            lambda diff=diff: helper.compare_pr_differnce(diff.splitlines()), repeat
+        )))
+        valid_reqs, suspicious_reqs = helper.compare_pr_differnce(diff)
+        reqs = valid_reqs + suspicious_reqs
+        results.append(make_result('make_readable_string', len(reqs), time_call(
+            lambda reqs=reqs: [helper.make_readable_string(req) for req in reqs], repeat
+        )))
+    return results
+
+
+def benchmark_line_matcher(diff_sizes, line_lengths, repeat):
+    """
+    Time match_requirement_line, and the regex it replaced, on diff lines and on adversarial lines.
+    """
+    matchers = [('match_requirement_line', match_requirement_line),
+                ('legacy_requirement_regex', LEGACY_REQUIREMENT_REGEX.match)]
+    results = []
+    for size in diff_sizes:
+        lines = make_requirements_diff(size).splitlines()
+        for name, matcher in matchers:
+            results.append(make_result(name, len(lines), time_call(
+                lambda lines=lines, matcher=matcher: [matcher(line) for line in lines], repeat
+            )))
+    for length in line_lengths:
+        for line_name, line in make_adversarial_lines(length):
+            for name, matcher in matchers:
+                results.append(make_result('{}:{}'.format(name, line_name), len(line), time_call(
+                    lambda line=line, matcher=matcher: matcher(line), repeat
+                )))
+    return results
+
+
+def _update_list_of_files(helper, repo_root, paths, base_files):
+    helper.update_list_of_files(
+        FakeRepository(base_files), repo_root, paths, 'Benchmark commit', 'a' * 40, 'benchmark'
+    )
+
+
+def benchmark_tree(helper, sizes, repeat):
+    """
+    Time update_list_of_files against a fake repository, with half of the files unchanged.
+    """
+    results = []
+    for size in sizes:
+        repo_root = tempfile.mkdtemp()
+        try:
+            paths = make_working_tree(repo_root, size)
+            base_files = {
+                path: ('100644', helper.get_blob_sha(helper.get_file_contents(repo_root, path)))
+                for path in paths[::2]
+            }
+            update = functools.partial(_update_list_of_files, helper, repo_root, paths, base_files)
+            results.append(make_result('update_list_of_files', size, time_call(update, repeat)))
+        finally:
+            shutil.rmtree(repo_root)
+    return results
+
+
+def get_revision():
+    """
+    Return the commit being benchmarked, if this is a git checkout.
+    """
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], check=True, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(diff_sizes, tree_sizes, repeat, line_lengths=()):
+    """
+    Run every benchmark and return the report as a dict.
+    """
+    helper = GitHubHelper()
+    # Commits need an author email, even though nothing is sent anywhere.
+    helper.github_user_email = helper.github_user_email or 'benchmark@example.com'
+    return {
+        'revision': get_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'created': time.time(),
+        'results': (
+            benchmark_diff(helper, diff_sizes, repeat) +
+            benchmark_line_matcher(diff_sizes, line_lengths, repeat) +
+            benchmark_tree(helper, tree_sizes, repeat)
+        ),
+    }
+
+
+def parse_sizes(ctx, param, value):  # pylint: disable=unused-argument
+    try:
+        return [int(size) for size in value.split(',') if size]
+    except ValueError as error:
+        raise click.BadParameter('expected comma separated integers') from error
+
+
+@click.command()
+@click.option(
+    '--output',
+    type=click.Path(dir_okay=False, file_okay=True, writable=True),
+    default='benchmark-results.json',
+    help="File to write the results to"
+)
+@click.option(
+    '--diff-sizes',
+    default=DEFAULT_DIFF_SIZES,
+    callback=parse_sizes,
+    help="Comma separated numbers of changed requirement lines to benchmark the diff parsing with"
+)
+@click.option(
+    '--tree-sizes',
+    default=DEFAULT_TREE_SIZES,
+    callback=parse_sizes,
+    help="Comma separated numbers of files to benchmark update_list_of_files with"
+)
+@click.option(
+    '--line-lengths',
+    default=DEFAULT_LINE_LENGTHS,
+    callback=parse_sizes,
+    help="Comma separated lengths of the adversarial lines to benchmark the requirement line matcher with"
+)
+@click.option('--repeat', type=int, default=5, help="Number of times to run each benchmark")
+def main(output, diff_sizes, tree_sizes, line_lengths, repeat):
+    """
+    Run the benchmarks and write the results as JSON.
+    """
+    # The helpers log every file they look at, which would drown out the timings.
+    logging.getLogger().setLevel(logging.WARNING)
+    report = run_benchmarks(diff_sizes, tree_sizes, repeat, line_lengths)
+    with open(output, 'w', encoding='utf-8') as output_file:
+        json.dump(report, output_file, indent=2)
+    for result in report['results']:
+        click.echo('{name:<50} {size:>7} {best_seconds:>10.4f}s'.format(**result))
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
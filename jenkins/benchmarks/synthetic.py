@@ -0,0 +1,164 @@
+"""
+Synthetic inputs for the benchmarks: pip-compile diffs, working trees and a fake repository.
+"""
+import hashlib
+import os
+import random
+
+# Share of changes of each kind in a synthetic diff; the rest are minor upgrades.
+MAJOR_UPGRADES = 0.05
+DOWNGRADES = 0.02
+ADDITIONS = 0.03
+REMOVALS = 0.03
+
+LINES_PER_FILE = 500
+
+
+def _version(rng):
+    return '{}.{}.{}'.format(rng.randint(0, 9), rng.randint(0, 30), rng.randint(0, 20))
+
+
+def _requirement_change(rng, name):
+    """
+    Return the removed and added line for one changed requirement, either of which may be None.
+    """
+    major, minor, patch = rng.randint(1, 9), rng.randint(0, 30), rng.randint(0, 20)
+    old = '{}.{}.{}'.format(major, minor, patch)
+    kind = rng.random()
+    if kind < MAJOR_UPGRADES:
+        new = '{}.0.0'.format(major + 1)
+    elif kind < MAJOR_UPGRADES + DOWNGRADES:
+        new = '{}.{}.{}'.format(major - 1, minor, patch)
+    elif kind < MAJOR_UPGRADES + DOWNGRADES + ADDITIONS:
+        return None, '+{}=={}'.format(name, _version(rng))
+    elif kind < MAJOR_UPGRADES + DOWNGRADES + ADDITIONS + REMOVALS:
+        return '-{}=={}'.format(name, old), None
+    else:
+        new = '{}.{}.{}'.format(major, minor, patch + 1)
+    return '-{}=={}'.format(name, old), '+{}=={}'.format(name, new)
+
+
+def make_requirements_diff(requirement_lines, lines_per_file=LINES_PER_FILE, seed=0):
+    """
+    Return a ``git diff`` of pip-compiled requirement files as a string.
+
+    The diff has about ``requirement_lines`` changed requirement lines, spread
+    over files of at most ``lines_per_file`` lines, with the ``# via`` comments
+    and hunk headers that pip-compile output has.
+    """
+    rng = random.Random(seed)
+    lines = []
+    file_index = 0
+    written = 0
+    while written < requirement_lines:
+        file_name = 'requirements/edx/file{}.txt'.format(file_index)
+        lines += [
+            'diff --git a/{0} b/{0}'.format(file_name),
+            'index 1111111..2222222 100644',
+            '--- a/{}'.format(file_name),
+            '+++ b/{}'.format(file_name),
+        ]
+        file_lines = min(lines_per_file, requirement_lines - written)
+        file_written = 0
+        package_index = 0
+        while file_written < file_lines:
+            if package_index % 20 == 0:
+                lines.append('@@ -{0},40 +{0},40 @@'.format(package_index * 3 + 1))
+            name = 'package-{}-{}'.format(file_index, package_index)
+            removed, added = _requirement_change(rng, name)
+            for line in (removed, added):
+                if line is not None and file_written < file_lines:
+                    lines.append(line)
+                    file_written += 1
+            lines.append('    # via')
+            lines.append('    #   -r requirements/edx/base.in')
+            package_index += 1
+        written += file_written
+        file_index += 1
+    return '\n'.join(lines) + '\n'
+
+
+def make_adversarial_lines(length):
+    """
+    Return ``(name, line)`` pairs of diff lines about ``length`` characters long, crafted to be slow to match.
+
+    Each line looks like the start of a pin for as long as possible before turning
+    out not to be one, which is where a backtracking matcher spends its time.
+    """
+    repeat = max(length // 2, 1)
+    return [
+        ('long_name', '+' + 'a' * length),
+        ('separators_in_name', '+a' + '-' * length + '!'),
+        ('long_release', '+a==' + '1.' * repeat + '!'),
+        ('repeated_labels', '+a==1' + '.a' * repeat),
+        ('long_local_version', '+a==1+' + 'a.' * repeat + '-'),
+        ('unclosed_extras', '+a[' + 'b,' * repeat),
+        ('many_equals', '+a' + '==' * repeat),
+    ]
+
+
+def make_working_tree(repo_root, file_count, file_size=2048, seed=0):
+    """
+    Write ``file_count`` text files of about ``file_size`` bytes under ``repo_root``.
+
+    Returns the relative paths of the files.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for index in range(file_count):
+        path = os.path.join('src', 'module{}'.format(index % 50), 'file{}.py'.format(index))
+        full_path = os.path.join(repo_root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        line = '# {}\n'.format(rng.getrandbits(64))
+        with open(full_path, 'w', encoding='utf-8') as output:
+            output.write(line * max(1, file_size // len(line)))
+        paths.append(path)
+    return paths
+
+
+class FakeObject:
+    """
+    Stand-in for a PyGithub object, with just the attributes the helpers read.
+    """
+
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+class FakeRepository:
+    """
+    In-memory stand-in for the PyGithub repository calls made by ``update_list_of_files``.
+
+    ``base_files`` maps paths to the ``(mode, sha)`` they have in the base tree.
+    """
+
+    url = 'https://api.github.com/repos/openedx/benchmark'
+
+    def __init__(self, base_files=None):
+        self.base_files = base_files or {}
+        self.blobs_created = 0
+        self.tree_entries_created = 0
+
+    def get_git_tree(self, sha, recursive=False):  # pylint: disable=unused-argument
+        """
+        Return the base tree, with every file listed as a blob.
+        """
+        tree = [
+            FakeObject(path=path, mode=mode, sha=blob_sha, type='blob')
+            for path, (mode, blob_sha) in self.base_files.items()
+        ]
+        return FakeObject(sha=sha, tree=tree, raw_data={'truncated': False})
+
+    def create_git_blob(self, content, encoding):  # pylint: disable=unused-argument
+        self.blobs_created += 1
+        return FakeObject(sha=hashlib.sha1(content.encode('utf-8')).hexdigest())
+
+    def create_git_tree(self, tree, base_tree=None):  # pylint: disable=unused-argument
+        self.tree_entries_created += len(tree)
+        return FakeObject(sha=hashlib.sha1(str(self.tree_entries_created).encode('utf-8')).hexdigest())
+
+    def get_git_commit(self, sha):
+        return FakeObject(sha=sha)
+
+    def create_git_commit(self, message, tree, parents, author=None, committer=None):  # pylint: disable=unused-argument
+        return FakeObject(sha=hashlib.sha1(message.encode('utf-8') + tree.sha.encode('utf-8')).hexdigest())
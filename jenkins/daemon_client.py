@@ -0,0 +1,32 @@
+"""
+Hand pull request jobs to a running ``pull_request_daemon``.
+
+Kept apart from the daemon itself, and free of heavy imports, so that submitting
+a job costs no more than starting Python and opening a socket.
+"""
+import json
+import socket
+
+
+def submit_job(socket_path, job, timeout=None):
+    """
+    Send ``job``, a dict of PullRequestCreator options, to the daemon and wait for its result.
+
+    The result is a dict with the job's ``status``, ``pr_url`` and ``error``, and its
+    timings: ``queued`` for the seconds it waited for a worker, ``duration`` for the
+    seconds it took to run.
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(socket_path)
+            client.sendall(json.dumps(job).encode('utf-8') + b'\n')
+            with client.makefile('rb') as responses:
+                response = responses.readline()
+    except OSError as error:
+        raise Exception(
+            "Unable to reach the pull request daemon at {}".format(socket_path)
+        ) from error
+    if not response:
+        raise Exception("The pull request daemon at {} closed the connection without a result".format(socket_path))
+    return json.loads(response)
@@ -0,0 +1,171 @@
+"""
+Detect the changes in a working tree with a single ``git status`` call.
+
+``git status --porcelain=v2 -z`` reports modified, staged, deleted, renamed and
+(optionally) untracked files in one pass over the index, with file modes and
+NUL separated paths, so no further git calls are needed to classify them.
+git is run directly rather than through GitPython, which is slow to import, so
+that a run with nothing to commit stays cheap.
+"""
+import hashlib
+import os
+import stat
+import subprocess
+from collections import namedtuple
+
+from .tracing import GIT, tracer
+
+ADDED = 'added'
+MODIFIED = 'modified'
+DELETED = 'deleted'
+RENAMED = 'renamed'
+MODE_CHANGED = 'mode_changed'
+
+# ``mode`` is the octal mode of the file in the working tree, and ``old_path``
+# is only set for renames. Untracked files have no mode.
+FileChange = namedtuple('FileChange', ['kind', 'path', 'old_path', 'mode'])
+
+
+def _classify(status, head_mode, worktree_mode):
+    """
+    Return the kind of change for an ordinary entry from its XY status and modes.
+    """
+    if 'D' in status:
+        return DELETED
+    if status[0] == 'A':
+        return ADDED
+    if head_mode != worktree_mode:
+        return MODE_CHANGED
+    return MODIFIED
+
+
+def parse_porcelain_v2(output):
+    """
+    Parse the output of ``git status --porcelain=v2 -z`` into FileChange entries.
+    """
+    changes = []
+    fields = iter(output.split('\0'))
+    for field in fields:
+        if not field:
+            continue
+        entry_type = field[0]
+        if entry_type == '1':
+            _, status, _, head_mode, _, worktree_mode, _, _, path = field.split(' ', 8)
+            changes.append(FileChange(_classify(status, head_mode, worktree_mode), path, None, worktree_mode))
+        elif entry_type == '2':
+            _, status, _, head_mode, _, worktree_mode, _, _, score, path = field.split(' ', 9)
+            # The original path follows as a field of its own.
+            old_path = next(fields)
+            if 'D' in status:
+                changes.append(FileChange(DELETED, path, None, worktree_mode))
+                changes.append(FileChange(DELETED, old_path, None, head_mode))
+            elif score.startswith('R'):
+                changes.append(FileChange(RENAMED, path, old_path, worktree_mode))
+            else:
+                # A copy leaves the original in place.
+                changes.append(FileChange(ADDED, path, None, worktree_mode))
+        elif entry_type == 'u':
+            parts = field.split(' ', 10)
+            changes.append(FileChange(MODIFIED, parts[10], None, parts[6]))
+        elif entry_type == '?':
+            changes.append(FileChange(ADDED, field[2:], None, None))
+    return changes
+
+
+def get_working_tree_changes(repo_root, untracked_files_required=False):
+    """
+    Return the FileChange entries for everything that differs from HEAD in ``repo_root``.
+
+    Untracked files are only included if ``untracked_files_required`` is set.
+    """
+    command = [
+        'git', 'status', '--porcelain=v2', '-z',
+        '--untracked-files={}'.format('all' if untracked_files_required else 'no'),
+    ]
+    try:
+        with tracer.span(GIT, 'status'):
+            result = subprocess.run(command, cwd=repo_root, check=True, capture_output=True)
+    except subprocess.CalledProcessError as error:
+        raise Exception(
+            "Unable to get the status of {}: {}".format(repo_root, error.stderr.decode('utf-8', 'replace'))
+        ) from error
+    return parse_porcelain_v2(result.stdout.decode('utf-8', 'surrogateescape'))
+
+
+def read_head_files(repo_root, paths):
+    """
+    Return a dict mapping each of ``paths`` to its content at HEAD, as bytes.
+
+    All files are read with a single ``git cat-file --batch`` call. Paths that do
+    not exist at HEAD, e.g. newly added files, map to None.
+    """
+    paths = list(paths)
+    if not paths:
+        return {}
+    request = ''.join('HEAD:{}\n'.format(path) for path in paths).encode('utf-8', 'surrogateescape')
+    try:
+        with tracer.span(GIT, 'cat-file', files=len(paths)):
+            result = subprocess.run(
+                ['git', 'cat-file', '--batch'], cwd=repo_root, input=request, check=True, capture_output=True
+            )
+    except subprocess.CalledProcessError as error:
+        raise Exception(
+            "Unable to read files at HEAD in {}: {}".format(repo_root, error.stderr.decode('utf-8', 'replace'))
+        ) from error
+
+    contents = {}
+    output = result.stdout
+    position = 0
+    for path in paths:
+        header_end = output.index(b'\n', position)
+        header = output[position:header_end].split()
+        position = header_end + 1
+        if header[-1] == b'missing':
+            contents[path] = None
+            continue
+        object_type, size = header[1], int(header[2])
+        contents[path] = output[position:position + size] if object_type == b'blob' else None
+        # Each object is followed by a newline.
+        position += size + 1
+    return contents
+
+
+def _file_digest(full_path):
+    """
+    Return the SHA-256 hex digest of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(full_path, 'rb') as opened_file:
+        chunk = opened_file.read(1024 * 1024)
+        while chunk:
+            digest.update(chunk)
+            chunk = opened_file.read(1024 * 1024)
+    return digest.hexdigest()
+
+
+def content_fingerprint(repo_root, changes):
+    """
+    Return a hex digest of the content that committing ``changes`` would propose.
+
+    ``changes`` holds paths or FileChange entries. The digest covers the path, mode
+    and bytes of every changed file, and the paths that would be removed, but not
+    the commit the changes are based on. Two runs that would push the same files
+    get the same fingerprint even after the base branch has moved on.
+    """
+    entries = []
+    for change in changes:
+        if not isinstance(change, FileChange):
+            change = FileChange(None, change, None, None)
+        if change.kind == RENAMED:
+            entries.append((change.old_path, '', 'deleted'))
+        full_path = os.path.join(repo_root, change.path)
+        if change.kind == DELETED or not os.path.isfile(full_path):
+            entries.append((change.path, '', 'deleted'))
+            continue
+        mode = '100755' if os.stat(full_path).st_mode & stat.S_IXUSR else '100644'
+        entries.append((change.path, mode, _file_digest(full_path)))
+
+    fingerprint = hashlib.sha256()
+    for entry in sorted(entries):
+        fingerprint.update('\0'.join(entry).encode('utf-8', 'surrogateescape') + b'\n')
+    return fingerprint.hexdigest()
@@ -0,0 +1,203 @@
+"""
+Minimal GitHub GraphQL client for creating and annotating pull requests.
+
+One pull request costs several REST calls: creating it, requesting reviews,
+reading the review requests back, each comment and the labels. With GraphQL the
+review requests come back from the mutation that makes them, and all comments
+and labels are added by a single mutation. Node IDs of users, teams and labels
+are looked up once and cached, in a cache shared by the threads using the client.
+"""
+import logging
+import threading
+
+logger = logging.getLogger()
+
+DEFAULT_GRAPHQL_URL = 'https://api.github.com/graphql'
+
+CREATE_PULL_REQUEST = """
+mutation($input: CreatePullRequestInput!) {
+  createPullRequest(input: $input) {
+    pullRequest { id number title body url }
+  }
+}
+"""
+
+REQUEST_REVIEWS = """
+mutation($input: RequestReviewsInput!) {
+  requestReviews(input: $input) {
+    pullRequest {
+      reviewRequests(first: 100) {
+        nodes { requestedReviewer { ... on User { login } ... on Team { slug name } } }
+      }
+    }
+  }
+}
+"""
+
+
+class GraphQLError(Exception):
+    """
+    The GraphQL API rejected a request.
+    """
+
+
+class GitHubGraphQL:
+    """
+    Run GraphQL queries and mutations through an authenticated requests session.
+    """
+
+    def __init__(self, session, token, url=DEFAULT_GRAPHQL_URL):
+        self.session = session
+        self.token = token
+        self.url = url
+        self._node_ids = {}
+        self._node_ids_lock = threading.Lock()
+
+    def execute(self, query, variables=None):
+        """
+        Run a query or mutation and return its ``data``, raising GraphQLError on any error.
+        """
+        response = self.session.post(
+            self.url,
+            json={'query': query, 'variables': variables or {}},
+            headers={'Authorization': f'Bearer {self.token}'},
+            timeout=30,
+        )
+        if response.status_code != 200:
+            raise GraphQLError("GraphQL request failed with status {}".format(response.status_code))
+        result = response.json()
+        if result.get('errors'):
+            raise GraphQLError("; ".join(error.get('message', str(error)) for error in result['errors']))
+        return result['data']
+
+    def get_reviewer_ids(self, org, user_logins, team_slugs):
+        """
+        Return the node IDs of the given users and of the given teams in ``org``.
+
+        IDs that were looked up before are served from memory, and the rest are
+        fetched with a single query.
+        """
+        users = [('user', login) for login in user_logins]
+        teams = [('team', '{}/{}'.format(org, slug)) for slug in team_slugs]
+        with self._node_ids_lock:
+            missing = [key for key in users + teams if key not in self._node_ids]
+        if missing:
+            declarations = ['$org: String!']
+            fields = []
+            variables = {'org': org}
+            for index, (kind, name) in enumerate(missing):
+                alias = 'n{}'.format(index)
+                declarations.append('${}: String!'.format(alias))
+                if kind == 'user':
+                    fields.append('{0}: user(login: ${0}) {{ id }}'.format(alias))
+                    variables[alias] = name
+                else:
+                    fields.append('{0}: organization(login: $org) {{ team(slug: ${0}) {{ id }} }}'.format(alias))
+                    variables[alias] = name.split('/', 1)[1]
+            # Queried without holding the lock, so threads may look up the same IDs at once, which is harmless.
+            data = self.execute(
+                'query({}) {{ {} }}'.format(', '.join(declarations), ' '.join(fields)), variables
+            )
+            found = {}
+            for index, key in enumerate(missing):
+                node = data.get('n{}'.format(index)) or {}
+                if key[0] == 'team':
+                    node = node.get('team') or {}
+                if not node.get('id'):
+                    raise GraphQLError("Could not find {} {}".format(*key))
+                found[key] = node['id']
+            with self._node_ids_lock:
+                self._node_ids.update(found)
+        with self._node_ids_lock:
+            return [self._node_ids[key] for key in users], [self._node_ids[key] for key in teams]
+
+    def get_label_ids(self, owner, name, label_names):
+        """
+        Return the node IDs of the named labels in the ``owner/name`` repository.
+        """
+        keys = [('label', '{}/{}/{}'.format(owner, name, label)) for label in label_names]
+        with self._node_ids_lock:
+            missing = [(index, label) for index, (key, label) in enumerate(zip(keys, label_names))
+                       if key not in self._node_ids]
+        if missing:
+            declarations = ['$owner: String!', '$name: String!']
+            fields = []
+            variables = {'owner': owner, 'name': name}
+            for index, label in missing:
+                alias = 'l{}'.format(index)
+                declarations.append('${}: String!'.format(alias))
+                fields.append('{0}: label(name: ${0}) {{ id }}'.format(alias))
+                variables[alias] = label
+            data = self.execute(
+                'query({}) {{ repository(owner: $owner, name: $name) {{ {} }} }}'.format(
+                    ', '.join(declarations), ' '.join(fields)
+                ),
+                variables,
+            )
+            found = {}
+            for index, label in missing:
+                node = (data.get('repository') or {}).get('l{}'.format(index))
+                if not node:
+                    raise GraphQLError("Could not find label {}".format(label))
+                found[keys[index]] = node['id']
+            with self._node_ids_lock:
+                self._node_ids.update(found)
+        with self._node_ids_lock:
+            return [self._node_ids[key] for key in keys]
+
+    def create_pull_request(self, repository_id, title, body, base, head, draft=False):
+        """
+        Create a pull request and return its ``id``, ``number``, ``title``, ``body`` and ``url``.
+        """
+        data = self.execute(CREATE_PULL_REQUEST, {'input': {
+            'repositoryId': repository_id,
+            'title': title,
+            'body': body,
+            'baseRefName': base,
+            'headRefName': head,
+            'draft': draft,
+        }})
+        return data['createPullRequest']['pullRequest']
+
+    def request_reviews(self, pull_request_id, user_ids, team_ids):
+        """
+        Request reviews, and return the user logins and teams now tagged for review.
+
+        Teams are returned as ``(slug, name)`` pairs.
+        """
+        data = self.execute(REQUEST_REVIEWS, {'input': {
+            'pullRequestId': pull_request_id,
+            'userIds': user_ids,
+            'teamIds': team_ids,
+            'union': True,
+        }})
+        nodes = data['requestReviews']['pullRequest']['reviewRequests']['nodes']
+        reviewers = [node['requestedReviewer'] or {} for node in nodes]
+        users = [reviewer['login'] for reviewer in reviewers if 'login' in reviewer]
+        teams = [(reviewer['slug'], reviewer['name']) for reviewer in reviewers if 'slug' in reviewer]
+        return users, teams
+
+    def add_comments_and_labels(self, subject_id, comments, label_ids):
+        """
+        Add all ``comments`` and labels to a pull request with a single mutation.
+        """
+        if not comments and not label_ids:
+            return
+        declarations = ['$subject: ID!']
+        fields = []
+        variables = {'subject': subject_id}
+        for index, comment in enumerate(comments):
+            alias = 'c{}'.format(index)
+            declarations.append('${}: String!'.format(alias))
+            fields.append(
+                '{0}: addComment(input: {{subjectId: $subject, body: ${0}}}) {{ clientMutationId }}'.format(alias)
+            )
+            variables[alias] = comment
+        if label_ids:
+            declarations.append('$labels: [ID!]!')
+            fields.append(
+                'labels: addLabelsToLabelable(input: {labelableId: $subject, labelIds: $labels}) '
+                '{ clientMutationId }'
+            )
+            variables['labels'] = label_ids
+        self.execute('mutation({}) {{ {} }}'.format(', '.join(declarations), ' '.join(fields)), variables)
@@ -1,22 +1,100 @@
 """
 Helper methods for connecting with Github
 """
-import io  # pylint: disable=unused-import
+import base64
+import contextvars
+import hashlib
 import logging
+import mmap
 import os
 import re
+import stat
 import time
 from ast import literal_eval
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import requests
 from git import Git, Repo
 from github import Github, GithubObject, InputGitAuthor, InputGitTreeElement
-from packaging.version import Version
+from github.PullRequest import PullRequest
+from urllib3.util.retry import Retry
+
+from .git_changes import (ADDED, DELETED, RENAMED, FileChange,
+                          get_working_tree_changes, read_head_files)
+from .github_graphql import DEFAULT_GRAPHQL_URL, GitHubGraphQL, GraphQLError
+from .http_cache import DEFAULT_MAX_BYTES, HttpCache
+from .polling import poll_until
+from .rate_limit import (PRIORITY_HIGH, PRIORITY_LOW, GitHubHTTPAdapter,
+                         RateLimitScheduler, request_priority)
+from .repo_index import RepoIndex
+from .requirements_diff import is_requirements_file, iter_file_diffs
+from .tracing import GIT, tracer
+from .upgrade_policy import UpgradePolicy
 
 logging.basicConfig()
 logger = logging.getLogger()
+
+DEFAULT_API_URL = 'https://api.github.com'
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (500, 502, 503, 504)
 logger.setLevel(logging.INFO)
 
+# A local file that is uploaded straight from disk rather than read into memory.
+LocalBlob = namedtuple('LocalBlob', ['full_path', 'size'])
+
+
+def _ignore_checkpoint(step, value):  # pylint: disable=unused-argument
+    """
+    Stand in for the checkpoint of create_pull_request when the caller does not keep track of steps.
+    """
+
+
+class Base64BlobPayload:
+    """
+    File-like JSON body for a create-blob request, read straight from ``data``.
+
+    ``data`` is any buffer, typically a memory-mapped file. It is base64-encoded
+    a slice at a time as the request body is read, so memory use does not grow
+    with the size of the file.
+    """
+    PREFIX = b'{"encoding": "base64", "content": "'
+    SUFFIX = b'"}'
+    # Must be a multiple of 3 so that the encoded slices can be concatenated.
+    SLICE_SIZE = 3 * 64 * 1024
+
+    def __init__(self, data):
+        self._data = data
+        self._chunks = self._iter_chunks()
+        # Read bytes are deleted from the front, which bytearray does without copying the rest.
+        self._buffer = bytearray()
+
+    def __len__(self):
+        return len(self.PREFIX) + 4 * ((len(self._data) + 2) // 3) + len(self.SUFFIX)
+
+    def _iter_chunks(self):
+        yield self.PREFIX
+        for start in range(0, len(self._data), self.SLICE_SIZE):
+            yield base64.b64encode(self._data[start:start + self.SLICE_SIZE])
+        yield self.SUFFIX
+
+    def read(self, size=-1):
+        """
+        Return up to ``size`` bytes of the body, or the rest of it if ``size`` is negative.
+        """
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
 
 class GitHubHelper:  # pylint: disable=missing-class-docstring
 
@@ -24,7 +102,31 @@ class GitHubHelper:  # pylint: disable=missing-class-docstring
         self._set_github_token()
         self._set_user_email()
         self._set_github_instance()
+        self._set_session()
+        self.graphql = GitHubGraphQL(
+            self.session, self.github_token, os.environ.get('GITHUB_GRAPHQL_URL') or DEFAULT_GRAPHQL_URL
+        )
+        self._repo_index = None
         self.AUTOMERGE_ACTION_VAR = 'AUTOMERGE_PYTHON_DEPENDENCIES_UPGRADES_PR'
+        self.upgrade_policy = UpgradePolicy.load(os.environ.get('UPGRADE_POLICY_FILE'))
+        # Only pull requests with this title have their requirement upgrades verified.
+        self.UPGRADE_PR_TITLE = 'Python Requirements Update'
+        # Label for upgrade pull requests that may be merged automatically.
+        self.AUTOMERGE_LABEL = 'Ready to Merge'
+        # How the comments left by verify_upgrade_packages start, so they can be found again.
+        self.VALID_UPGRADES_SUMMARY = 'List of packages in the PR without any issue'
+        self.MANUAL_REVIEW_SUMMARY = 'These Packages need manual review.'
+        # Hidden comment in the body of a pull request recording the fingerprint of its content.
+        self.FINGERPRINT_MARKER = '<!-- content-fingerprint: {} -->'
+        # Change sets with at least this many files are uploaded as separate blobs
+        # by a pool of workers, instead of inline in one big tree payload.
+        self.blob_upload_min_files = 50
+        self.blob_upload_workers = 8
+        # Maximum number of entries sent in a single create_git_tree request.
+        self.tree_chunk_size = 500
+        # Files larger than this are streamed from disk instead of read into memory.
+        self.large_file_threshold = 1024 * 1024
+        self.close_pull_request_workers = 4
 
     # FIXME: Does nothing, sets variable to None if env var missing
     def _set_github_token(self):
@@ -47,23 +149,80 @@ class GitHubHelper:  # pylint: disable=missing-class-docstring
             ) from error
 
     def _set_github_instance(self):
+        """
+        Create the PyGithub client, leaving request spacing to our RateLimitScheduler.
+
+        The API root can be changed with GITHUB_API_URL, e.g. for GitHub Enterprise
+        or a local test server.
+        """
+        self.github_api_url = os.environ.get('GITHUB_API_URL') or DEFAULT_API_URL
         try:
-            self.github_instance = Github(self.github_token)
+            self.github_instance = Github(
+                self.github_token, base_url=self.github_api_url,
+                seconds_between_requests=None, seconds_between_writes=None,
+            )
         except Exception as error:
             raise Exception(
                 "Failed connecting to Github. " +
                 "Please make sure the github token is accurate and try again."
             ) from error
 
-    def _add_reason(self, req, reason):
-        req['reason'] = reason
-        return req
+    def _set_session(self):
+        """
+        Create the HTTP session shared by the raw API requests and the PyGithub client.
 
-    def _add_comment_about_reqs(self, pr, summary, reqs):
-        separator = "\n"
-        pr.create_issue_comment(
-            f"{summary}.</br> \n {separator.join(self.make_readable_string(req) for req in reqs)}"
+        Every request made through the session waits on a RateLimitScheduler.
+        If GITHUB_HTTP_CACHE_DIR is set, GETs made through the session are cached
+        there and replayed as conditional requests.
+
+        Connections are kept alive in a pool of GITHUB_HTTP_POOL_SIZE connections
+        per host. Idempotent requests that fail to connect, time out or get a 5xx
+        response are retried up to GITHUB_HTTP_MAX_RETRIES times, with exponential
+        backoff starting at GITHUB_HTTP_RETRY_BACKOFF seconds.
+        """
+        self.rate_limiter = RateLimitScheduler()
+        self.http_cache = None
+        cache_dir = os.environ.get('GITHUB_HTTP_CACHE_DIR')
+        if cache_dir:
+            max_bytes = int(os.environ.get('GITHUB_HTTP_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+            self.http_cache = HttpCache(cache_dir, scope=self.github_token or '', max_bytes=max_bytes)
+
+        self.session = requests.Session()
+        # Stop requests from replacing our Authorization headers with .netrc credentials.
+        self.session.auth = lambda request: request
+        pool_size = int(os.environ.get('GITHUB_HTTP_POOL_SIZE', DEFAULT_POOL_SIZE))
+        retries = Retry(
+            total=int(os.environ.get('GITHUB_HTTP_MAX_RETRIES', DEFAULT_MAX_RETRIES)),
+            backoff_factor=float(os.environ.get('GITHUB_HTTP_RETRY_BACKOFF', DEFAULT_RETRY_BACKOFF)),
+            status_forcelist=RETRY_STATUSES,
+            # Rate limited responses are retried by the GitHubHTTPAdapter itself.
+            respect_retry_after_header=False,
+            # Hand the last 5xx response back to the caller instead of raising.
+            raise_on_status=False,
+        )
+        adapter = GitHubHTTPAdapter(
+            self.http_cache, self.rate_limiter,
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries,
         )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # PyGithub makes its requests through a requests.Session of its own;
+        # swap it for ours so both kinds of calls share the cache and connections.
+        requester = self.github_instance._Github__requester  # pylint: disable=protected-access
+        connection = requester._Requester__createConnection()  # pylint: disable=protected-access
+        connection.session.close()
+        connection.session = self.session
+
+    def get_http_cache_stats(self):
+        """
+        Return the HTTP cache counters, or None if caching is disabled.
+        """
+        return self.http_cache.stats() if self.http_cache else None
+
+    def _comment_about_reqs(self, summary, reqs):
+        separator = "\n"
+        return f"{summary}.</br> \n {separator.join(self.make_readable_string(req) for req in reqs)}"
 
     def get_github_instance(self):
         return self.github_instance
@@ -71,24 +230,43 @@ class GitHubHelper:  # pylint: disable=missing-class-docstring
     def get_github_token(self):
         return self.github_token
 
-    # FIXME: Probably can end up picking repo from wrong org if two
-    # repos have the same name in different orgs.
-    #
-    # Use repo_from_remote instead, and delete this when no longer in use.
     def connect_to_repo(self, github_instance, repo_name):
         """
         Get the repository object of the desired repo.
+
+        ``repo_name`` is preferably ``org/name``; a bare name is only accepted if a
+        single organization has a repository by that name. Names are resolved with
+        a persistent RepoIndex, so a warm lookup makes no API calls. Full names that
+        are not in the index are fetched directly.
         """
-        repos_list = github_instance.get_user().get_repos()
-        for repo in repos_list:
-            if repo.name == repo_name:
-                return repo
+        if self._repo_index is None or self._repo_index.github_instance is not github_instance:
+            self._repo_index = RepoIndex(github_instance, self._repo_index_path())
 
-        raise Exception(
+        full_name = self._repo_index.lookup(repo_name)
+        if full_name:
+            return github_instance.get_repo(full_name, lazy=True)
+
+        error_message = (
             "Could not connect to the repository: {}. "
             "Please make sure you are using the correct "
             "credentials and try again.".format(repo_name)
         )
+        if '/' not in repo_name:
+            raise Exception(error_message)
+        try:
+            return github_instance.get_repo(repo_name)
+        except Exception as error:
+            raise Exception(error_message) from error
+
+    def _repo_index_path(self):
+        """
+        Return where the repository index for this token is kept.
+
+        The directory can be set with GITHUB_REPO_INDEX_DIR.
+        """
+        index_dir = os.environ.get('GITHUB_REPO_INDEX_DIR') or os.path.expanduser('~/.cache/testeng-ci')
+        scope = hashlib.sha256((self.github_token or '').encode('utf-8')).hexdigest()[:16]
+        return os.path.join(index_dir, 'repo-index-{}.json'.format(scope))
 
     def repo_from_remote(self, repo_root, remote_name_allow_list=None):
         """
@@ -103,10 +281,13 @@ class GitHubHelper:  # pylint: disable=missing-class-docstring
             # end is not included in repo name match.
             r"https?://(www\.)?github\.com/(?P<name>[^/?#]+/[^/?#]+?)(/|\.git)?"
         ]
-        for remote in Repo(repo_root).remotes:
-            if remote_name_allow_list and remote.name not in remote_name_allow_list:
-                continue
-            for url in remote.urls:
+        with tracer.span(GIT, 'remote'):
+            remotes = [
+                (remote.name, list(remote.urls)) for remote in Repo(repo_root).remotes
+                if not remote_name_allow_list or remote.name in remote_name_allow_list
+            ]
+        for _, urls in remotes:
+            for url in urls:
                 for pattern in patterns:
                     m = re.fullmatch(pattern, url)
                     if m:
@@ -129,30 +310,50 @@ class GitHubHelper:  # pylint: disable=missing-class-docstring
         """
         Get current commit ID of repo at repo_root.
         """
-        return Git(repo_root).rev_parse('HEAD')
+        with tracer.span(GIT, 'rev-parse'):
+            return Git(repo_root).rev_parse('HEAD')
 
     def get_updated_files_list(self, repo_root, untracked_files_required=False):
         """
-        Use the Git library to run the ls-files command to find
-        the list of files updated.
+        Return the working tree changes in ``repo_root`` as FileChange entries.
+
+        Untracked files are only included if ``untracked_files_required`` is set.
         """
-        git_instance = Git(repo_root)
-        git_instance.init()
+        return get_working_tree_changes(repo_root, untracked_files_required)
 
-        if untracked_files_required:
-            modified_files = git_instance.ls_files("--modified")
-            untracked_files = git_instance.ls_files("--others", "--exclude-standard")
-            updated_files = modified_files + '\n' + untracked_files \
-                if (len(modified_files) > 0 and len(untracked_files) > 0) \
-                else modified_files + untracked_files
+    def classify_local_requirement_changes(self, repo_root, file_path_list):
+        """
+        Classify the requirement changes in the working tree of ``repo_root`` without asking GitHub.
 
-        else:
-            updated_files = git_instance.ls_files("--modified")
+        ``file_path_list`` holds paths or FileChange entries, as for update_list_of_files.
+        The HEAD and working versions of the changed requirements files are compared
+        in the same way as the diff of a pull request, so the result matches what
+        compare_pr_differnce would make of the pull request created from them.
+        """
+        changes = [
+            change if isinstance(change, FileChange) else FileChange(None, change, None, None)
+            for change in file_path_list
+        ]
+        changes = [
+            change for change in changes
+            if is_requirements_file(change.path) or (change.old_path and is_requirements_file(change.old_path))
+        ]
+        head_contents = read_head_files(repo_root, [
+            change.old_path or change.path for change in changes if change.kind != ADDED
+        ])
 
-        if len(updated_files) > 0:
-            return updated_files.split("\n")
-        else:
-            return []
+        def iter_files():
+            for change in changes:
+                old_path = change.old_path or change.path
+                old_content = head_contents.get(old_path)
+                new_text = None
+                if change.kind != DELETED:
+                    with open(os.path.join(repo_root, change.path), 'rb') as new_file:
+                        new_text = new_file.read().decode('utf-8', 'replace')
+                old_text = old_content.decode('utf-8', 'replace') if old_content is not None else None
+                yield old_path, change.path, old_text, new_text
+
+        return self.compare_pr_differnce(iter_file_diffs(iter_files()))
 
     def create_branch(self, repository, branch_name, sha):
         """
@@ -167,38 +368,174 @@ class GitHubHelper:  # pylint: disable=missing-class-docstring
             ) from error
         return branch_object
 
+    def refresh_pull_request(self, repository, pull_request, sha, body, requirement_changes=None):
+        """
+        Point the head branch of an existing pull request at ``sha`` and replace its body.
+
+        The branch is force-updated, so the pull request keeps its number, reviewers,
+        labels and comments while its changes are replaced by those in ``sha``. The
+        upgrades of an upgrade PR are verified again, with requirement_changes as in
+        verify_upgrade_packages, so that its comments and labels describe the new changes.
+        """
+        branch_name = pull_request.head.ref
+        try:
+            with request_priority(PRIORITY_HIGH):
+                repository.get_git_ref("heads/{}".format(branch_name)).edit(sha, force=True)
+                pull_request.edit(body=body)
+        except Exception as error:
+            raise Exception(
+                "Unable to update pull request "
+                "https://github.com/{}/pull/{}".format(repository.full_name, pull_request.number)
+            ) from error
+        if pull_request.title == self.UPGRADE_PR_TITLE:
+            with tracer.phase('verify'):
+                self.update_upgrade_verification(pull_request, requirement_changes)
+        return pull_request
+
+    def find_bot_pull_requests(self, repository, user_login, branch_prefix, target_branch='master'):
+        """
+        Find open PRs by ``user_login`` against ``target_branch`` from branches starting with ``branch_prefix``.
+
+        The search API does the filtering on the server, so the cost scales with the
+        number of matching PRs rather than with every open PR on the repository. Only
+        PRs whose head branch lives in ``repository`` itself are returned.
+        """
+        query = 'repo:{} is:pr is:open author:{} base:{} head:{}'.format(
+            repository.full_name, user_login, target_branch, branch_prefix
+        )
+        pulls = []
+        for issue in self.github_instance.search_issues(query, sort='created', order='asc'):
+            pr = issue.as_pull_request()
+            # Search matching is fuzzier than we want, so check the results again.
+            if self._is_bot_pull_request(repository, pr, user_login, branch_prefix, target_branch):
+                pulls.append(pr)
+        return pulls
+
+    def _is_bot_pull_request(self, repository, pr, user_login, branch_prefix, target_branch):
+        """
+        Return whether ``pr`` is by ``user_login``, against ``target_branch``, from a branch of ``repository``
+        starting with ``branch_prefix``.
+        """
+        if not (pr.user.login == user_login and pr.base.ref == target_branch and
+                pr.head.ref.startswith(branch_prefix)):
+            return False
+        return pr.head.repo is not None and pr.head.repo.full_name == repository.full_name
+
+    def add_fingerprint_to_body(self, body, fingerprint):
+        """
+        Return ``body`` with a hidden comment recording the content fingerprint of the pull request.
+        """
+        return "{}\n\n{}".format(body, self.FINGERPRINT_MARKER.format(fingerprint))
+
+    def find_pull_request_by_fingerprint(self, repository, user_login, branch_prefix, fingerprint,
+                                         target_branch='master'):
+        """
+        Return an open bot PR, as found by find_bot_pull_requests, whose content has ``fingerprint``.
+
+        Returns None if no such PR exists.
+
+        The first page of open PRs against ``target_branch`` comes with their bodies, so
+        on most repositories a single request settles it. Only when there are more open
+        PRs than fit on that page does this fall back to the search, which costs a search
+        request plus a request for each bot PR it finds.
+        """
+        marker = self.FINGERPRINT_MARKER.format(fingerprint)
+        first_page = repository.get_pulls(state='open', base=target_branch).get_page(0)
+        if len(first_page) < self.github_instance.per_page:
+            pulls = [
+                pr for pr in first_page
+                if self._is_bot_pull_request(repository, pr, user_login, branch_prefix, target_branch)
+            ]
+        else:
+            pulls = self.find_bot_pull_requests(repository, user_login, branch_prefix, target_branch)
+        for pr in pulls:
+            if marker in (pr.body or ''):
+                return pr
+        return None
+
     def close_existing_pull_requests(self, repository, user_login, user_name, target_branch='master',
-                                     branch_name_filter=None):
+                                     branch_name_filter=None, branch_prefix=None):
         """
         Close any existing PR's by the bot user in this PR. This will help
         reduce clutter, since any old PR's will be obsolete.
         If function branch_name_filter is specified, it will be called with
         branch names of PRs. The PR will only be closed when the function
         returns true.
+        If branch_prefix is specified, only PRs from branches starting with it
+        are considered, and they are looked up with a server side search instead
+        of by listing every open PR on the repository.
         """
-        pulls = repository.get_pulls(state="open")
-        deleted_pull_numbers = []
-        for pr in pulls:
-            user = pr.user
-            if user.login == user_login and user.name == user_name and pr.base.ref == target_branch:
-                branch_name = pr.head.ref
-                if branch_name_filter and not branch_name_filter(branch_name):
-                    continue
-                logger.info("Deleting PR: #{}".format(pr.number))
-                pr.create_issue_comment("Closing obsolete PR.")
-                pr.edit(state="closed")
-                deleted_pull_numbers.append(pr.number)
+        if branch_prefix:
+            pulls = self.find_bot_pull_requests(repository, user_login, branch_prefix, target_branch)
+        else:
+            pulls = [
+                pr for pr in repository.get_pulls(state="open")
+                if pr.user.login == user_login and pr.user.name == user_name and pr.base.ref == target_branch
+            ]
+        if branch_name_filter:
+            pulls = [pr for pr in pulls if branch_name_filter(pr.head.ref)]
 
-                self.delete_branch(repository, branch_name)
-        return deleted_pull_numbers
+        with ThreadPoolExecutor(max_workers=self.close_pull_request_workers) as executor:
+            # Each worker runs in a copy of our context, so request priorities and trace phases carry over.
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._close_pull_request, repository, pr)
+                for pr in pulls
+            ]
+            return [future.result() for future in futures]
+
+    def _close_pull_request(self, repository, pr):
+        """
+        Comment on and close an obsolete PR, delete its branch and return its number.
+        """
+        logger.info("Deleting PR: #{}".format(pr.number))
+        with request_priority(PRIORITY_LOW):
+            pr.create_issue_comment("Closing obsolete PR.")
+        pr.edit(state="closed")
+        self.delete_branch(repository, pr.head.ref)
+        return pr.number
 
     def create_pull_request(self, repository, title, body, base, head, user_reviewers=GithubObject.NotSet,
-                            team_reviewers=GithubObject.NotSet, verify_reviewers=True, draft=False):
+                            team_reviewers=GithubObject.NotSet, verify_reviewers=True, draft=False,
+                            use_graphql=False, requirement_changes=None, checkpoint=None):
         """
         Create a new pull request with the changes in head. And tag a list of teams
         for a review.
+
+        If use_graphql is set, the pull request is created and annotated through the
+        GraphQL API, falling back to REST if GitHub refuses to create it that way. If the
+        pull request turns out to exist all the same, it is finished with REST instead.
+        requirement_changes is passed on to verify_upgrade_packages.
+
+        If given, checkpoint(step, value) is called as each step finishes: 'pull_request'
+        with the number of the new pull request, then 'reviewers' and 'comments'.
         """
-        try:
+        checkpoint = checkpoint or _ignore_checkpoint
+        if use_graphql:
+            try:
+                pull_request = self._create_pull_request_graphql(
+                    repository, title, body, base, head, user_reviewers, team_reviewers, verify_reviewers, draft,
+                    checkpoint
+                )
+            except GraphQLError as error:
+                # The mutation may have succeeded on GitHub's side even though its response failed.
+                pull_request = self._find_open_pull_request(repository, base, head)
+                if pull_request is not None:
+                    logger.warning("Creating the PR with GraphQL failed, but it was created as #%s: %s",
+                                   pull_request.number, error)
+                    checkpoint('pull_request', pull_request.number)
+                    return self.finish_pull_request(
+                        repository, pull_request, user_reviewers, team_reviewers, verify_reviewers,
+                        requirement_changes=requirement_changes, checkpoint=checkpoint
+                    )
+                logger.warning("Creating the PR with GraphQL failed, falling back to REST: %s", error)
+            else:
+                checkpoint('reviewers', None)
+                return self.finish_pull_request(
+                    repository, pull_request, use_graphql=True, requirement_changes=requirement_changes,
+                    checkpoint=checkpoint, completed=('reviewers',)
+                )
+
+        with request_priority(PRIORITY_HIGH):
             pull_request = repository.create_pull(
                 title=title,
                 body=body,
@@ -206,33 +543,114 @@ class GitHubHelper:  # pylint: disable=missing-class-docstring
                 head=head,
                 draft=draft
             )
-        except Exception as e:
-            raise e
+        checkpoint('pull_request', pull_request.number)
 
-        try:
-            any_reviewers = (user_reviewers is not GithubObject.NotSet or team_reviewers is not GithubObject.NotSet)
-            if any_reviewers:
-                logger.info("Tagging reviewers: users=%s and teams=%s", user_reviewers, team_reviewers)
-                pull_request.create_review_request(
-                    reviewers=user_reviewers,
-                    team_reviewers=team_reviewers,
+        return self.finish_pull_request(
+            repository, pull_request, user_reviewers, team_reviewers, verify_reviewers,
+            requirement_changes=requirement_changes, checkpoint=checkpoint
+        )
+
+    def finish_pull_request(self, repository, pull_request, user_reviewers=GithubObject.NotSet,
+                            team_reviewers=GithubObject.NotSet, verify_reviewers=True, use_graphql=False,
+                            requirement_changes=None, checkpoint=None, completed=()):
+        """
+        Tag reviewers on a pull request that was just created, and verify its upgrades.
+
+        Steps named in completed, 'reviewers' or 'comments', are skipped, so that a run
+        that stopped half way through can finish the job. checkpoint is called as in
+        create_pull_request.
+        """
+        checkpoint = checkpoint or _ignore_checkpoint
+        if 'reviewers' not in completed:
+            try:
+                any_reviewers = (
+                    user_reviewers is not GithubObject.NotSet or team_reviewers is not GithubObject.NotSet
                 )
-                if verify_reviewers:
-                    # Sometimes GitHub can't find the pull request we just made.
-                    # Try waiting a moment before asking about it.
-                    time.sleep(5)
-                    self.verify_reviewers_tagged(pull_request, user_reviewers, team_reviewers)
+                if any_reviewers:
+                    logger.info("Tagging reviewers: users=%s and teams=%s", user_reviewers, team_reviewers)
+                    with request_priority(PRIORITY_HIGH):
+                        pull_request.create_review_request(
+                            reviewers=user_reviewers,
+                            team_reviewers=team_reviewers,
+                        )
+                    if verify_reviewers:
+                        # Sometimes GitHub can't find the pull request we just made,
+                        # so keep asking about it until the review requests show up.
+                        poll_until(
+                            lambda: self.verify_reviewers_tagged(pull_request, user_reviewers, team_reviewers),
+                            "Review requests for PR #{}".format(pull_request.number),
+                            is_ready=lambda result: True,
+                        )
 
+            except Exception as e:
+                raise Exception(
+                    "Some reviewers could not be tagged on new PR "
+                    "https://github.com/{}/pull/{}".format(repository.full_name, pull_request.number)
+                ) from e
+            checkpoint('reviewers', None)
+
+        if 'comments' not in completed:
+            # it's a discovery work that's why only enabled for repo-health-data.
+            if pull_request.title == self.UPGRADE_PR_TITLE:
+                with tracer.phase('verify'):
+                    self.verify_upgrade_packages(pull_request, use_graphql=use_graphql,
+                                                 requirement_changes=requirement_changes)
+            checkpoint('comments', None)
+
+        return pull_request
+
+    def _find_open_pull_request(self, repository, base, head):
+        """
+        Return the open pull request from the ``head`` branch of ``repository`` into ``base``, or None.
+        """
+        head_ref_name = head[len('refs/heads/'):] if head.startswith('refs/heads/') else head
+        head = '{}:{}'.format(repository.owner.login, head_ref_name)
+        return next(iter(repository.get_pulls(state='open', base=base, head=head)), None)
+
+    def _create_pull_request_graphql(self, repository, title, body, base, head, user_reviewers, team_reviewers,
+                                     verify_reviewers, draft, checkpoint):
+        """
+        Create a pull request and request its reviews with GraphQL mutations.
+
+        Raises GraphQLError only if the pull request itself could not be created.
+        """
+        head_ref_name = head[len('refs/heads/'):] if head.startswith('refs/heads/') else head
+        with request_priority(PRIORITY_HIGH):
+            created = self.graphql.create_pull_request(repository.node_id, title, body, base, head_ref_name, draft)
+        # Build the PyGithub object from what we already know; anything else is fetched lazily.
+        pull_request = PullRequest(
+            repository._requester, {}, {  # pylint: disable=protected-access
+                'url': '{}/pulls/{}'.format(repository.url, created['number']),
+                'html_url': created['url'],
+                'number': created['number'],
+                'node_id': created['id'],
+                'title': created['title'],
+                'body': created['body'],
+            },
+            completed=False,
+        )
+        checkpoint('pull_request', pull_request.number)
+
+        users = [] if user_reviewers is GithubObject.NotSet else list(user_reviewers)
+        teams = [] if team_reviewers is GithubObject.NotSet else list(team_reviewers)
+        if not users and not teams:
+            return pull_request
+        try:
+            logger.info("Tagging reviewers: users=%s and teams=%s", users, teams)
+            user_ids, team_ids = self.graphql.get_reviewer_ids(repository.owner.login, users, teams)
+            with request_priority(PRIORITY_HIGH):
+                tagged_users, tagged_teams = self.graphql.request_reviews(created['id'], user_ids, team_ids)
+            # The mutation returns the review requests, so there is nothing to wait for.
+            tagged_team_names = {name for team in tagged_teams for name in team}
+            if verify_reviewers and not (set(users) <= set(tagged_users) and set(teams) <= tagged_team_names):
+                logger.info("Reviewer tagging failure: Requested %s and %s, actually tagged %s and %s",
+                            users, teams, tagged_users, tagged_teams)
+                raise Exception('Some of the requested reviewers were not tagged on PR for review')
         except Exception as e:
             raise Exception(
                 "Some reviewers could not be tagged on new PR "
                 "https://github.com/{}/pull/{}".format(repository.full_name, pull_request.number)
             ) from e
-
-        # it's a discovery work that's why only enabled for repo-health-data.
-        if pull_request.title == 'Python Requirements Update':
-            self.verify_upgrade_packages(pull_request)
-
         return pull_request
 
     def verify_reviewers_tagged(self, pull_request, requested_users, requested_teams):
@@ -258,43 +676,132 @@ class GitHubHelper:  # pylint: disable=missing-class-docstring
             logger.info("Team taggging failure: Requested %s, actually tagged %s", requested_teams, tagged_teams)
             raise Exception('Some of the requested teams were not tagged on PR for review')
 
-    def verify_upgrade_packages(self, pull_request):
+    def verify_upgrade_packages(self, pull_request, use_graphql=False, requirement_changes=None):
         """
         Iterate on pull request diff and parse the packages and check the versions.
         If all versions are upgrading then add a label ready for auto merge. In case of any downgrade package
         add a comment on PR.
+        If use_graphql is set, all comments and labels are added with a single GraphQL mutation.
+        If requirement_changes is given, as returned by classify_local_requirement_changes, it is
+        used instead of downloading the diff of the pull request.
         """
         location = None
-        location = pull_request._headers['location']    # pylint: disable=protected-access
+        location = pull_request._headers.get('location') or pull_request.url  # pylint: disable=protected-access
         logger.info(location)
 
         if not location:
             return
 
-        logger.info('Hitting pull request for difference')
-        headers = {"Accept": "application/vnd.github.v3.diff", "Authorization": f'Bearer {self.github_token}'}
-
-        load_content = requests.get(location, headers=headers, timeout=5)
-        txt = ''
-        time.sleep(3)
-        logger.info(load_content.status_code)
+        if requirement_changes is None:
+            requirement_changes = self._fetch_requirement_changes(location)
 
-        if load_content.status_code == 200:
-            txt = load_content.content.decode('utf-8')
-            valid_reqs, suspicious_reqs = self.compare_pr_differnce(txt)
+        if requirement_changes is not None:
+            comments, labels = self._verification_comments_and_labels(location, *requirement_changes)
 
-            self._add_comment_about_reqs(pull_request, "List of packages in the PR without any issue", valid_reqs)
+            if use_graphql:
+                self._add_comments_and_labels_graphql(pull_request, location, comments, labels)
+                return
 
-            if not suspicious_reqs and valid_reqs:
-                if self.check_automerge_variable_value(location):
-                    pull_request.set_labels('Ready to Merge')
-                    logger.info("Total valid upgrades are %s", valid_reqs)
-            else:
-                self._add_comment_about_reqs(pull_request, "These Packages need manual review.", suspicious_reqs)
+            with request_priority(PRIORITY_LOW):
+                for comment in comments:
+                    pull_request.create_issue_comment(comment)
+                if labels:
+                    pull_request.set_labels(*labels)
 
         else:
             logger.info("No package available for comparison.")
 
+    def update_upgrade_verification(self, pull_request, requirement_changes=None):
+        """
+        Bring the comments and label left by verify_upgrade_packages up to date with new changes.
+
+        Comments that no longer hold are edited, or deleted if there are more than needed,
+        and the automerge label is taken off if the new upgrades do not qualify for it.
+        If requirement_changes is not given, the diff of the pull request is downloaded.
+        """
+        location = pull_request.url
+        if requirement_changes is None:
+            requirement_changes = self._fetch_requirement_changes(location)
+        if requirement_changes is None:
+            logger.info("No package available for comparison.")
+            return
+
+        comments, labels = self._verification_comments_and_labels(location, *requirement_changes)
+        summaries = (self.VALID_UPGRADES_SUMMARY, self.MANUAL_REVIEW_SUMMARY)
+        with request_priority(PRIORITY_LOW):
+            old_comments = [
+                comment for comment in pull_request.get_issue_comments()
+                if comment.user.login == pull_request.user.login and comment.body.startswith(summaries)
+            ]
+            for old_comment, comment in zip(old_comments, comments):
+                if old_comment.body != comment:
+                    old_comment.edit(comment)
+            for comment in comments[len(old_comments):]:
+                pull_request.create_issue_comment(comment)
+            for old_comment in old_comments[len(comments):]:
+                old_comment.delete()
+
+            has_label = any(label.name == self.AUTOMERGE_LABEL for label in pull_request.labels)
+            if has_label and not labels:
+                logger.info("Removing the %s label from PR #%s", self.AUTOMERGE_LABEL, pull_request.number)
+                pull_request.remove_from_labels(self.AUTOMERGE_LABEL)
+            elif labels and not has_label:
+                pull_request.add_to_labels(*labels)
+
+    def _verification_comments_and_labels(self, location, valid_reqs, suspicious_reqs):
+        """
+        Return the comments and labels verify_upgrade_packages puts on the pull request at ``location``.
+        """
+        comments = [self._comment_about_reqs(self.VALID_UPGRADES_SUMMARY, valid_reqs)]
+        labels = []
+        if not suspicious_reqs and valid_reqs:
+            if self.check_automerge_variable_value(location):
+                labels.append(self.AUTOMERGE_LABEL)
+                logger.info("Total valid upgrades are %s", valid_reqs)
+        else:
+            comments.append(self._comment_about_reqs(self.MANUAL_REVIEW_SUMMARY, suspicious_reqs))
+        return comments, labels
+
+    def _fetch_requirement_changes(self, location):
+        """
+        Download the diff of the pull request at ``location`` and classify its requirement changes.
+
+        Returns None if the diff could not be fetched.
+        """
+        logger.info('Hitting pull request for difference')
+        headers = {"Accept": "application/vnd.github.v3.diff", "Authorization": f'Bearer {self.github_token}'}
+
+        load_content = poll_until(
+            lambda: self.session.get(location, headers=headers, timeout=5, stream=True),
+            "Diff for PR {}".format(location),
+            # GitHub answers 404 until it has caught up with the new pull request
+            is_ready=lambda response: response.status_code != 404 and response.status_code < 500,
+        )
+        logger.info(load_content.status_code)
+
+        with load_content:
+            if load_content.status_code != 200:
+                return None
+            return self.compare_pr_differnce(load_content.iter_lines())
+
+    def _add_comments_and_labels_graphql(self, pull_request, location, comments, labels):
+        """
+        Add comments and labels to a PR in one GraphQL mutation, falling back to REST calls.
+        """
+        owner, name = re.search(r'/repos/([^/]+)/([^/]+)/pulls/', location).groups()
+        try:
+            label_ids = self.graphql.get_label_ids(owner, name, labels) if labels else []
+            with request_priority(PRIORITY_LOW):
+                self.graphql.add_comments_and_labels(pull_request.node_id, comments, label_ids)
+            return
+        except GraphQLError as error:
+            logger.warning("Commenting with GraphQL failed, falling back to REST: %s", error)
+        with request_priority(PRIORITY_LOW):
+            for comment in comments:
+                pull_request.create_issue_comment(comment)
+            if labels:
+                pull_request.set_labels(*labels)
+
     def check_automerge_variable_value(self, location):
         """
         Check whether repository has the `AUTOMERGE_PYTHON_DEPENDENCIES_UPGRADES_PR` variable
@@ -305,89 +812,47 @@ class GitHubHelper:  # pylint: disable=missing-class-docstring
         logger.info('Hitting repository to check AUTOMERGE_ACTION_VAR settings.')
 
         headers = {"Accept": "application/vnd.github+json", "Authorization": f'Bearer {self.github_token}'}
-        load_content = requests.get(get_repo_variable, headers=headers, timeout=5)
-        time.sleep(1)
+        load_content = self.session.get(get_repo_variable, headers=headers, timeout=5)
 
         if load_content.status_code == 200:
             val = literal_eval(load_content.json()['value'])
             logger.info(f"AUTOMERGE_ACTION_VAR value is {val}")
             return val
 
+        if load_content.status_code != 404:
+            logger.warning("Unable to read %s, got status %s", self.AUTOMERGE_ACTION_VAR, load_content.status_code)
         return False
 
     def compare_pr_differnce(self, txt):
-        """ Parse the content and extract packages for comparison. """
-        regex = re.compile(r"(?P<change>[\-\+])(?P<name>[\w][\w\-\[\]]+)==(?P<version>\d+\.\d+(\.\d+)?(\.[\w]+)?)")
-        reqs = {}
-        if not txt:
-            return [], []
-
-        # skipping zeroth index  as it will be empty
-        files = txt.split("diff --git")[1:]
-        for file in files:
-            lines = file.split("\n")
-            filename_match = re.search(r"[\w\-\_]*.txt", lines[0])
-            if not filename_match:
-                continue
-            filename = filename_match[0]
-            reqs[filename] = {}
-            for line in lines:
-                match = re.match(regex, line)
-                if match:
-                    groups = match.groupdict()
-                    keys = ('new_version', 'old_version') if groups['change'] == '+' \
-                        else ('old_version', 'new_version')
-                    if groups['name'] in reqs[filename]:
-                        reqs[filename][groups['name']][keys[0]] = groups['version']
-                    else:
-                        reqs[filename][groups['name']] = {keys[0]: groups['version'], keys[1]: None}
-        combined_reqs = []
-        for file, lst in reqs.items():
-            for name, versions in lst.items():
-                combined_reqs.append(
-                    {"name": name, 'old_version': versions['old_version'], 'new_version': versions['new_version']}
-                )
-
-        unique_reqs = [dict(s) for s in set(frozenset(d.items()) for d in combined_reqs)]
-        valid_reqs = []
-        suspicious_reqs = []
-        for req in unique_reqs:
-            if req['new_version'] and req['old_version']:  # if both values exits then do version comparison
-                old_version = Version(req['old_version'])
-                new_version = Version(req['new_version'])
+        """
+        Parse the content and extract packages for comparison.
 
-                # skip, if the package location is changed in txt file only and both versions are same
-                if old_version == new_version:
-                    continue
-                if new_version > old_version:
-                    if new_version.major == old_version.major:
-                        valid_reqs.append(req)
-                    else:
-                        suspicious_reqs.append(self._add_reason(req, "MAJOR"))
-                else:
-                    suspicious_reqs.append(self._add_reason(req, "DOWNGRADE"))
-            else:
-                if req['new_version']:
-                    suspicious_reqs.append(self._add_reason(req, "NEW"))
-                else:
-                    suspicious_reqs.append(self._add_reason(req, "REMOVED"))
+        ``txt`` is either the whole diff as a string, or an iterable of its lines
+        (``str`` or ``bytes``) so that large diffs can be streamed. Changes are
+        judged by ``self.upgrade_policy``.
+        """
+        return self.upgrade_policy.classify_diff(txt)
 
-        return sorted(valid_reqs, key=lambda d: d['name']), sorted(suspicious_reqs, key=lambda d: d['name'])
+    def compare_pr_differences(self, diffs):
+        """
+        Run compare_pr_differnce on each of ``diffs``, sharing parsed versions and policy lookups.
+        """
+        return self.upgrade_policy.classify_diffs(diffs)
 
     def make_readable_string(self, req):
         """making string for readability"""
-        if 'reason' in req:
-            if req['reason'] == 'NEW':
-                return f"- **[{req['reason']}]**  `{req['name']}`" \
-                       f" (`{req['new_version']}`) added to the requirements"
-            if req['reason'] == 'REMOVED':
-                return f"- **[{req['reason']}]**  `{req['name']}`" \
-                       f" (`{req['old_version']}`) removed from the requirements"
+        if req.reason:
+            if req.reason == 'NEW':
+                return f"- **[{req.reason}]**  `{req.name}`" \
+                       f" (`{req.new_version}`) added to the requirements"
+            if req.reason == 'REMOVED':
+                return f"- **[{req.reason}]**  `{req.name}`" \
+                       f" (`{req.old_version}`) removed from the requirements"
             # either major version bump or downgraded
-            return f"- **[{req['reason']}]** `{req['name']}` " \
-                   f"changes from `{req['old_version']}` to `{req['new_version']}`"
+            return f"- **[{req.reason}]** `{req.name}` " \
+                   f"changes from `{req.old_version}` to `{req.new_version}`"
         # valid requirement
-        return f"- `{req['name']}` changes from `{req['old_version']}` to `{req['new_version']}`"
+        return f"- `{req.name}` changes from `{req.old_version}` to `{req.new_version}`"
 
     def delete_branch(self, repository, branch_name):
         """
@@ -405,11 +870,11 @@ class GitHubHelper:  # pylint: disable=missing-class-docstring
 
     def get_file_contents(self, repo_root, file_path):
         """
-        Return contents of local file
+        Return the contents of a local file as bytes, exactly as they are on disk
         """
         try:
             full_file_path = os.path.join(repo_root, file_path)
-            with open(full_file_path, 'r', encoding='utf-8') as opened_file:
+            with open(full_file_path, 'rb') as opened_file:
                 data = opened_file.read()
         except Exception as error:
             raise Exception(
@@ -418,20 +883,153 @@ class GitHubHelper:  # pylint: disable=missing-class-docstring
 
         return data
 
-    # pylint: disable=missing-function-docstring
+    def get_blob_sha(self, content):
+        """
+        Return the SHA git would give to a blob with this content.
+        """
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        header = "blob {}\0".format(len(content)).encode('utf-8')
+        return hashlib.sha1(header + content).hexdigest()
+
+    def get_file_mode(self, repo_root, file_path):
+        """
+        Return the git file mode for a local file, keeping its executable bit.
+        """
+        file_stat = os.stat(os.path.join(repo_root, file_path))
+        return "100755" if file_stat.st_mode & stat.S_IXUSR else "100644"
+
+    def get_file_blob_sha(self, full_file_path):
+        """
+        Return the git blob SHA of a local file without reading it into memory.
+        """
+        size = os.path.getsize(full_file_path)
+        digest = hashlib.sha1("blob {}\0".format(size).encode('utf-8'))
+        if size:
+            with open(full_file_path, 'rb') as opened_file:
+                with mmap.mmap(opened_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    digest.update(mapped)
+        return digest.hexdigest()
+
+    def create_blob_from_file(self, repository, full_file_path):
+        """
+        Create a blob from a local file, streaming it base64-encoded from a memory map.
+
+        Works for binary files and keeps peak memory flat however large the file is.
+        """
+        headers = {
+            "Accept": "application/vnd.github+json",
+            "Authorization": f'Bearer {self.github_token}',
+            "Content-Type": "application/json",
+        }
+        url = f'{repository.url}/git/blobs'
+        try:
+            with open(full_file_path, 'rb') as opened_file:
+                if os.fstat(opened_file.fileno()).st_size == 0:
+                    response = self.session.post(url, data=Base64BlobPayload(b''), headers=headers, timeout=60)
+                else:
+                    with mmap.mmap(opened_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        response = self.session.post(url, data=Base64BlobPayload(mapped), headers=headers, timeout=60)
+            response.raise_for_status()
+        except Exception as error:
+            raise Exception(
+                "Unable to create blob for file: {}".format(full_file_path)
+            ) from error
+        return response.json()['sha']
+
+    def _read_local_file(self, repo_root, file_path):
+        """
+        Return the content to upload for a local file, and the SHA of its blob.
+
+        Text files are read into memory; binary or very large files are returned
+        as a LocalBlob so they can be streamed from disk. The SHA is that of the bytes
+        on disk, and text is only decoded, so line endings are kept as they are.
+        """
+        full_file_path = os.path.join(repo_root, file_path)
+        if os.path.getsize(full_file_path) <= self.large_file_threshold:
+            data = self.get_file_contents(repo_root, file_path)
+            try:
+                return data.decode('utf-8'), self.get_blob_sha(data)
+            except UnicodeDecodeError:
+                pass
+        return LocalBlob(full_file_path, os.path.getsize(full_file_path)), self.get_file_blob_sha(full_file_path)
+
     def update_list_of_files(self, repository, repo_root, file_path_list, commit_message, sha, username):
-        input_trees_list = []
-        base_git_tree = repository.get_git_tree(sha)
-        for file_path in file_path_list:
-            if os.path.exists(os.path.join(repo_root, file_path)):
-                content = self.get_file_contents(repo_root, file_path)
-                input_tree = InputGitTreeElement(file_path, "100644", "blob", content=content)
-            else:
-                # Remove file from git tree as the file is removed
-                input_tree = InputGitTreeElement(file_path, "100644", "blob", sha=None)
-            input_trees_list.append(input_tree)
+        """
+        Commit the local versions of the given files on top of ``sha``.
+
+        ``file_path_list`` holds paths or FileChange entries. Files whose content
+        already matches the base tree are left out, as are deleted files that are
+        not in the base tree. Content that already exists as a blob in the base
+        tree, as for renames and mode changes, is referenced instead of uploaded.
+        Returns the SHA of the new commit, or None if no real changes were left to commit.
+        """
+        if not file_path_list:
+            return None
+
+        base_git_tree = repository.get_git_tree(sha, recursive=True)
+        base_blobs = {
+            element.path: (element.mode, element.sha) for element in base_git_tree.tree if element.type == 'blob'
+        }
+        # A truncated listing may be missing files, so it cannot prove a file is absent.
+        base_tree_complete = not base_git_tree.raw_data.get('truncated', False)
+        known_blob_shas = {blob_sha for _, blob_sha in base_blobs.values()}
+        updated_contents = {}
+        file_modes = {}
+        reused_blobs = {}
+        deleted_paths = []
+        # For membership tests, which would be quadratic on the list for large renames and deletions.
+        deleted_path_set = set()
+        changes = [
+            change if isinstance(change, FileChange) else FileChange(None, change, None, None)
+            for change in file_path_list
+        ]
+        for change in changes:
+            file_path = change.path
+            if change.kind == RENAMED and change.old_path not in deleted_path_set:
+                if not base_tree_complete or change.old_path in base_blobs:
+                    deleted_paths.append(change.old_path)
+                    deleted_path_set.add(change.old_path)
+            full_file_path = os.path.join(repo_root, file_path)
+            if os.path.exists(full_file_path):
+                content, blob_sha = self._read_local_file(repo_root, file_path)
+                file_mode = self.get_file_mode(repo_root, file_path)
+                if base_blobs.get(file_path) == (file_mode, blob_sha):
+                    logger.info("Skipping unchanged file: {}".format(file_path))
+                    continue
+                file_modes[file_path] = file_mode
+                if blob_sha in known_blob_shas:
+                    reused_blobs[file_path] = blob_sha
+                else:
+                    updated_contents[file_path] = content
+            elif file_path not in deleted_path_set:
+                if base_tree_complete and file_path not in base_blobs:
+                    logger.info("Skipping file missing from both trees: {}".format(file_path))
+                    continue
+                deleted_paths.append(file_path)
+                deleted_path_set.add(file_path)
+
+        if len(updated_contents) >= self.blob_upload_min_files or \
+                any(isinstance(content, LocalBlob) for content in updated_contents.values()):
+            blob_shas = self.create_blobs(repository, updated_contents)
+            input_trees_list = [
+                InputGitTreeElement(file_path, file_modes[file_path], "blob", sha=blob_shas[file_path])
+                for file_path in updated_contents
+            ]
+        else:
+            input_trees_list = [
+                InputGitTreeElement(file_path, file_modes[file_path], "blob", content=content)
+                for file_path, content in updated_contents.items()
+            ]
+        input_trees_list += [
+            InputGitTreeElement(file_path, file_modes[file_path], "blob", sha=blob_sha)
+            for file_path, blob_sha in reused_blobs.items()
+        ]
+        # Remove files from git tree as the files are removed
+        input_trees_list += [InputGitTreeElement(file_path, "100644", "blob", sha=None) for file_path in deleted_paths]
+
         if len(input_trees_list) > 0:
-            new_git_tree = repository.create_git_tree(input_trees_list, base_tree=base_git_tree)
+            new_git_tree = self.create_git_tree_in_chunks(repository, input_trees_list, base_git_tree)
             parents = [repository.get_git_commit(sha)]
             author = InputGitAuthor(username, self.github_user_email)
             commit_sha = repository.create_git_commit(
@@ -440,3 +1038,64 @@ class GitHubHelper:  # pylint: disable=missing-class-docstring
             return commit_sha
 
         return None
+
+    def create_blobs(self, repository, contents):
+        """
+        Upload file contents as blobs using a bounded pool of workers.
+
+        ``contents`` maps file paths to their text contents, or to a LocalBlob for
+        files that are streamed from disk. Returns a dict mapping each path to the
+        SHA of its new blob, logging progress along the way.
+        """
+        sizes = {
+            file_path: content.size if isinstance(content, LocalBlob) else len(content.encode('utf-8'))
+            for file_path, content in contents.items()
+        }
+        total = len(contents)
+        progress_interval = max(1, total // 10)
+        blob_shas = {}
+        uploaded_bytes = 0
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.blob_upload_workers) as executor:
+            futures = {
+                executor.submit(contextvars.copy_context().run, self._create_blob, repository, content): file_path
+                for file_path, content in contents.items()
+            }
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    file_path = futures[future]
+                    blob_shas[file_path] = future.result()
+                    uploaded_bytes += sizes[file_path]
+                    if done % progress_interval == 0 or done == total:
+                        elapsed = max(time.monotonic() - start, 1e-6)
+                        logger.info(
+                            "Uploaded %d/%d blobs (%d bytes) in %.1fs: %.1f blobs/s, %.1f KB/s",
+                            done, total, uploaded_bytes, elapsed, done / elapsed, uploaded_bytes / 1024 / elapsed
+                        )
+            except Exception as error:
+                for future in futures:
+                    future.cancel()
+                raise Exception(
+                    "Unable to upload blob for: {}".format(file_path)
+                ) from error
+        return blob_shas
+
+    def _create_blob(self, repository, content):
+        if isinstance(content, LocalBlob):
+            return self.create_blob_from_file(repository, content.full_path)
+        return repository.create_git_blob(content, "utf-8").sha
+
+    def create_git_tree_in_chunks(self, repository, input_trees_list, base_tree):
+        """
+        Create a tree from ``input_trees_list`` on top of ``base_tree``.
+
+        Large lists are split into requests of at most ``tree_chunk_size`` entries,
+        each one building on the tree created by the previous request.
+        """
+        new_git_tree = base_tree
+        for start in range(0, len(input_trees_list), self.tree_chunk_size):
+            chunk = input_trees_list[start:start + self.tree_chunk_size]
+            new_git_tree = repository.create_git_tree(chunk, base_tree=new_git_tree)
+            if len(input_trees_list) > self.tree_chunk_size:
+                logger.info("Created tree with %d/%d entries", start + len(chunk), len(input_trees_list))
+        return new_git_tree
@@ -0,0 +1,225 @@
+"""
+On-disk cache that turns repeated GitHub GETs into conditional requests.
+
+GitHub answers a conditional request with ``304 Not Modified`` when the resource
+has not changed, and 304 responses do not count against the rate limit. The cache
+keeps each response's body together with its ``ETag``/``Last-Modified`` values and
+replays them as ``If-None-Match``/``If-Modified-Since`` on the next request.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+logger = logging.getLogger()
+
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+# Headers that describe the body on the wire rather than the cached content.
+BODY_HEADERS = ('content-length', 'content-encoding', 'transfer-encoding')
+
+
+class HttpCache:
+    """
+    Store of cached GET responses, keyed by URL, ``Accept`` header and token scope.
+
+    Each entry is a ``<key>.json`` metadata file plus a ``<key>.body`` file. Once the
+    total size passes ``max_bytes``, the least recently used entries are evicted.
+
+    Both files are replaced atomically, the metadata last, and the metadata records the
+    length of the body, so a reader never pairs metadata with a torn or different body.
+    """
+
+    def __init__(self, cache_dir, scope='', max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        # Hash the scope (usually a token) so it never ends up on disk.
+        self.scope = hashlib.sha256(scope.encode('utf-8')).hexdigest()[:16]
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._sizes = {}
+        for file_name in os.listdir(cache_dir):
+            key, extension = os.path.splitext(file_name)
+            if extension in ('.json', '.body'):
+                self._sizes[key] = self._sizes.get(key, 0) + os.path.getsize(os.path.join(cache_dir, file_name))
+        # Running total of the sizes, kept up to date as entries are stored and removed.
+        self._total_bytes = sum(self._sizes.values())
+
+    def key(self, url, accept=''):
+        """
+        Return the cache key for a GET of ``url`` with the given ``Accept`` header.
+        """
+        return hashlib.sha256('{}\n{}\n{}'.format(self.scope, accept, url).encode('utf-8')).hexdigest()
+
+    def _path(self, key, extension):
+        return os.path.join(self.cache_dir, key + extension)
+
+    def get(self, key):
+        """
+        Return ``(metadata, body)`` for a cached entry, or None if there is none.
+        """
+        try:
+            with open(self._path(key, '.json'), 'r', encoding='utf-8') as meta_file:
+                metadata = json.load(meta_file)
+            with open(self._path(key, '.body'), 'rb') as body_file:
+                body = body_file.read()
+            # Keep track of recent use for eviction. The entry may be evicted meanwhile, like any miss.
+            os.utime(self._path(key, '.json'))
+        except (OSError, ValueError):
+            return None
+        if metadata.get('body_bytes') != len(body):
+            return None
+        return metadata, body
+
+    def set(self, key, metadata, body):
+        """
+        Store an entry, evicting old entries if the cache has grown too big.
+        """
+        with self._lock:
+            try:
+                self._replace(key, '.body', body)
+                self._replace(key, '.json', json.dumps(dict(metadata, body_bytes=len(body))).encode('utf-8'))
+            except OSError:
+                logger.warning("Unable to write HTTP cache entry %s", key, exc_info=True)
+                return
+            size = os.path.getsize(self._path(key, '.json')) + len(body)
+            self._total_bytes += size - self._sizes.get(key, 0)
+            self._sizes[key] = size
+            self._evict()
+
+    def _replace(self, key, extension, content):
+        """
+        Replace the file of an entry with ``content`` in one step, through a temporary file.
+        """
+        temp_file = tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix='.tmp', delete=False)
+        try:
+            with temp_file:
+                temp_file.write(content)
+            os.replace(temp_file.name, self._path(key, extension))
+        except OSError:
+            os.remove(temp_file.name)
+            raise
+
+    def _evict(self):
+        """
+        Remove the least recently used entries until the cache fits in max_bytes.
+        """
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        def last_used(key):
+            try:
+                return os.path.getmtime(self._path(key, '.json'))
+            except OSError:
+                return 0
+
+        for key in sorted(self._sizes, key=last_used):
+            if self._total_bytes <= self.max_bytes:
+                break
+            for extension in ('.json', '.body'):
+                try:
+                    os.remove(self._path(key, extension))
+                except OSError:
+                    pass
+            self._total_bytes -= self._sizes.pop(key)
+            self.evictions += 1
+
+    def record(self, hit):
+        """
+        Count a cache hit or miss.
+        """
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        """
+        Return the hit, miss and eviction counters and the current size of the cache.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._sizes),
+            'bytes': self._total_bytes,
+        }
+
+
+class CachingHTTPAdapter(HTTPAdapter):
+    """
+    Transport adapter that serves GETs from an HttpCache using conditional requests.
+
+    Streamed responses are passed through untouched, since caching them would
+    mean reading the whole body into memory.
+    """
+
+    def __init__(self, http_cache=None, **kwargs):
+        self.http_cache = http_cache
+        super().__init__(**kwargs)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if self.http_cache is None or request.method != 'GET' or stream:
+            return super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+
+        key = self.http_cache.key(request.url, request.headers.get('Accept', ''))
+        cached = self.http_cache.get(key)
+        if cached:
+            metadata, _ = cached
+            if metadata.get('etag'):
+                request.headers['If-None-Match'] = metadata['etag']
+            if metadata.get('last_modified'):
+                request.headers['If-Modified-Since'] = metadata['last_modified']
+
+        response = super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+
+        if response.status_code == 304 and cached:
+            self.http_cache.record(hit=True)
+            return self._build_cached_response(request, response, *cached)
+
+        self.http_cache.record(hit=False)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code == 200 and (etag or last_modified):
+            metadata = {
+                'url': request.url,
+                'etag': etag,
+                'last_modified': last_modified,
+                # The body is stored decoded, so drop the headers that describe its encoding.
+                'headers': {
+                    name: value for name, value in response.headers.items() if name.lower() not in BODY_HEADERS
+                },
+            }
+            self.http_cache.set(key, metadata, response.content)
+        return response
+
+    def _build_cached_response(self, request, not_modified, metadata, body):
+        """
+        Build a 200 response from a cache entry, keeping the fresh headers of the 304.
+        """
+        response = Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(metadata['headers'])
+        # The 304 carries up to date rate limit headers, among others.
+        response.headers.update(
+            (name, value) for name, value in not_modified.headers.items() if name.lower() not in BODY_HEADERS
+        )
+        response.headers['X-Cache'] = 'HIT'
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = body  # pylint: disable=protected-access
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        not_modified.close()
+        return response
@@ -0,0 +1,59 @@
+"""
+Wait for GitHub to report that something is ready, instead of sleeping for a fixed time.
+"""
+import logging
+import random
+import time
+
+from .tracing import WAIT, tracer
+
+logger = logging.getLogger()
+
+DEFAULT_DEADLINE = 10
+DEFAULT_INITIAL_DELAY = 0.25
+DEFAULT_MAX_DELAY = 4
+
+
+def poll_until(func, description, is_ready=bool, deadline=DEFAULT_DEADLINE,
+               initial_delay=DEFAULT_INITIAL_DELAY, max_delay=DEFAULT_MAX_DELAY):
+    """
+    Call ``func`` until ``is_ready`` accepts its result or ``deadline`` seconds have passed.
+
+    The first call is made immediately. Later calls are spaced by a jittered
+    exponential backoff starting at ``initial_delay`` and capped at ``max_delay``.
+    Exceptions raised by ``func`` count as "not ready yet"; if the deadline passes
+    while ``func`` is still raising, the last exception is re-raised. Otherwise the
+    last result of ``func`` is returned, whether or not it was ready.
+
+    Results that are not ready and have a ``close`` method, such as streamed
+    responses, are closed before the next call so their connections go back to the pool.
+    """
+    start = time.monotonic()
+    delay = initial_delay
+    attempts = 0
+    while True:
+        attempts += 1
+        error = None
+        result = None
+        try:
+            result = func()
+        except Exception as e:  # pylint: disable=broad-except
+            error = e
+        else:
+            if is_ready(result):
+                logger.info("%s ready after %.2fs (%d attempts)", description, time.monotonic() - start, attempts)
+                return result
+
+        remaining = deadline - (time.monotonic() - start)
+        if remaining <= 0:
+            logger.info("%s not ready after %.2fs (%d attempts)", description, time.monotonic() - start, attempts)
+            if error is not None:
+                raise error
+            return result
+        if hasattr(result, 'close'):
+            result.close()
+
+        # "Equal jitter": wait at least half the delay so attempts stay spread out.
+        with tracer.span(WAIT, description, attempt=attempts):
+            time.sleep(min(remaining, delay / 2 + random.uniform(0, delay / 2)))
+        delay = min(delay * 2, max_delay)
@@ -3,23 +3,57 @@ Class helps create GitHub Pull requests
 """
 # pylint: disable=missing-class-docstring,missing-function-docstring,attribute-defined-outside-init
 import logging
+import os
 import re
+import threading
 
 import click
-from github import GithubObject
 
-from .github_helpers import GitHubHelper
+from .daemon_client import submit_job
+from .git_changes import content_fingerprint, get_working_tree_changes
+from .run_journal import RunJournal
+from .tracing import tracer
 
 logging.basicConfig()
 LOGGER = logging.getLogger()
 LOGGER.setLevel(logging.INFO)
 
 
+class SharedGitHubHelper:
+    """
+    Class attribute holding one GitHubHelper, created on first access.
+
+    Importing github_helpers pulls in PyGithub, GitPython and requests, and creating
+    the helper builds an HTTP session and a GitHub client. Deferring both lets runs
+    that find nothing to commit, or just print --help, skip that work entirely.
+    """
+
+    def __init__(self):
+        self._helper = None
+        self._lock = threading.Lock()
+
+    def __get__(self, instance, owner):
+        if self._helper is None:
+            with self._lock:
+                if self._helper is None:
+                    # pylint: disable=import-outside-toplevel
+                    from .github_helpers import GitHubHelper
+                    self._helper = GitHubHelper()
+        return self._helper
+
+    def created(self):
+        """
+        Return whether the GitHubHelper has been created, without creating it.
+        """
+        return self._helper is not None
+
+
 class PullRequestCreator:
 
     def __init__(self, repo_root, branch_name, user_reviewers, team_reviewers, commit_message, pr_title,
                  pr_body, target_branch='master', draft=False, output_pr_url_for_github_action=False,
-                 force_delete_old_prs=False):
+                 force_delete_old_prs=False, github_helper=None, use_graphql=False, update_existing_pr=False,
+                 journal_path=None):
         self.branch_name = branch_name
         self.pr_body = pr_body
         self.pr_title = pr_title
@@ -31,8 +65,22 @@ class PullRequestCreator:
         self.draft = draft
         self.output_pr_url_for_github_action = output_pr_url_for_github_action
         self.force_delete_old_prs = force_delete_old_prs
-
-    github_helper = GitHubHelper()
+        self.use_graphql = use_graphql
+        self.update_existing_pr = update_existing_pr
+        self.requirement_changes = None
+        self.journal = RunJournal(journal_path)
+        if github_helper is not None:
+            self.github_helper = github_helper
+
+    github_helper = SharedGitHubHelper()
+
+    def get_http_cache_stats(self):
+        """
+        Return the HTTP cache statistics of the GitHub helper, or None if GitHub was never needed.
+        """
+        if 'github_helper' not in vars(self) and not vars(PullRequestCreator)['github_helper'].created():
+            return None
+        return self.github_helper.get_http_cache_stats()
 
     def _get_github_instance(self):
         return self.github_helper.get_github_instance()
@@ -44,12 +92,12 @@ class PullRequestCreator:
         self.repository = self.github_helper.repo_from_remote(self.repo_root, ['origin'])
 
     def _set_updated_files_list(self, untracked_files_required=False):
-        self.updated_files_list = self.github_helper.get_updated_files_list(self.repo_root, untracked_files_required)
+        self.updated_files_list = get_working_tree_changes(self.repo_root, untracked_files_required)
 
     def _create_branch(self, commit_sha):
         self.github_helper.create_branch(self.repository, self.branch, commit_sha)
 
-    def _set_github_data(self, untracked_files_required=False):
+    def _set_github_data(self):
         LOGGER.info("Authenticating with Github")
         self.github_instance = self._get_github_instance()
         self.user = self._get_user()
@@ -57,16 +105,44 @@ class PullRequestCreator:
         LOGGER.info("Trying to connect to repo")
         self._set_repository()
         LOGGER.info("Connected to {}".format(self.repository))
-        self._set_updated_files_list(untracked_files_required)
         self.base_sha = self.github_helper.get_current_commit(self.repo_root)
         self.branch = "refs/heads/jenkins/{}-{}".format(self.branch_name, self.base_sha[:7])
 
+    def _set_requirement_changes(self):
+        # Classify the upgrades from the local files now, rather than downloading
+        # the diff of the pull request once it exists.
+        if self.pr_title == self.github_helper.UPGRADE_PR_TITLE:
+            self.requirement_changes = self.github_helper.classify_local_requirement_changes(
+                self.repo_root, self.updated_files_list
+            )
+
+    def _load_progress(self):
+        self.fingerprint = content_fingerprint(self.repo_root, self.updated_files_list)
+        self.run_key = RunJournal.run_key(
+            os.path.abspath(self.repo_root), self.branch, self.target_branch, self.fingerprint
+        )
+        self.progress = self.journal.steps(self.run_key)
+        if 'done' in self.progress:
+            # Proposing the same content again is up to the usual checks, not the journal.
+            self.journal.forget(self.run_key)
+            self.progress = {}
+
+    def _checkpoint(self, step, value=None):
+        self.journal.record(self.run_key, step, value)
+        self.progress[step] = value
+
+    def _find_identical_pull_request(self):
+        return self.github_helper.find_pull_request_by_fingerprint(
+            self.repository, self.user.login, "jenkins/{}-".format(self.branch_name), self.fingerprint,
+            target_branch=self.target_branch
+        )
+
     def _branch_exists(self):
         return self.github_helper.branch_exists(self.repository, self.branch)
 
-    def _create_new_branch(self):
+    def _create_new_commit(self):
         LOGGER.info("updated files: {}".format(self.updated_files_list))
-        commit_sha = self.github_helper.update_list_of_files(
+        return self.github_helper.update_list_of_files(
             self.repository,
             self.repo_root,
             self.updated_files_list,
@@ -74,9 +150,12 @@ class PullRequestCreator:
             self.base_sha,
             self.user.name
         )
-        self._create_branch(commit_sha)
 
-    def _create_new_pull_request(self):
+    def _get_reviewers(self):
+        # Imported here to keep PyGithub off the startup path.
+        # pylint: disable=import-outside-toplevel
+        from github import GithubObject
+
         # If there are reviewers to be added, split them into python lists
         if isinstance(self.user_reviewers, str) and self.user_reviewers:
             user_reviewers = self.user_reviewers.split(',')
@@ -87,27 +166,91 @@ class PullRequestCreator:
             team_reviewers = self.team_reviewers.split(',')
         else:
             team_reviewers = GithubObject.NotSet
+        return user_reviewers, team_reviewers
 
+    def _create_new_pull_request(self):
+        user_reviewers, team_reviewers = self._get_reviewers()
         pr = self.github_helper.create_pull_request(
             self.repository,
             self.pr_title,
-            self.pr_body,
+            self.github_helper.add_fingerprint_to_body(self.pr_body, self.fingerprint),
             self.target_branch,
             self.branch,
             user_reviewers=user_reviewers,
             team_reviewers=team_reviewers,
             # TODO: Remove hardcoded check in favor of a new --verify-reviewers CLI option
             verify_reviewers=self.branch_name != 'cleanup-python-code',
-            draft=self.draft
+            draft=self.draft,
+            use_graphql=self.use_graphql,
+            requirement_changes=self.requirement_changes,
+            checkpoint=self._checkpoint
         )
-        LOGGER.info("Created PR: https://github.com/{}/pull/{}".format(
-            self.repository.full_name, pr.number
+        self._report_pull_request("Created", pr)
+        return pr
+
+    def _find_pull_request_to_resume(self):
+        """
+        Return the pull request an earlier run opened for this content, if it can be finished.
+
+        Once it is closed, or its branch has moved on from the recorded commit, someone
+        else has taken over, so the run is forgotten and starts over as a new one.
+        """
+        if 'pull_request' not in self.progress:
+            return None
+        pr = self.repository.get_pull(self.progress['pull_request'])
+        if pr.state == 'open' and pr.head.sha == self.progress.get('commit'):
+            return pr
+        LOGGER.info("PR #{} of the earlier run has been closed or moved on, starting over".format(pr.number))
+        self.journal.forget(self.run_key)
+        self.progress = {}
+        return None
+
+    def _resume_pull_request(self, pr):
+        user_reviewers, team_reviewers = self._get_reviewers()
+        self.github_helper.finish_pull_request(
+            self.repository,
+            pr,
+            user_reviewers=user_reviewers,
+            team_reviewers=team_reviewers,
+            verify_reviewers=self.branch_name != 'cleanup-python-code',
+            use_graphql=self.use_graphql,
+            requirement_changes=self.requirement_changes,
+            checkpoint=self._checkpoint,
+            completed=self.progress
+        )
+        self._report_pull_request("Resumed", pr)
+        return pr
+
+    def _report_pull_request(self, action, pr):
+        LOGGER.info("{} PR: https://github.com/{}/pull/{}".format(
+            action, self.repository.full_name, pr.number
         ))
         if self.output_pr_url_for_github_action:
             # using print rather than logger to avoid the logger
             # prepending anything past which github actions wouldn't parse
             print(f'::set-output name=generated_pr::https://github.com/{self.repository.full_name}/pull/{pr.number}')
 
+    def _find_pull_request_to_update(self):
+        filter_pattern = "jenkins/{}-[a-zA-Z0-9]*".format(re.escape(self.branch_name))
+        pulls = [
+            pr for pr in self.github_helper.find_bot_pull_requests(
+                self.repository, self.user.login, "jenkins/{}-".format(self.branch_name), self.target_branch
+            )
+            if re.fullmatch(filter_pattern, pr.head.ref)
+        ]
+        # The newest one, as they are sorted by creation date.
+        return pulls[-1] if pulls else None
+
+    def _update_pull_request(self, pr, commit_sha):
+        LOGGER.info("Moving {} of PR #{} to the new commit".format(pr.head.ref, pr.number))
+        self.github_helper.refresh_pull_request(
+            self.repository, pr, commit_sha,
+            self.github_helper.add_fingerprint_to_body(self.pr_body, self.fingerprint),
+            requirement_changes=self.requirement_changes
+        )
+        self._report_pull_request("Updated", pr)
+        return pr
+
     def delete_old_pull_requests(self):
         LOGGER.info("Checking if there's any old pull requests to delete")
         # Only delete old PRs with the same base name
@@ -115,9 +258,13 @@ class PullRequestCreator:
         deleted_pulls = self.github_helper.close_existing_pull_requests(
             self.repository, self.user.login,
             self.user.name, self.target_branch,
-            branch_name_filter=lambda name: re.fullmatch(filter_pattern, name)
+            branch_name_filter=lambda name: re.fullmatch(filter_pattern, name),
+            branch_prefix="jenkins/{}-".format(self.branch_name)
         )
+        self._list_deleted_pull_requests(deleted_pulls)
+        return deleted_pulls
 
+    def _list_deleted_pull_requests(self, deleted_pulls):
         for num, deleted_pull_number in enumerate(deleted_pulls):
             if num == 0:
                 self.pr_body += "\n\nDeleted obsolete pull_requests:"
@@ -130,24 +277,97 @@ class PullRequestCreator:
         self.github_helper.delete_branch(self.repository, branch_name)
 
     def create(self, delete_old_pull_requests, untracked_files_required=False):
-        self._set_github_data(untracked_files_required)
-
-        if not self.updated_files_list:
-            LOGGER.info("No changes needed")
-            return
-
-        if self.force_delete_old_prs or delete_old_pull_requests:
-            self.delete_old_pull_requests()
-            if self._branch_exists():
-                self._delete_old_branch()
-
-        elif self._branch_exists():
-            LOGGER.info("Branch for this sha already exists")
-            return
-
-        self._create_new_branch()
-
-        self._create_new_pull_request()
+        """
+        Create the branch and pull request for the local changes.
+
+        Returns the new pull request, or None if no pull request was created.
+        """
+        with tracer.phase('discover'):
+            # Look for changes before anything touches GitHub, so that a run with
+            # nothing to commit never needs to create a client.
+            self._set_updated_files_list(untracked_files_required)
+            if not self.updated_files_list:
+                LOGGER.info("No changes needed")
+                return None
+
+            self._set_github_data()
+            self._set_requirement_changes()
+            self._load_progress()
+            pull_request_to_resume = self._find_pull_request_to_resume()
+
+            delete_old = self.force_delete_old_prs or delete_old_pull_requests
+            if self.progress:
+                # An earlier run for the same content stopped half way, so carry on
+                # from its last step instead of starting over.
+                LOGGER.info("Resuming an earlier run, which finished: {}".format(', '.join(self.progress)))
+            else:
+                if not delete_old and self._branch_exists():
+                    LOGGER.info("Branch for this sha already exists")
+                    return None
+
+                # A new base sha alone is no reason to replace a pull request that
+                # already proposes exactly these files, and rerun all of its checks.
+                identical_pull_request = self._find_identical_pull_request()
+                if identical_pull_request is not None:
+                    LOGGER.info("PR #{} already proposes these changes".format(identical_pull_request.number))
+                    return None
+
+        with tracer.phase('upload'):
+            commit_sha = self.progress.get('commit')
+            if commit_sha is None:
+                # Make the commit first, so that old PRs are left alone when the
+                # files turn out to be identical to the base tree.
+                commit_sha = self._create_new_commit()
+                if not commit_sha:
+                    LOGGER.info("No changes needed")
+                    return None
+                self._checkpoint('commit', commit_sha)
+
+        with tracer.phase('pr'):
+            if pull_request_to_resume is not None:
+                pr = self._resume_pull_request(pull_request_to_resume)
+                self._checkpoint('done')
+                return pr
+
+            if self.update_existing_pr:
+                # Keep the existing PR, with its reviews and comments, and only replace its changes.
+                existing_pull_request = self._find_pull_request_to_update()
+                if existing_pull_request is not None:
+                    pr = self._update_pull_request(existing_pull_request, commit_sha)
+                    self._checkpoint('done')
+                    return pr
+
+            if delete_old:
+                if 'closed_pull_requests' in self.progress:
+                    self._list_deleted_pull_requests(self.progress['closed_pull_requests'])
+                else:
+                    self._checkpoint('closed_pull_requests', self.delete_old_pull_requests())
+
+            if 'branch' not in self.progress:
+                if delete_old and self._branch_exists():
+                    self._delete_old_branch()
+                self._create_branch(commit_sha)
+                self._checkpoint('branch', self.branch)
+
+            pr = self._create_new_pull_request()
+            self._checkpoint('done')
+            return pr
+
+
+def _submit_to_daemon(daemon_socket, output_pr_url_for_github_action, job):
+    """
+    Run ``job`` on the daemon listening on ``daemon_socket``, and report its result as a local run would.
+    """
+    result = submit_job(daemon_socket, job)
+    LOGGER.info("Daemon job {} in {:.1f}s, after {:.1f}s in the queue".format(
+        result['status'], result['duration'], result['queued']
+    ))
+    if result['status'] == 'failed':
+        raise Exception("The pull request daemon failed to create the PR: {}".format(result['error']))
+    if result['pr_url']:
+        LOGGER.info("PR: {}".format(result['pr_url']))
+        if output_pr_url_for_github_action:
+            print(f'::set-output name=generated_pr::{result["pr_url"]}')
 
 
 @click.command()
@@ -193,6 +413,12 @@ class PullRequestCreator:
     default=False,
     help="If set, force delete old branches with the same base branch name and close their PRs"
 )
+@click.option(
+    '--update-existing-pr/--no-update-existing-pr',
+    default=False,
+    help="If set, move the branch of an existing PR with the same base branch name to the new commit and "
+         "update its body, instead of opening a new PR"
+)
 @click.option(
     '--draft', is_flag=True
 )
@@ -201,6 +427,32 @@ class PullRequestCreator:
     default=False,
     help="If set, print resultant PR in github action set output sytax"
 )
+@click.option(
+    '--use-graphql/--no-use-graphql',
+    default=False,
+    help="If set, create and annotate the PR with batched GraphQL mutations instead of REST calls"
+)
+@click.option(
+    '--profile',
+    type=click.Path(dir_okay=False, file_okay=True, writable=True),
+    default=None,
+    help="If set, trace every GitHub API call and git command, write the trace to this file as JSON "
+         "and log a summary of where the time went"
+)
+@click.option(
+    '--journal',
+    type=click.Path(dir_okay=False, file_okay=True, writable=True),
+    default=None,
+    help="If set, record the steps each run finished in this SQLite file, so that a failed run resumes where "
+         "it stopped when it is started again with the same file"
+)
+@click.option(
+    '--daemon-socket',
+    type=click.Path(dir_okay=False, file_okay=True),
+    default=None,
+    help="If set, hand the job to the pull_request_daemon listening on this socket and report its result, "
+         "instead of creating the pull request in this process"
+)
 @click.option(
     '--untracked-files-required',
     required=False,
@@ -211,7 +463,8 @@ def main(
     commit_message, pr_title, pr_body,
     user_reviewers, team_reviewers,
     delete_old_pull_requests, draft, output_pr_url_for_github_action,
-    untracked_files_required, force_delete_old_prs
+    untracked_files_required, force_delete_old_prs, use_graphql, profile, update_existing_pr,
+    journal, daemon_socket
 ):
     """
     Create a pull request with these changes in the repo.
@@ -221,6 +474,28 @@ def main(
     - GITHUB_TOKEN
     - GITHUB_USER_EMAIL
     """
+    if daemon_socket:
+        if profile:
+            raise click.UsageError("--profile can't be used with --daemon-socket")
+        _submit_to_daemon(daemon_socket, output_pr_url_for_github_action, {
+            'repo_root': os.path.abspath(repo_root),
+            'branch_name': base_branch_name,
+            'target_branch': target_branch,
+            'commit_message': commit_message,
+            'pr_title': pr_title,
+            'pr_body': pr_body,
+            'user_reviewers': user_reviewers,
+            'team_reviewers': team_reviewers,
+            'draft': draft,
+            'force_delete_old_prs': force_delete_old_prs,
+            'use_graphql': use_graphql,
+            'update_existing_pr': update_existing_pr,
+            'journal_path': journal,
+            'delete_old_pull_requests': delete_old_pull_requests,
+            'untracked_files_required': bool(untracked_files_required),
+        })
+        return
+
     creator = PullRequestCreator(
         repo_root=repo_root,
         branch_name=base_branch_name,
@@ -231,9 +506,24 @@ def main(
         team_reviewers=team_reviewers,
         draft=draft,
         output_pr_url_for_github_action=output_pr_url_for_github_action,
-        force_delete_old_prs=force_delete_old_prs
+        force_delete_old_prs=force_delete_old_prs,
+        use_graphql=use_graphql,
+        update_existing_pr=update_existing_pr,
+        journal_path=journal
     )
-    creator.create(delete_old_pull_requests, untracked_files_required)
+    if profile:
+        tracer.enable()
+    try:
+        creator.create(delete_old_pull_requests, untracked_files_required)
+    finally:
+        if profile:
+            with open(profile, 'w', encoding='utf-8') as profile_file:
+                profile_file.write(tracer.to_json())
+            LOGGER.info("Profile written to {}:\n{}".format(profile, tracer.format_summary()))
+        # Runs that find nothing to do, or fail, use the cache too.
+        http_cache_stats = creator.get_http_cache_stats()
+        if http_cache_stats:
+            LOGGER.info("HTTP cache: {}".format(http_cache_stats))
 
 
 if __name__ == '__main__':
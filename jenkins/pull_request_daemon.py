@@ -0,0 +1,146 @@
+"""
+Create pull requests for jobs submitted over a local socket, from one long-running process.
+
+Every run of ``pull_request_creator`` pays for starting Python, importing PyGithub
+and GitPython, authenticating and finding the repository, only to make a handful
+of API calls. On a self-hosted runner the daemon pays for all that once: its jobs
+share one warm ``GitHubHelper``, with its HTTP connection pool, caches and
+repository index, and run concurrently on a bounded pool of workers.
+
+Jobs are submitted with ``pull_request_creator --daemon-socket PATH``, which sends
+its options as one line of JSON and prints the result sent back.
+"""
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+
+from .github_helpers import GitHubHelper
+from .pull_request_fleet import (DEFAULT_MAX_WORKERS, FleetResult, run_job,
+                                 validate_job)
+
+logging.basicConfig()
+LOGGER = logging.getLogger()
+LOGGER.setLevel(logging.INFO)
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+    """
+    Read one job from a connection, and answer with its result once it has run.
+    """
+
+    def handle(self):
+        result = self.server.run_request(self.rfile.readline())
+        self.wfile.write(json.dumps(result).encode('utf-8') + b'\n')
+
+
+class JobServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Accept jobs on a Unix socket and run them on a pool of ``max_workers`` threads.
+
+    Connections are handled on threads of their own, which only wait for their job,
+    so jobs beyond ``max_workers`` queue up for the next free worker.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, github_helper=None, max_workers=DEFAULT_MAX_WORKERS):
+        self.github_helper = github_helper if github_helper is not None else GitHubHelper()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        _remove_stale_socket(socket_path)
+        # Jobs run with the daemon's GitHub token, so only its own user may submit them. The
+        # socket is created private, rather than changed afterwards, so nobody can connect in between.
+        umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, JobHandler)
+        finally:
+            os.umask(umask)
+
+    def run_request(self, request):
+        """
+        Run the job in the JSON ``request`` and return its result as a dict.
+        """
+        received = time.monotonic()
+        try:
+            job = json.loads(request)
+            validate_job(job)
+        except Exception as error:  # pylint: disable=broad-except
+            return dict(FleetResult(None, 'failed', None, str(error), 0)._asdict(), queued=0)
+        return self.executor.submit(self._run_job, job, received).result()
+
+    def _run_job(self, job, received):
+        """
+        Run ``job`` on a worker, noting how long it waited for one.
+        """
+        queued = time.monotonic() - received
+        result = run_job(self.github_helper, job)
+        LOGGER.info("{} {} in {:.1f}s, after {:.1f}s in the queue".format(
+            result.repo_root, result.status, result.duration, queued
+        ))
+        return dict(result._asdict(), queued=queued)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def _remove_stale_socket(socket_path):
+    """
+    Remove the socket left behind by a daemon that is no longer running.
+    """
+    try:
+        if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            return
+    except FileNotFoundError:
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+        except ConnectionRefusedError:
+            os.remove(socket_path)
+            return
+    raise Exception("A pull request daemon is already listening on {}".format(socket_path))
+
+
+@click.command()
+@click.option(
+    '--socket', 'socket_path',
+    type=click.Path(dir_okay=False, file_okay=True),
+    required=True,
+    help="Unix socket to accept jobs on"
+)
+@click.option(
+    '--max-workers',
+    type=int,
+    default=DEFAULT_MAX_WORKERS,
+    help="Maximum number of jobs to run concurrently"
+)
+def main(socket_path, max_workers):
+    """
+    Run pull request jobs submitted with pull_request_creator --daemon-socket, until stopped.
+
+    Required environment variables:
+
+    - GITHUB_TOKEN
+    - GITHUB_USER_EMAIL
+    """
+    # Stop on SIGTERM as on Ctrl-C, letting running jobs finish.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    with JobServer(socket_path, max_workers=max_workers) as server:
+        LOGGER.info("Accepting jobs on {} with {} workers".format(socket_path, max_workers))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            LOGGER.info("Stopping")
+
+
+if __name__ == '__main__':
+    main(auto_envvar_prefix="PR_DAEMON")  # pylint: disable=no-value-for-parameter
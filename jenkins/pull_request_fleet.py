@@ -0,0 +1,187 @@
+"""
+Create pull requests for many repositories from a single process.
+
+A manifest lists the local repository roots to visit, along with the options
+that would otherwise be passed to ``pull_request_creator`` on the command line.
+All repositories share one authenticated ``GitHubHelper`` and are processed by
+a bounded pool of workers, so one slow or failing repository does not hold up
+the rest of the sweep.
+"""
+import json
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+
+from .github_helpers import GitHubHelper
+from .pull_request_creator import PullRequestCreator
+
+logging.basicConfig()
+LOGGER = logging.getLogger()
+LOGGER.setLevel(logging.INFO)
+
+DEFAULT_MAX_WORKERS = 8
+
+# Options accepted by PullRequestCreator, and their defaults when the manifest omits them.
+CREATOR_OPTIONS = {
+    'branch_name': None,
+    'commit_message': None,
+    'pr_title': None,
+    'pr_body': None,
+    'user_reviewers': '',
+    'team_reviewers': '',
+    'target_branch': 'master',
+    'draft': False,
+    'force_delete_old_prs': False,
+    'use_graphql': False,
+    'update_existing_pr': False,
+    'journal_path': None,
+}
+# Options accepted by PullRequestCreator.create
+CREATE_OPTIONS = {
+    'delete_old_pull_requests': True,
+    'untracked_files_required': False,
+}
+REQUIRED_OPTIONS = ('repo_root', 'branch_name', 'commit_message', 'pr_title', 'pr_body')
+
+FleetResult = namedtuple('FleetResult', ['repo_root', 'status', 'pr_url', 'error', 'duration'])
+
+
+def load_manifest(manifest_path):
+    """
+    Read a manifest file and return one options dict per repository.
+
+    The manifest is a JSON document of the form::
+
+        {
+            "defaults": {"branch_name": "upgrade-python-requirements", ...},
+            "repos": [
+                {"repo_root": "/path/to/repo-one"},
+                {"repo_root": "/path/to/repo-two", "team_reviewers": "arch-bom"}
+            ]
+        }
+
+    Each entry in ``repos`` overrides the values in ``defaults``.
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+    except Exception as error:
+        raise Exception(
+            "Unable to read manifest: {}".format(manifest_path)
+        ) from error
+
+    defaults = manifest.get('defaults', {})
+    jobs = []
+    for entry in manifest.get('repos', []):
+        job = dict(defaults, **entry)
+        validate_job(job)
+        jobs.append(job)
+    return jobs
+
+
+def validate_job(job):
+    """
+    Raise an exception if ``job`` has options PullRequestCreator does not know, or lacks required ones.
+    """
+    unknown_options = set(job) - set(CREATOR_OPTIONS) - set(CREATE_OPTIONS) - {'repo_root'}
+    if unknown_options:
+        raise Exception(
+            "Unknown options for {}: {}".format(job.get('repo_root'), sorted(unknown_options))
+        )
+    missing_options = [option for option in REQUIRED_OPTIONS if not job.get(option)]
+    if missing_options:
+        raise Exception(
+            "Missing options for {}: {}".format(job.get('repo_root'), missing_options)
+        )
+
+
+def run_job(github_helper, job):
+    """
+    Run PullRequestCreator for a single manifest entry and return a FleetResult.
+    """
+    start = time.monotonic()
+    creator_kwargs = {option: job.get(option, default) for option, default in CREATOR_OPTIONS.items()}
+    create_kwargs = {option: job.get(option, default) for option, default in CREATE_OPTIONS.items()}
+    try:
+        creator = PullRequestCreator(repo_root=job['repo_root'], github_helper=github_helper, **creator_kwargs)
+        pull_request = creator.create(**create_kwargs)
+    except Exception as error:  # pylint: disable=broad-except
+        LOGGER.exception("Failed creating pull request for %s", job['repo_root'])
+        return FleetResult(job['repo_root'], 'failed', None, str(error), time.monotonic() - start)
+
+    if pull_request is None:
+        return FleetResult(job['repo_root'], 'unchanged', None, None, time.monotonic() - start)
+    pr_url = "https://github.com/{}/pull/{}".format(creator.repository.full_name, pull_request.number)
+    return FleetResult(job['repo_root'], 'created', pr_url, None, time.monotonic() - start)
+
+
+def run_fleet(jobs, github_helper=None, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Run every job through a bounded pool of workers sharing one GitHubHelper.
+
+    Results are returned in the same order as ``jobs``.
+    """
+    if github_helper is None:
+        github_helper = GitHubHelper()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda job: run_job(github_helper, job), jobs))
+
+
+def format_results(results):
+    """
+    Render fleet results as a plain text table.
+    """
+    headers = ('REPO', 'STATUS', 'SECONDS', 'DETAIL')
+    rows = [
+        (result.repo_root, result.status, '{:.1f}'.format(result.duration), result.pr_url or result.error or '')
+        for result in results
+    ]
+    widths = [max(len(str(row[column])) for row in rows + [headers]) for column in range(3)]
+    lines = []
+    for row in [headers] + rows:
+        lines.append('  '.join(str(value).ljust(width) for value, width in zip(row, widths)) + '  ' + row[3])
+    return '\n'.join(lines)
+
+
+@click.command()
+@click.option(
+    '--manifest',
+    type=click.Path(exists=True, dir_okay=False, file_okay=True),
+    required=True,
+    help="JSON file listing repository roots and their pull request options"
+)
+@click.option(
+    '--max-workers',
+    type=int,
+    default=DEFAULT_MAX_WORKERS,
+    help="Maximum number of repositories to process concurrently"
+)
+@click.option(
+    '--output-json',
+    type=click.Path(dir_okay=False, file_okay=True, writable=True),
+    default=None,
+    help="If set, write the per-repository results to this file as JSON"
+)
+def main(manifest, max_workers, output_json):
+    """
+    Create pull requests for every repository listed in a manifest.
+
+    Required environment variables:
+
+    - GITHUB_TOKEN
+    - GITHUB_USER_EMAIL
+    """
+    results = run_fleet(load_manifest(manifest), max_workers=max_workers)
+    click.echo(format_results(results))
+    if output_json:
+        with open(output_json, 'w', encoding='utf-8') as output_file:
+            json.dump([result._asdict() for result in results], output_file, indent=2)
+    if any(result.status == 'failed' for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main(auto_envvar_prefix="PR_FLEET")  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,307 @@
+"""
+Schedule GitHub requests so that they stay within the API rate limits.
+
+Every request made through ``GitHubHelper.session``, including the ones PyGithub
+makes, passes through a RateLimitScheduler. It keeps one token bucket per
+rate limit resource (core, search, graphql), tuned from the ``X-RateLimit-*``
+headers of each response, spaces out content-creating requests to stay clear
+of the secondary rate limits, and backs off on 403/429 responses.
+"""
+import contextlib
+import contextvars
+import heapq
+import itertools
+import logging
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+from .http_cache import CachingHTTPAdapter
+from .tracing import API, tracer
+
+logger = logging.getLogger()
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+_request_priority = contextvars.ContextVar('github_request_priority', default=PRIORITY_NORMAL)
+
+# GitHub asks for at least a second between requests that create content.
+MIN_WRITE_INTERVAL = 1.0
+# ... and for at least a minute of waiting after tripping a secondary rate limit.
+SECONDARY_LIMIT_DELAY = 60
+# Requests that create content which notifies people, the ones GitHub's secondary limits are about.
+# Git data such as blobs, trees, commits and refs is left out, so uploads can run in parallel.
+CONTENT_CREATING_PATH = re.compile(r'/(pulls|issues|comments|reviews|requested_reviewers|releases)/?$')
+# The spare requests kept for other tools are at most this share of the limit, so that small
+# limits such as search's 30 a minute are not held back entirely.
+MAX_RESERVE_FRACTION = 0.1
+
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """
+    Give GitHub requests made inside this block the given priority.
+
+    When requests have to wait for the rate limit, higher priority requests
+    (lower numbers) are sent first.
+    """
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+def is_content_creating(method, url, body=None):
+    """
+    Return whether a request creates content, and so has to be spaced out from others that do.
+    """
+    if method != 'POST':
+        return False
+    path = urlparse(url).path
+    if path.rstrip('/').endswith('/graphql'):
+        if isinstance(body, bytes):
+            body = body.decode('utf-8', 'replace')
+        return isinstance(body, str) and 'mutation' in body
+    return bool(CONTENT_CREATING_PATH.search(path))
+
+
+def rate_limit_resource(url):
+    """
+    Return the name of the rate limit resource that applies to ``url``.
+    """
+    path = urlparse(url).path
+    if path.startswith('/search/') or path.startswith('/api/v3/search/'):
+        return 'search'
+    if path.rstrip('/').endswith('/graphql'):
+        return 'graphql'
+    return 'core'
+
+
+class TokenBucket:
+    """
+    Token bucket for a single rate limit resource.
+    """
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.blocked_until = 0
+        # When the rate limit window ends, and the whole budget is available again.
+        self.reset_at = None
+        self._updated = time.monotonic()
+
+    def refill(self, now):
+        """
+        Add the tokens earned since the last refill, or all of them once the window is over.
+        """
+        if self.reset_at is not None and now >= self.reset_at:
+            self.tokens = self.capacity
+            self.reset_at = None
+        else:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, now):
+        """
+        Return how long to wait before a token is available.
+        """
+        waits = [self.blocked_until - now]
+        if self.tokens < 1:
+            if self.rate > 0:
+                waits.append((1 - self.tokens) / self.rate)
+            elif self.reset_at is not None:
+                # Nothing comes back before the window is over.
+                waits.append(self.reset_at - now)
+        return max(0, *waits)
+
+
+class RateLimitScheduler:
+    """
+    Central gate that every GitHub request waits on before it is sent.
+
+    Waiting requests are served in priority order, then in arrival order.
+    """
+
+    def __init__(self, burst=10, reserve=50, min_write_interval=MIN_WRITE_INTERVAL, max_retries=3):
+        self.burst = burst
+        # Keep this many requests of each resource spare for other tools sharing the token.
+        self.reserve = reserve
+        self.min_write_interval = min_write_interval
+        self.max_retries = max_retries
+        self._buckets = {}
+        self._last_write = None
+        # Requests waiting for a token, by resource, so that a throttled search holds up no core requests.
+        self._waiting = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def _bucket(self, resource):
+        if resource not in self._buckets:
+            # Until GitHub tells us otherwise, assume the authenticated core limit of 5000/hour.
+            self._buckets[resource] = TokenBucket(self.burst, 5000 / 3600)
+        return self._buckets[resource]
+
+    def _wait_time(self, bucket, is_write, now):
+        wait = bucket.wait_time(now)
+        if is_write and self._last_write is not None:
+            wait = max(wait, self._last_write + self.min_write_interval - now)
+        return wait
+
+    def acquire(self, resource='core', is_write=False):
+        """
+        Block until a request for ``resource`` may be sent, and take a token for it.
+        """
+        entry = (_request_priority.get(), next(self._sequence))
+        start = time.monotonic()
+        with self._condition:
+            waiting = self._waiting.setdefault(resource, [])
+            heapq.heappush(waiting, entry)
+            try:
+                bucket = self._bucket(resource)
+                while True:
+                    now = time.monotonic()
+                    bucket.refill(now)
+                    wait = self._wait_time(bucket, is_write, now) if waiting[0] == entry else None
+                    if wait is not None and wait <= 0:
+                        break
+                    self._condition.wait(timeout=wait)
+            finally:
+                waiting.remove(entry)
+                heapq.heapify(waiting)
+                self._condition.notify_all()
+            bucket.tokens -= 1
+            if is_write:
+                self._last_write = time.monotonic()
+        waited = time.monotonic() - start
+        if waited > 1:
+            logger.info("Waited %.1fs for the GitHub %s rate limit", waited, resource)
+
+    def update(self, resource, headers):
+        """
+        Tune the bucket for ``resource`` from the rate limit headers of a response.
+        """
+        try:
+            remaining = int(headers['X-RateLimit-Remaining'])
+            reset = float(headers['X-RateLimit-Reset'])
+        except (KeyError, ValueError):
+            return
+        resource = headers.get('X-RateLimit-Resource', resource)
+        reserve = self.reserve
+        try:
+            reserve = min(reserve, int(int(headers['X-RateLimit-Limit']) * MAX_RESERVE_FRACTION))
+        except (KeyError, ValueError):
+            pass
+        with self._condition:
+            bucket = self._bucket(resource)
+            now = time.monotonic()
+            bucket.refill(now)
+            seconds_to_reset = max(reset - time.time(), 1)
+            available = max(remaining - reserve, 0)
+            # Whatever is left of the budget may be spent straight away; between
+            # responses, tokens come back at the rate that would spread it evenly
+            # over the rest of the window.
+            bucket.capacity = max(self.burst, available)
+            bucket.rate = available / seconds_to_reset
+            bucket.tokens = available
+            bucket.reset_at = now + seconds_to_reset
+            if available == 0:
+                bucket.blocked_until = max(bucket.blocked_until, now + seconds_to_reset)
+            self._condition.notify_all()
+
+    def backoff_delay(self, response, attempt):
+        """
+        Return how long to wait before retrying ``response``, or None if it was not rate limited.
+        """
+        if response.status_code not in (403, 429):
+            return None
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        if response.headers.get('X-RateLimit-Remaining') == '0':
+            try:
+                return max(float(response.headers['X-RateLimit-Reset']) - time.time(), 1)
+            except (KeyError, ValueError):
+                pass
+        if response.status_code == 429 or 'secondary rate limit' in response.text.lower():
+            return SECONDARY_LIMIT_DELAY * 2 ** attempt
+        # A plain 403, e.g. missing permissions.
+        return None
+
+    def block(self, resource, delay):
+        """
+        Hold back all requests for ``resource`` for ``delay`` seconds.
+        """
+        with self._condition:
+            bucket = self._bucket(resource)
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + delay)
+            self._condition.notify_all()
+
+
+def _body_size(body):
+    """
+    Return the size in bytes of a request body, or None if it is streamed.
+    """
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    try:
+        return len(body)
+    except TypeError:
+        return None
+
+
+class GitHubHTTPAdapter(CachingHTTPAdapter):
+    """
+    Transport adapter for GitHub that waits on a RateLimitScheduler before every request.
+
+    Rate limited responses are retried after the delay GitHub asks for, as long as
+    the request body can be sent again.
+    """
+
+    def __init__(self, http_cache=None, scheduler=None, **kwargs):
+        self.scheduler = scheduler or RateLimitScheduler()
+        super().__init__(http_cache, **kwargs)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        resource = rate_limit_resource(request.url)
+        is_write = is_content_creating(request.method, request.url, request.body)
+        # Streamed bodies are consumed by the first attempt and cannot be resent.
+        can_retry = request.body is None or isinstance(request.body, (bytes, str))
+        attempt = 0
+        while True:
+            with tracer.span(API, '{} {}'.format(request.method, urlparse(request.url).path),
+                             attempt=attempt, bytes_sent=_body_size(request.body)) as span:
+                queued = time.monotonic()
+                self.scheduler.acquire(resource, is_write)
+                span['queued_seconds'] = time.monotonic() - queued
+                response = super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert,
+                                        proxies=proxies)
+                span.update(
+                    status=response.status_code,
+                    # Streamed bodies have not been read yet, so go by what the server announced.
+                    bytes_received=(int(response.headers.get('Content-Length') or 0) if stream
+                                    else len(response.content or b'')),
+                    rate_limit_remaining=response.headers.get('X-RateLimit-Remaining'),
+                    cache=response.headers.get('X-Cache'),
+                )
+            self.scheduler.update(resource, response.headers)
+            delay = self.scheduler.backoff_delay(response, attempt)
+            if delay is None:
+                return response
+            self.scheduler.block(resource, delay)
+            if not can_retry or attempt >= self.scheduler.max_retries:
+                return response
+            logger.warning(
+                "Rate limited on %s %s, retrying in %.0fs", request.method, urlparse(request.url).path, delay
+            )
+            response.close()
+            attempt += 1
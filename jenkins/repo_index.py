@@ -0,0 +1,124 @@
+"""
+Persistent index of the repositories visible to a GitHub user.
+
+Listing every repository the bot can see takes dozens of pages of API calls, so
+the list is kept on disk and looked up by name. Stale indexes keep answering
+while a background thread rebuilds them.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger()
+
+DEFAULT_TTL = 24 * 60 * 60
+
+
+class RepoIndex:
+    """
+    Map repository names, either ``org/name`` or a bare ``name``, to full names.
+    """
+
+    def __init__(self, github_instance, index_path, ttl=DEFAULT_TTL):
+        self.github_instance = github_instance
+        self.index_path = index_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+        self._full_names = {}
+        self._names = {}
+        self._built_at = None
+        self._load()
+
+    def _load(self):
+        """
+        Load a previously saved index, if there is a readable one.
+        """
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as index_file:
+                index = json.load(index_file)
+            full_names = [str(full_name) for full_name in index['full_names'] if '/' in full_name]
+            built_at = float(index['built_at'])
+        except (OSError, ValueError, KeyError, TypeError):
+            # Anything unexpected is rebuilt, rather than failing the run.
+            return
+        self._set_full_names(full_names, built_at)
+
+    def _set_full_names(self, full_names, built_at):
+        """
+        Replace the index contents with ``full_names``.
+        """
+        by_full_name = {full_name.lower(): full_name for full_name in full_names}
+        by_name = {}
+        for full_name in full_names:
+            by_name.setdefault(full_name.split('/', 1)[1].lower(), []).append(full_name)
+        with self._lock:
+            self._full_names = by_full_name
+            self._names = by_name
+            self._built_at = built_at
+
+    @property
+    def is_stale(self):
+        """
+        True if the index has never been built, or was built longer than ``ttl`` ago.
+        """
+        return self._built_at is None or time.time() - self._built_at > self.ttl
+
+    def refresh(self):
+        """
+        Rebuild the index by listing every repository visible to the user, and save it.
+        """
+        start = time.monotonic()
+        full_names = [repo.full_name for repo in self.github_instance.get_user().get_repos()]
+        built_at = time.time()
+        self._set_full_names(full_names, built_at)
+        try:
+            os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+            temporary_path = '{}.{}.tmp'.format(self.index_path, os.getpid())
+            with open(temporary_path, 'w', encoding='utf-8') as index_file:
+                json.dump({'built_at': built_at, 'full_names': full_names}, index_file)
+            os.replace(temporary_path, self.index_path)
+        except OSError:
+            logger.warning("Unable to save repository index to %s", self.index_path, exc_info=True)
+        logger.info("Indexed %d repositories in %.1fs", len(full_names), time.monotonic() - start)
+
+    def refresh_in_background(self):
+        """
+        Start rebuilding the index on a background thread, unless that is already happening.
+        """
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self._background_refresh, daemon=True)
+            self._refresh_thread.start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception:  # pylint: disable=broad-except
+            logger.warning("Background refresh of the repository index failed", exc_info=True)
+
+    def lookup(self, repo_name):
+        """
+        Return the full name for ``repo_name``, or None if the index does not know it.
+
+        A bare name that exists in several organizations is ambiguous, and raises
+        an exception rather than guessing.
+        """
+        if self._built_at is None and '/' not in repo_name:
+            # Nothing else can resolve a bare name, so build the index now.
+            self.refresh()
+        elif self.is_stale:
+            self.refresh_in_background()
+
+        with self._lock:
+            if '/' in repo_name:
+                return self._full_names.get(repo_name.lower())
+            matches = self._names.get(repo_name.lower(), [])
+        if len(matches) > 1:
+            raise Exception(
+                "Repository name {} is ambiguous, use one of: {}".format(repo_name, ', '.join(sorted(matches)))
+            )
+        return matches[0] if matches else None
@@ -0,0 +1,160 @@
+"""
+Match pinned requirements on the changed lines of a diff in guaranteed linear time.
+
+A line such as ``+Django[argon2]==4.2.1 ; python_version >= "3.8"`` is scanned left
+to right, looking at each character a bounded number of times. The only regular expressions used are single character
+classes repeated from a fixed position, e.g. ``[0-9]*``, which the engine matches
+in one forward pass with nothing to backtrack into. However a line is crafted, the
+time spent on it is proportional to its length.
+
+Names and extras follow PEP 508, and versions follow the full PEP 440 grammar:
+epochs, any number of release segments, pre, post and dev releases in all their
+spellings, and local versions. Environment markers, comments, hashes and line
+continuations after the version are allowed and ignored.
+"""
+import re
+
+DIGITS = re.compile(r'[0-9]*')
+RELEASE_CHARS = re.compile(r'[0-9.]*')
+SPACES = re.compile(r'[ \t]*')
+NAME_CHARS = re.compile(r'[A-Za-z0-9._-]*')
+ALNUM_CHARS = re.compile(r'[A-Za-z0-9]*')
+EXTRAS_CHARS = re.compile(r'[A-Za-z0-9._, \t-]*')
+
+ALNUM = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
+VERSION_SEPARATORS = frozenset('._-')
+# What may follow a version right away: markers, comments and line endings.
+VERSION_TERMINATORS = frozenset(';#\r\n')
+# What may follow a version after a space as well: line continuations and options such as --hash.
+SPACED_VERSION_TERMINATORS = VERSION_TERMINATORS | frozenset('\\-')
+
+# Longer spellings first, so that e.g. ``preview`` is not read as ``pre`` + ``view``.
+PRE_RELEASE_LABELS = ('preview', 'alpha', 'beta', 'pre', 'rc', 'a', 'b', 'c')
+POST_RELEASE_LABELS = ('post', 'rev', 'r')
+DEV_RELEASE_LABELS = ('dev',)
+
+
+def _skip(pattern, line, position):
+    return pattern.match(line, position).end()
+
+
+def _scan_number(line, position):
+    """
+    Return the end of the run of digits at ``position``, or -1 if there is none.
+    """
+    end = _skip(DIGITS, line, position)
+    return end if end > position else -1
+
+
+def _scan_label(line, position, labels):
+    """
+    Return the end of an optional release label such as ``.post1``, ``rc2`` or ``-dev``.
+
+    Returns ``position`` itself if there is no such label.
+    """
+    start = position + 1 if line[position:position + 1] in VERSION_SEPARATORS else position
+    folded = line[start:start + 7].lower()
+    for label in labels:
+        if folded.startswith(label):
+            end = start + len(label)
+            # The number may follow a separator, and either may be left out.
+            if line[end:end + 1] in VERSION_SEPARATORS:
+                end += 1
+            return _skip(DIGITS, line, end)
+    return position
+
+
+def scan_version(line, position):
+    """
+    Return the end of the PEP 440 version starting at ``position``, or -1 if there is none.
+    """
+    if line[position:position + 1] in ('v', 'V'):
+        position += 1
+    end = _scan_number(line, position)
+    if end == -1:
+        return -1
+    if line[end:end + 1] == '!':
+        end = _scan_number(line, end + 1)
+        if end == -1:
+            return -1
+    # Further release segments, up to a dot that is not followed by a digit.
+    release_end = _skip(RELEASE_CHARS, line, end)
+    empty_segment = line.find('..', end, release_end)
+    if empty_segment != -1:
+        release_end = empty_segment
+    if line[release_end - 1] == '.':
+        release_end -= 1
+    end = release_end
+
+    end = _scan_label(line, end, PRE_RELEASE_LABELS)
+    if line[end:end + 1] == '-' and _scan_number(line, end + 1) != -1:
+        # The implicit post release of ``1.0-1``.
+        end = _scan_number(line, end + 1)
+    else:
+        end = _scan_label(line, end, POST_RELEASE_LABELS)
+    end = _scan_label(line, end, DEV_RELEASE_LABELS)
+
+    if line[end:end + 1] == '+':
+        # A local version: alphanumeric segments separated by any of ``._-``.
+        segment_end = _skip(ALNUM_CHARS, line, end + 1)
+        if segment_end == end + 1:
+            return -1
+        end = segment_end
+        while line[end:end + 1] in VERSION_SEPARATORS:
+            segment_end = _skip(ALNUM_CHARS, line, end + 1)
+            if segment_end == end + 1:
+                return -1
+            end = segment_end
+    return end
+
+
+def match_requirement_line(line):
+    """
+    Return ``(change, name, version)`` if ``line`` adds or removes a pinned requirement, otherwise None.
+
+    ``change`` is ``+`` or ``-``. ``name`` keeps any extras, e.g. ``celery[redis]``, so
+    that pins of the same package with different extras are told apart.
+    """
+    change = line[:1]
+    if change not in ('+', '-') or line[1:2] not in ALNUM or '==' not in line:
+        return None
+
+    name_end = NAME_CHARS.match(line, 1).end()
+    if line[name_end - 1] not in ALNUM:
+        return None
+    name = line[1:name_end]
+
+    position = name_end
+    if line[position:position + 2] != '==':
+        position = _skip(SPACES, line, position)
+        if line[position:position + 1] == '[':
+            extras_end = _skip(EXTRAS_CHARS, line, position + 1)
+            if line[extras_end:extras_end + 1] != ']':
+                return None
+            name += '[{}]'.format(''.join(line[position + 1:extras_end].split()))
+            position = _skip(SPACES, line, extras_end + 1)
+        if line[position:position + 2] != '==':
+            return None
+    # Only exact pins, not ``===`` or ``==1.0.*`` prefix matches.
+    if line[position + 2:position + 3] == '=':
+        return None
+    version_start = _skip(SPACES, line, position + 2)
+
+    # Most pins are plain release numbers such as ``1.16.0``, which need no further scanning.
+    version_end = RELEASE_CHARS.match(line, version_start).end()
+    if version_end == len(line):
+        next_char = ''
+    else:
+        next_char = line[version_end]
+        if next_char in VERSION_TERMINATORS:
+            next_char = ''
+    release = line[version_start:version_end]
+    if next_char or not (release[:1].isdigit() and release[-1:].isdigit() and '..' not in release):
+        version_end = scan_version(line, version_start)
+        if version_end == -1:
+            return None
+        position = _skip(SPACES, line, version_end)
+        terminators = SPACED_VERSION_TERMINATORS if position > version_end else VERSION_TERMINATORS
+        if position < len(line) and line[position] not in terminators:
+            return None
+    return change, name, line[version_start:version_end]
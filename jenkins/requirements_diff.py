@@ -0,0 +1,88 @@
+"""
+Parse the requirement changes out of a pull request diff in a single streaming pass.
+"""
+import difflib
+import re
+import sys
+from collections import namedtuple
+
+from .requirement_line import match_requirement_line
+
+DIFF_HEADER = "diff --git"
+FILENAME_REGEX = re.compile(r"[\w\-\_]*.txt")
+
+# A changed requirement. ``reason`` is set once it has been judged to need manual review.
+RequirementChange = namedtuple('RequirementChange', ['name', 'old_version', 'new_version', 'reason'],
+                               defaults=(None,))
+
+
+def _file_changes(file_reqs, seen):
+    """
+    Yield the changes collected for one file that have not been seen in an earlier file.
+    """
+    for name, (old_version, new_version) in file_reqs.items():
+        change = RequirementChange(name, old_version, new_version)
+        if change in seen:
+            continue
+        seen.add(change)
+        yield change
+
+
+def iter_requirement_changes(lines):
+    """
+    Yield a RequirementChange for each changed requirement.
+
+    ``lines`` may be any iterable of ``str`` or ``bytes`` lines, with or without line
+    endings, e.g. an open file or ``requests.Response.iter_lines()``. Only the changes for
+    the current file are held in memory, and a change that is repeated across several
+    requirements files is only yielded once. A requirement that was only added has an
+    ``old_version`` of None, and one that was only removed has a ``new_version`` of None.
+    """
+    seen = set()
+    file_reqs = None
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if line.startswith(DIFF_HEADER):
+            if file_reqs:
+                yield from _file_changes(file_reqs, seen)
+            # Only files that look like requirements files are considered.
+            file_reqs = {} if FILENAME_REGEX.search(line) else None
+            continue
+        if file_reqs is None:
+            continue
+
+        match = match_requirement_line(line)
+        if match:
+            change, name, version = match
+            # Package names repeat across files and diffs, so share one copy of each.
+            versions = file_reqs.setdefault(sys.intern(name), [None, None])
+            versions[1 if change == '+' else 0] = version
+
+    if file_reqs:
+        yield from _file_changes(file_reqs, seen)
+
+
+def is_requirements_file(path):
+    """
+    Return whether changes to ``path`` are considered by iter_requirement_changes.
+    """
+    return bool(FILENAME_REGEX.search(path))
+
+
+def iter_file_diffs(files):
+    """
+    Yield the lines of a git style unified diff for ``files``.
+
+    ``files`` is an iterable of ``(old_path, new_path, old_text, new_text)`` tuples,
+    with None for the text of a file that does not exist on that side. The output can
+    be passed to iter_requirement_changes in place of a pull request diff.
+    """
+    for old_path, new_path, old_text, new_text in files:
+        yield "{} a/{} b/{}".format(DIFF_HEADER, old_path, new_path)
+        yield from difflib.unified_diff(
+            (old_text or '').splitlines(), (new_text or '').splitlines(),
+            'a/{}'.format(old_path) if old_text is not None else '/dev/null',
+            'b/{}'.format(new_path) if new_text is not None else '/dev/null',
+            lineterm='',
+        )
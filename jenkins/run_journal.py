@@ -0,0 +1,114 @@
+"""
+Journal of the steps each pull request creator run has finished, kept in SQLite.
+
+Creating a pull request takes several GitHub calls that cannot simply be repeated:
+the commit, the branch, the pull request and the reviews and comments on it. Each
+step is recorded with its outcome as soon as it succeeds, so that a run which failed
+half way through picks up where it stopped when it is started again.
+
+Resuming is opt-in: runs only share a journal when they are given the same file.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger()
+
+# Unfinished runs are forgotten after this long, as their branches have most likely moved on.
+DEFAULT_MAX_AGE = 7 * 24 * 60 * 60
+
+
+class RunJournal:
+    """
+    Record the finished steps of runs, keyed by what the run is about to propose.
+
+    Without a ``journal_path`` the journal is only kept in memory, for the life of the process.
+    """
+
+    def __init__(self, journal_path=None, max_age=DEFAULT_MAX_AGE):
+        self.journal_path = journal_path
+        self.max_age = max_age
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def run_key(*parts):
+        """
+        Return the key of the run described by ``parts``, e.g. the repository, branch and content.
+        """
+        return hashlib.sha256('\0'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+    def _connect(self, journal_path):
+        """
+        Open the database at ``journal_path``, creating it if needed, and drop runs older than ``max_age``.
+        """
+        if journal_path != ':memory:':
+            os.makedirs(os.path.dirname(journal_path) or '.', exist_ok=True)
+        # Autocommit, so that every step is on disk before the next one starts.
+        connection = sqlite3.connect(journal_path, timeout=30, isolation_level=None, check_same_thread=False)
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS steps ('
+            'run_key TEXT NOT NULL, step TEXT NOT NULL, value TEXT, recorded_at REAL NOT NULL, '
+            'PRIMARY KEY (run_key, step))'
+        )
+        connection.execute(
+            'DELETE FROM steps WHERE run_key IN '
+            '(SELECT run_key FROM steps GROUP BY run_key HAVING MAX(recorded_at) < ?)',
+            (time.time() - self.max_age,)
+        )
+        return connection
+
+    @property
+    def connection(self):
+        """
+        The database connection, opened on first use.
+        """
+        if self._connection is None:
+            journal_path = os.path.expanduser(self.journal_path) if self.journal_path else ':memory:'
+            try:
+                self._connection = self._connect(journal_path)
+            except (OSError, sqlite3.Error) as error:
+                # A run that cannot be resumed is still better than no run at all.
+                logger.warning("Run journal %s is unavailable, keeping it in memory: %s", journal_path, error)
+                self._connection = self._connect(':memory:')
+        return self._connection
+
+    def steps(self, run_key):
+        """
+        Return the steps recorded for ``run_key``, as a dict of step name to value.
+        """
+        with self._lock:
+            rows = self.connection.execute(
+                'SELECT step, value FROM steps WHERE run_key = ? ORDER BY recorded_at', (run_key,)
+            ).fetchall()
+        return {step: json.loads(value) for step, value in rows}
+
+    def record(self, run_key, step, value=None):
+        """
+        Record that ``step`` of ``run_key`` finished with ``value``, which must be JSON serializable.
+        """
+        with self._lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO steps (run_key, step, value, recorded_at) VALUES (?, ?, ?, ?)',
+                (run_key, step, json.dumps(value), time.time())
+            )
+
+    def forget(self, run_key):
+        """
+        Remove every step recorded for ``run_key``.
+        """
+        with self._lock:
+            self.connection.execute('DELETE FROM steps WHERE run_key = ?', (run_key,))
+
+    def close(self):
+        """
+        Close the database connection, if it was opened.
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
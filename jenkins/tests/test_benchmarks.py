@@ -0,0 +1,39 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from click.testing import CliRunner
+
+from jenkins.benchmarks.run import main
+from jenkins.benchmarks.synthetic import make_requirements_diff
+from jenkins.github_helpers import GitHubHelper
+
+
+class BenchmarkTestCase(TestCase):
+
+    def test_synthetic_diff_has_requested_size(self):
+        diff = make_requirements_diff(1200, lines_per_file=500)
+        changed = [line for line in diff.splitlines() if line[:1] in '+-' and line[:3] not in ('+++', '---')]
+        assert len(changed) == 1200
+        assert diff.count('diff --git') == 3
+        valid_reqs, suspicious_reqs = GitHubHelper().compare_pr_differnce(diff)
+        assert valid_reqs and suspicious_reqs
+
+    def test_writes_json_report(self):
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        output = os.path.join(output_dir, 'results.json')
+        result = CliRunner().invoke(main, [
+            '--output', output, '--diff-sizes', '10,20', '--tree-sizes', '4', '--line-lengths', '100', '--repeat', '1'
+        ])
+        assert result.exit_code == 0, result.output
+        with open(output, encoding='utf-8') as output_file:
+            report = json.load(output_file)
+        names = [(entry['name'], entry['size']) for entry in report['results']]
+        assert ('compare_pr_differnce', 20) in names
+        assert ('update_list_of_files', 4) in names
+        assert ('match_requirement_line:long_release', 105) in names
+        assert all(entry['best_seconds'] >= 0 for entry in report['results'])
@@ -0,0 +1,235 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring
+import os
+import random
+import re
+import shutil
+import subprocess
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from jenkins.benchmarks.end_to_end import (AUTOMERGE_VARIABLE, make_checkout,
+                                           run_end_to_end)
+from jenkins.benchmarks.fake_github import FakeGitHub
+from jenkins.github_helpers import GitHubHelper
+from jenkins.pull_request_creator import PullRequestCreator
+
+
+class FakeGitHubTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.fake = FakeGitHub(rate_limit=100)
+        self.fake.start()
+        self.addCleanup(self.fake.stop)
+        self.base_sha = self.fake.add_repository('edx/fake', {'README.md': 'readme\n'})
+        with patch.dict(os.environ, {'GITHUB_API_URL': self.fake.url, 'GITHUB_TOKEN': 'token',
+                                     'GITHUB_USER_EMAIL': 'bot@example.com', 'GITHUB_HTTP_RETRY_BACKOFF': '0'}):
+            self.helper = GitHubHelper()
+        self.addCleanup(self.helper.session.close)
+
+    def test_commit_branch_and_pull_request(self):
+        repository = self.helper.github_instance.get_repo('edx/fake')
+        tree = repository.get_git_tree(self.base_sha, recursive=True)
+        assert [element.path for element in tree.tree] == ['README.md']
+
+        state = self.fake.repositories['edx/fake']
+        commit_sha = self.helper.update_list_of_files(
+            repository, os.path.dirname(__file__), ['__init__.py'], 'commit', self.base_sha, 'bot'
+        )
+        assert sorted(state.tree_of(commit_sha)) == ['README.md', '__init__.py']
+
+        self.helper.create_branch(repository, 'refs/heads/jenkins/change-1234567', commit_sha)
+        assert self.helper.branch_exists(repository, 'jenkins/change-1234567')
+        pull_request = self.helper.create_pull_request(
+            repository, 'title', 'body', 'master', 'refs/heads/jenkins/change-1234567', team_reviewers=['arch']
+        )
+        assert pull_request.number == 1
+        assert state.pulls[1]['teams'] == ['arch']
+
+        user = self.helper.github_instance.get_user()
+        found = self.helper.find_bot_pull_requests(repository, user.login, 'jenkins/change-')
+        assert [pull.number for pull in found] == [1]
+
+    def test_identical_content_is_not_proposed_twice(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        repo_root = os.path.join(work_dir, 'upgrade')
+        head_sha, files = make_checkout(repo_root, 'edx/upgrade', 20, random.Random(0))
+        self.fake.add_repository('edx/upgrade', files, commit_sha=head_sha)
+
+        def create():
+            creator = PullRequestCreator(repo_root, 'upgrade', '', '', 'chore: upgrade', 'Upgrade', 'Upgrade.',
+                                         github_helper=self.helper)
+            return creator.create(True)
+
+        assert create().number == 1
+        # The base moves on, but the proposed files are the same.
+        subprocess.run(['git', '-c', 'user.name=Test', '-c', 'user.email=test@example.com',
+                        'commit', '-q', '--allow-empty', '-m', 'moved on'], cwd=repo_root, check=True)
+        assert create() is None
+        state = self.fake.repositories['edx/upgrade']
+        assert [pull['state'] for pull in state.pulls.values()] == ['open']
+
+    def test_update_existing_pull_request(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        repo_root = os.path.join(work_dir, 'upgrade')
+        head_sha, files = make_checkout(repo_root, 'edx/upgrade', 20, random.Random(0))
+        self.fake.add_repository('edx/upgrade', files, commit_sha=head_sha)
+        state = self.fake.repositories['edx/upgrade']
+
+        def create():
+            creator = PullRequestCreator(repo_root, 'upgrade', '', 'arch', 'chore: upgrade', 'Upgrade', 'Upgrade.',
+                                         github_helper=self.helper, update_existing_pr=True)
+            return creator.create(True)
+
+        assert create().number == 1
+        first_head = state.refs['heads/' + state.pulls[1]['head']]
+        state.pulls[1]['comments'].append('Looks good')
+
+        with open(os.path.join(repo_root, 'requirements/base.txt'), 'a', encoding='utf-8') as requirements:
+            requirements.write('extra==1.0.0\n')
+        assert create().number == 1
+
+        assert list(state.pulls) == [1]
+        pull = state.pulls[1]
+        new_head = state.refs['heads/' + pull['head']]
+        assert new_head != first_head
+        assert state.commits[new_head]['parents'] == [head_sha]
+        _, blob_sha = state.tree_of(new_head)['requirements/base.txt']
+        assert b'extra==1.0.0' in state.blobs[blob_sha]
+        assert pull['teams'] == ['arch']
+        assert pull['comments'] == ['Looks good']
+        assert pull['body'].startswith('Upgrade.')
+
+    def test_updated_upgrade_is_verified_again(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        repo_root = os.path.join(work_dir, 'upgrade')
+        head_sha, files = make_checkout(repo_root, 'edx/upgrade', 20, random.Random(0))
+        self.fake.add_repository('edx/upgrade', files, commit_sha=head_sha, variables={AUTOMERGE_VARIABLE: 'True'})
+        state = self.fake.repositories['edx/upgrade']
+
+        def create():
+            creator = PullRequestCreator(repo_root, 'upgrade', '', '', 'chore: upgrade', self.helper.UPGRADE_PR_TITLE,
+                                         'Upgrade.', github_helper=self.helper, update_existing_pr=True)
+            return creator.create(True)
+
+        assert create().number == 1
+        pull = state.pulls[1]
+        assert pull['labels'] == ['Ready to Merge']
+        assert len(pull['comments']) == 1
+
+        # The new content has a major upgrade, which is not to be merged automatically.
+        requirements_path = os.path.join(repo_root, 'requirements/base.txt')
+        with open(requirements_path, encoding='utf-8') as requirements:
+            content = requirements.read()
+        content = re.sub(r'package-0==(\d+)', lambda match: 'package-0=={}'.format(int(match[1]) + 1), content)
+        with open(requirements_path, 'w', encoding='utf-8') as requirements:
+            requirements.write(content)
+        assert create().number == 1
+
+        assert list(state.pulls) == [1]
+        assert not pull['labels']
+        assert len(pull['comments']) == 2
+        assert pull['comments'][0].startswith(self.helper.VALID_UPGRADES_SUMMARY)
+        assert 'package-0' not in pull['comments'][0]
+        assert pull['comments'][1].startswith(self.helper.MANUAL_REVIEW_SUMMARY)
+        assert 'package-0' in pull['comments'][1]
+
+    def test_failed_run_resumes_from_journal(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        repo_root = os.path.join(work_dir, 'upgrade')
+        head_sha, files = make_checkout(repo_root, 'edx/upgrade', 20, random.Random(0))
+        self.fake.add_repository('edx/upgrade', files, commit_sha=head_sha)
+        state = self.fake.repositories['edx/upgrade']
+        journal_path = os.path.join(work_dir, 'journal.sqlite3')
+
+        def create():
+            creator = PullRequestCreator(repo_root, 'upgrade', '', 'arch', 'chore: upgrade', 'Upgrade', 'Upgrade.',
+                                         github_helper=self.helper, journal_path=journal_path)
+            return creator.create(False)
+
+        # The commit and branch are made, but opening the pull request fails.
+        self.fake.inject_failure('POST', r'/pulls$', status=422)
+        with self.assertRaises(Exception):
+            create()
+        assert not state.pulls
+        commit_count = len(state.commits)
+        branch_head = state.refs['heads/jenkins/upgrade-{}'.format(head_sha[:7])]
+
+        # Then the pull request is opened, but tagging its reviewers fails.
+        self.fake.inject_failure('POST', r'/requested_reviewers$', status=422)
+        with self.assertRaises(Exception):
+            create()
+        assert list(state.pulls) == [1]
+        assert not state.pulls[1]['teams']
+
+        assert create().number == 1
+        assert list(state.pulls) == [1]
+        assert state.pulls[1]['teams'] == ['arch']
+        # Neither the commit nor the branch were made again.
+        assert len(state.commits) == commit_count
+        assert state.pulls[1]['head_sha'] == branch_head
+
+        # Once finished, a run with the same content is left to the usual checks.
+        assert create() is None
+        assert list(state.pulls) == [1]
+
+    def test_closed_pull_request_is_not_resumed(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        repo_root = os.path.join(work_dir, 'upgrade')
+        head_sha, files = make_checkout(repo_root, 'edx/upgrade', 20, random.Random(0))
+        self.fake.add_repository('edx/upgrade', files, commit_sha=head_sha)
+        state = self.fake.repositories['edx/upgrade']
+        journal_path = os.path.join(work_dir, 'journal.sqlite3')
+
+        def create():
+            creator = PullRequestCreator(repo_root, 'upgrade', '', 'arch', 'chore: upgrade', 'Upgrade', 'Upgrade.',
+                                         github_helper=self.helper, journal_path=journal_path)
+            return creator.create(True)
+
+        self.fake.inject_failure('POST', r'/requested_reviewers$', status=422)
+        with self.assertRaises(Exception):
+            create()
+        # Someone closes the half finished pull request, and deletes its branch, before the run is retried.
+        state.pulls[1]['state'] = 'closed'
+        del state.refs['heads/' + state.pulls[1]['head']]
+
+        assert create().number == 2
+        assert state.pulls[1]['state'] == 'closed'
+        assert not state.pulls[1]['teams']
+        assert state.pulls[2]['teams'] == ['arch']
+
+    def test_rate_limit_headers_and_failures(self):
+        self.fake.inject_failure('GET', r'^/repos/edx/fake$', status=502, count=1)
+        repository = self.helper.github_instance.get_repo('edx/fake')
+        # The 502 was retried by the session.
+        assert repository.full_name == 'edx/fake'
+        assert self.fake.stats()['GET ' + r'/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)'] == 1
+        bucket = self.helper.rate_limiter._bucket('core')  # pylint: disable=protected-access
+        assert bucket.rate > 0
+
+    def test_search_has_a_limit_of_its_own(self):
+        fake = FakeGitHub(search_rate_limit=2)
+        headers = [fake._count_rate_limit('search')[0] for _ in range(2)]  # pylint: disable=protected-access
+        assert [header['X-RateLimit-Limit'] for header in headers] == ['2', '2']
+        assert headers[-1]['X-RateLimit-Remaining'] == '0'
+        assert fake._count_rate_limit('search')[1]  # pylint: disable=protected-access
+        core_headers, limited = fake._count_rate_limit('core')  # pylint: disable=protected-access
+        assert not limited
+        assert core_headers['X-RateLimit-Remaining'] == '4999'
+
+    def test_end_to_end(self):
+        # GitHub's own limits and write interval, under which each run searches once, to close old PRs.
+        report = run_end_to_end(repos=2, requirements=20, workers=2)
+        assert report['parameters']['search_rate_limit'] == 30
+        assert report['parameters']['write_interval'] == 1.0
+        assert report['errors'] == []
+        assert report['created'] == 2
+        assert report['failed'] == 0
+        assert report['labelled'] == 2
+        assert report['requests_per_repo'] > 0
@@ -0,0 +1,95 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring
+import os
+import shutil
+import subprocess
+import tempfile
+from unittest import TestCase
+
+from jenkins.git_changes import (ADDED, DELETED, MODE_CHANGED, MODIFIED,
+                                 RENAMED, FileChange, content_fingerprint,
+                                 get_working_tree_changes, parse_porcelain_v2,
+                                 read_head_files)
+
+
+class ParsePorcelainTestCase(TestCase):
+
+    def test_parse_entries(self):
+        output = (
+            "1 .M N... 100644 100644 100644 aaa aaa docs/a file.txt\0"
+            "1 A. N... 000000 100644 100644 000 bbb added.txt\0"
+            "1 .D N... 100644 100644 000000 ccc ccc removed.txt\0"
+            "1 .M N... 100644 100644 100755 ddd ddd run.sh\0"
+            "2 R. N... 100644 100644 100644 eee eee R100 new.txt\0old.txt\0"
+            "? untracked.txt\0"
+        )
+        assert parse_porcelain_v2(output) == [
+            FileChange(MODIFIED, "docs/a file.txt", None, "100644"),
+            FileChange(ADDED, "added.txt", None, "100644"),
+            FileChange(DELETED, "removed.txt", None, "000000"),
+            FileChange(MODE_CHANGED, "run.sh", None, "100755"),
+            FileChange(RENAMED, "new.txt", "old.txt", "100644"),
+            FileChange(ADDED, "untracked.txt", None, None),
+        ]
+
+    def test_parse_rename_then_delete(self):
+        output = "2 RD N... 100644 100644 000000 eee eee R100 new.txt\0old.txt\0"
+        assert [change.kind for change in parse_porcelain_v2(output)] == [DELETED, DELETED]
+
+
+class WorkingTreeChangesTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.repo_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.repo_root)
+        self.git('init', '-q')
+        for name in ('keep.txt', 'edit.txt', 'move.txt', 'drop.txt'):
+            self.write(name, name)
+        self.git('add', '.')
+        self.git('-c', 'user.name=Test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', 'base')
+
+    def git(self, *args):
+        subprocess.run(['git', *args], cwd=self.repo_root, check=True)
+
+    def write(self, name, content):
+        with open(os.path.join(self.repo_root, name), 'w', encoding='utf-8') as new_file:
+            new_file.write(content)
+
+    def test_changes(self):
+        self.write('edit.txt', 'edited')
+        self.git('mv', 'move.txt', 'moved.txt')
+        os.remove(os.path.join(self.repo_root, 'drop.txt'))
+        self.write('new.txt', 'new')
+
+        changes = get_working_tree_changes(self.repo_root)
+        assert sorted((change.kind, change.path, change.old_path) for change in changes) == [
+            (DELETED, 'drop.txt', None),
+            (MODIFIED, 'edit.txt', None),
+            (RENAMED, 'moved.txt', 'move.txt'),
+        ]
+        changes = get_working_tree_changes(self.repo_root, untracked_files_required=True)
+        assert FileChange(ADDED, 'new.txt', None, None) in changes
+
+    def test_read_head_files(self):
+        self.write('edit.txt', 'edited')
+        self.write('new.txt', 'new')
+        contents = read_head_files(self.repo_root, ['edit.txt', 'new.txt', 'keep.txt'])
+        assert contents == {'edit.txt': b'edit.txt', 'new.txt': None, 'keep.txt': b'keep.txt'}
+        assert not read_head_files(self.repo_root, [])
+
+    def test_content_fingerprint(self):
+        self.write('edit.txt', 'edited')
+        changes = get_working_tree_changes(self.repo_root)
+        fingerprint = content_fingerprint(self.repo_root, changes)
+        # Paths and FileChange entries for the same content agree, whatever the order.
+        assert content_fingerprint(self.repo_root, ['edit.txt']) == fingerprint
+        # A new base commit does not change the fingerprint of the same content.
+        self.git('-c', 'user.name=Test', '-c', 'user.email=test@example.com',
+                 'commit', '-q', '--allow-empty', '-m', 'moved on')
+        assert content_fingerprint(self.repo_root, get_working_tree_changes(self.repo_root)) == fingerprint
+
+        self.write('edit.txt', 'edited again')
+        assert content_fingerprint(self.repo_root, changes) != fingerprint
+        os.remove(os.path.join(self.repo_root, 'drop.txt'))
+        assert content_fingerprint(self.repo_root, ['edit.txt', 'drop.txt']) != \
+            content_fingerprint(self.repo_root, ['edit.txt'])
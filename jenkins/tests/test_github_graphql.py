@@ -0,0 +1,175 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring
+import json
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from github import GithubObject
+
+from jenkins.github_graphql import GitHubGraphQL, GraphQLError
+from jenkins.github_helpers import GitHubHelper
+
+
+def graphql_response(data=None, errors=None, status_code=200):
+    response = Mock(status_code=status_code)
+    response.json.return_value = {'data': data, 'errors': errors}
+    return response
+
+
+class GitHubGraphQLTestCase(TestCase):
+
+    def test_execute_raises_on_errors(self):
+        session = Mock()
+        session.post.return_value = graphql_response(errors=[{'message': 'Not found'}])
+        with self.assertRaisesRegex(GraphQLError, 'Not found'):
+            GitHubGraphQL(session, 'token').execute('query { viewer { login } }')
+
+        session.post.return_value = graphql_response(status_code=502)
+        with self.assertRaisesRegex(GraphQLError, '502'):
+            GitHubGraphQL(session, 'token').execute('query { viewer { login } }')
+
+    def test_reviewer_ids_are_cached(self):
+        session = Mock()
+        session.post.return_value = graphql_response({
+            'n0': {'id': 'U_1'},
+            'n1': {'team': {'id': 'T_1'}},
+        })
+        client = GitHubGraphQL(session, 'token')
+        assert client.get_reviewer_ids('edx', ['alice'], ['arch-bom']) == (['U_1'], ['T_1'])
+        assert client.get_reviewer_ids('edx', ['alice'], ['arch-bom']) == (['U_1'], ['T_1'])
+        assert session.post.call_count == 1
+        variables = session.post.call_args[1]['json']['variables']
+        assert variables == {'org': 'edx', 'n0': 'alice', 'n1': 'arch-bom'}
+
+    def test_unknown_reviewer(self):
+        session = Mock()
+        session.post.return_value = graphql_response({'n0': None})
+        with self.assertRaisesRegex(GraphQLError, 'user nobody'):
+            GitHubGraphQL(session, 'token').get_reviewer_ids('edx', ['nobody'], [])
+
+    def test_comments_and_labels_in_one_mutation(self):
+        session = Mock()
+        session.post.return_value = graphql_response({})
+        GitHubGraphQL(session, 'token').add_comments_and_labels('PR_1', ['first', 'second'], ['L_1'])
+        assert session.post.call_count == 1
+        payload = session.post.call_args[1]['json']
+        assert payload['query'].count('addComment(') == 2
+        assert 'addLabelsToLabelable' in payload['query']
+        assert payload['variables'] == {'subject': 'PR_1', 'c0': 'first', 'c1': 'second', 'labels': ['L_1']}
+
+    def test_nothing_to_add(self):
+        session = Mock()
+        GitHubGraphQL(session, 'token').add_comments_and_labels('PR_1', [], [])
+        assert not session.post.called
+
+
+class GitHubHelperGraphQLTestCase(TestCase):
+
+    def _repository(self):
+        """
+        A repository mock with the attributes used to create a pull request.
+        """
+        repository = Mock()
+        repository.node_id = 'R_1'
+        repository.url = 'https://api.github.com/repos/edx/testeng-ci'
+        repository.full_name = 'edx/testeng-ci'
+        repository.owner.login = 'edx'
+        repository._requester = Mock()  # pylint: disable=protected-access
+        return repository
+
+    @patch('requests.Session.post')
+    def test_create_pull_request(self, post_mock):
+        post_mock.side_effect = [
+            graphql_response({'createPullRequest': {'pullRequest': {
+                'id': 'PR_1', 'number': 7, 'title': 'title', 'body': 'body',
+                'url': 'https://github.com/edx/testeng-ci/pull/7',
+            }}}),
+            graphql_response({'n0': {'id': 'U_1'}, 'n1': {'team': {'id': 'T_1'}}}),
+            graphql_response({'requestReviews': {'pullRequest': {'reviewRequests': {'nodes': [
+                {'requestedReviewer': {'login': 'alice'}},
+                {'requestedReviewer': {'slug': 'arch-bom', 'name': 'Arch BOM'}},
+            ]}}}}),
+        ]
+        repository = self._repository()
+        pull_request = GitHubHelper().create_pull_request(
+            repository, 'title', 'body', 'master', 'refs/heads/jenkins/branch',
+            user_reviewers=['alice'], team_reviewers=['arch-bom'], use_graphql=True
+        )
+        assert pull_request.number == 7
+        assert pull_request.html_url == 'https://github.com/edx/testeng-ci/pull/7'
+        assert post_mock.call_count == 3
+        create_input = post_mock.call_args_list[0][1]['json']['variables']['input']
+        assert create_input['headRefName'] == 'jenkins/branch'
+        assert create_input['repositoryId'] == 'R_1'
+        assert not repository.create_pull.called
+
+    @patch('requests.Session.post')
+    def test_create_pull_request_missing_reviewer(self, post_mock):
+        post_mock.side_effect = [
+            graphql_response({'createPullRequest': {'pullRequest': {
+                'id': 'PR_1', 'number': 7, 'title': 'title', 'body': 'body', 'url': 'url',
+            }}}),
+            graphql_response({'n0': {'id': 'U_1'}}),
+            graphql_response({'requestReviews': {'pullRequest': {'reviewRequests': {'nodes': []}}}}),
+        ]
+        with self.assertRaisesRegex(Exception, 'Some reviewers could not be tagged'):
+            GitHubHelper().create_pull_request(
+                self._repository(), 'title', 'body', 'master', 'jenkins/branch',
+                user_reviewers=['alice'], use_graphql=True
+            )
+
+    @patch('requests.Session.post')
+    def test_create_pull_request_falls_back_to_rest(self, post_mock):
+        post_mock.return_value = graphql_response(errors=[{'message': 'Resource not accessible'}])
+        repository = self._repository()
+        repository.get_pulls.return_value = []
+        repository.create_pull.return_value = Mock(title='title')
+        pull_request = GitHubHelper().create_pull_request(
+            repository, 'title', 'body', 'master', 'jenkins/branch', use_graphql=True
+        )
+        assert pull_request is repository.create_pull.return_value
+        assert repository.create_pull.called
+
+    @patch('requests.Session.post')
+    def test_create_pull_request_created_despite_error(self, post_mock):
+        post_mock.return_value = graphql_response(status_code=502)
+        repository = self._repository()
+        created = Mock(title='title', number=7)
+        repository.get_pulls.return_value = [created]
+        checkpoint = Mock()
+        pull_request = GitHubHelper().create_pull_request(
+            repository, 'title', 'body', 'master', 'refs/heads/jenkins/branch', team_reviewers=['arch-bom'],
+            verify_reviewers=False, use_graphql=True, checkpoint=checkpoint
+        )
+        assert pull_request is created
+        repository.get_pulls.assert_called_once_with(state='open', base='master', head='edx:jenkins/branch')
+        assert not repository.create_pull.called
+        created.create_review_request.assert_called_once_with(reviewers=GithubObject.NotSet,
+                                                              team_reviewers=['arch-bom'])
+        checkpoint.assert_any_call('pull_request', 7)
+
+    @patch('requests.Session.post')
+    @patch('requests.Session.get')
+    def test_verify_upgrade_packages_batches_comments(self, get_mock, post_mock):
+        diff = '\n'.join([
+            'diff --git a/requirements/base.txt b/requirements/base.txt',
+            '--- a/requirements/base.txt',
+            '+++ b/requirements/base.txt',
+            '-django==3.2.1',
+            '+django==4.0.1',
+        ])
+        response = Mock(status_code=200)
+        response.iter_lines.return_value = diff.splitlines()
+        response.__enter__ = Mock(return_value=response)
+        response.__exit__ = Mock(return_value=False)
+        get_mock.return_value = response
+        post_mock.return_value = graphql_response({})
+        pull_request = Mock(node_id='PR_1', _headers={})
+        pull_request.url = 'https://api.github.com/repos/edx/testeng-ci/pulls/7'
+
+        GitHubHelper().verify_upgrade_packages(pull_request, use_graphql=True)
+        assert post_mock.call_count == 1
+        query = post_mock.call_args[1]['json']['query']
+        assert query.count('addComment(') == 2
+        assert not pull_request.create_issue_comment.called
+        assert json.dumps(post_mock.call_args[1]['json']['variables']).count('django') == 1
+        assert 'manual review' in post_mock.call_args[1]['json']['variables']['c1']
@@ -1,8 +1,17 @@
 # pylint: disable=missing-module-docstring,missing-class-docstring
+import base64
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest import TestCase
 from unittest.mock import MagicMock, Mock, mock_open, patch
 
-from jenkins.github_helpers import GitHubHelper
+from jenkins.git_changes import RENAMED, FileChange
+from jenkins.github_helpers import Base64BlobPayload, GitHubHelper
 
 
 class HelpersTestCase(TestCase):
@@ -64,19 +73,94 @@ class HelpersTestCase(TestCase):
         assert correct_pr_one.edit.called
         assert correct_pr_two.edit.called
 
+    def test_close_existing_pull_requests_with_branch_prefix(self):
+        """
+        Make sure bot PRs are found with a search instead of listing every open PR.
+        """
+        def search_result(number, login, head_ref, base_ref="master", head_repo="openedx/edx-platform"):
+            pr = Mock(number=number)
+            pr.user.login = login
+            pr.head.ref = head_ref
+            pr.head.repo.full_name = head_repo
+            pr.base.ref = base_ref
+            return Mock(**{'as_pull_request.return_value': pr})
+
+        results = [
+            search_result(1, "fakeuser100", "jenkins/upgrade-python-requirements-ce0515e"),
+            search_result(2, "someoneelse", "jenkins/upgrade-python-requirements-0c51f37"),
+            search_result(3, "fakeuser100", "jenkins/other-branch-0c51f37"),
+            search_result(4, "fakeuser100", "jenkins/upgrade-python-requirements-0c51f37",
+                          head_repo="fork/edx-platform"),
+            search_result(5, "fakeuser100", "jenkins/upgrade-python-requirements-1234567", base_ref="release"),
+            search_result(6, "fakeuser100", "jenkins/upgrade-python-requirements-abcdef0"),
+        ]
+        helper = GitHubHelper()
+        helper.github_instance = Mock(**{'search_issues.return_value': results})
+        mock_repo = Mock(full_name="openedx/edx-platform")
+
+        with patch.object(helper, 'delete_branch') as delete_branch_mock:
+            deleted_pulls = helper.close_existing_pull_requests(
+                mock_repo, "fakeuser100", "John Smith", branch_prefix="jenkins/upgrade-python-requirements-"
+            )
+
+        assert deleted_pulls == [1, 6]
+        query = helper.github_instance.search_issues.call_args.args[0]
+        assert "repo:openedx/edx-platform" in query
+        assert "author:fakeuser100" in query
+        assert "head:jenkins/upgrade-python-requirements-" in query
+        assert not mock_repo.get_pulls.called
+        delete_branch_mock.assert_any_call(mock_repo, "jenkins/upgrade-python-requirements-ce0515e")
+        delete_branch_mock.assert_any_call(mock_repo, "jenkins/upgrade-python-requirements-abcdef0")
+        assert delete_branch_mock.call_count == 2
+
+    def test_find_pull_request_by_fingerprint(self):
+        helper = GitHubHelper()
+        marker = helper.FINGERPRINT_MARKER.format('abc')
+
+        def pull(number, login, head_ref, body):
+            pr = Mock(number=number, body=body)
+            pr.user.login = login
+            pr.head.ref = head_ref
+            pr.head.repo.full_name = "openedx/edx-platform"
+            pr.base.ref = "master"
+            return pr
+
+        listed = [
+            pull(1, "someoneelse", "jenkins/upgrade-ce0515e", marker),
+            pull(2, "fakeuser100", "jenkins/other-ce0515e", marker),
+            pull(3, "fakeuser100", "jenkins/upgrade-0c51f37", marker),
+        ]
+        mock_repo = Mock(full_name="openedx/edx-platform")
+        mock_repo.get_pulls.return_value.get_page.return_value = listed
+        helper.github_instance = Mock(per_page=30)
+
+        found = helper.find_pull_request_by_fingerprint(mock_repo, "fakeuser100", "jenkins/upgrade-", 'abc')
+        assert found is listed[2]
+        mock_repo.get_pulls.assert_called_once_with(state='open', base='master')
+        assert not helper.github_instance.search_issues.called
+
+        # A full page may not hold every open PR, so the search has the last word.
+        helper.github_instance.per_page = 3
+        helper.github_instance.search_issues.return_value = []
+        assert helper.find_pull_request_by_fingerprint(mock_repo, "fakeuser100", "jenkins/upgrade-", 'abc') is None
+        assert helper.github_instance.search_issues.called
+
     def test_get_updated_files_list_no_change(self):
-        git_instance = Mock()
-        git_instance.ls_files = MagicMock(return_value="")
-        with patch('jenkins.github_helpers.Git', return_value=git_instance):
+        with patch('jenkins.git_changes.subprocess.run', return_value=Mock(stdout=b"")):
             result = GitHubHelper().get_updated_files_list("edx-platform")
-            assert result == []
+            assert not result
 
     def test_get_updated_files_list_with_changes(self):
-        git_instance = Mock()
-        git_instance.ls_files = MagicMock(return_value="file1\nfile2")
-        with patch('jenkins.github_helpers.Git', return_value=git_instance):
+        status = Mock(stdout=(
+            b"1 .M N... 100644 100644 100644 aaa aaa file1\0"
+            b"1 .M N... 100644 100644 100644 bbb bbb file2\0"
+        ))
+        with patch('jenkins.git_changes.subprocess.run', return_value=status) as run_mock:
             result = GitHubHelper().get_updated_files_list("edx-platform")
-            assert result == ["file1", "file2"]
+            assert [change.path for change in result] == ["file1", "file2"]
+            assert run_mock.call_args.args[0] == [
+                'git', 'status', '--porcelain=v2', '-z', '--untracked-files=no'
+            ]
 
     def test_update_list_of_files_no_change(self):
         repo_mock = Mock()
@@ -107,6 +191,12 @@ class HelpersTestCase(TestCase):
         sha = "abc123"
         username = "fakeusername100"
 
+        repo_mock.get_git_tree.return_value.tree = [
+            Mock(path="path/to/file1", sha="1111111", type="blob", mode="100644"),
+            Mock(path="path/to/file2", sha="2222222", type="blob", mode="100644"),
+        ]
+        repo_mock.get_git_tree.return_value.raw_data = {"truncated": False}
+
         return_sha = GitHubHelper().update_list_of_files(repo_mock, repo_root, file_path_list, commit_message, sha,
                                                          username)
         assert repo_mock.create_git_tree.called
@@ -114,8 +204,237 @@ class HelpersTestCase(TestCase):
         assert return_sha is not None
     # pylint: enable=unused-argument
 
+    def test_get_blob_sha(self):
+        # Matches `printf 'hello\n' | git hash-object --stdin`
+        assert GitHubHelper().get_blob_sha("hello\n") == "ce013625030ba8dba906f756967f9e9ca394464a"
+        assert GitHubHelper().get_blob_sha(b"hello\n") == "ce013625030ba8dba906f756967f9e9ca394464a"
+
+    @patch('jenkins.github_helpers.InputGitAuthor')
+    @patch('jenkins.github_helpers.InputGitTreeElement')
+    # pylint: disable=unused-argument
+    def test_update_list_of_files_skips_unchanged_files(self, git_tree_mock, author_mock):
+        repo_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, repo_root)
+        for file_path, content in (("same.txt", "same\n"), ("changed.txt", "new\n")):
+            with open(os.path.join(repo_root, file_path), "w") as f:
+                f.write(content)
+
+        helper = GitHubHelper()
+        repo_mock = Mock()
+        repo_mock.get_git_tree.return_value.tree = [
+            Mock(path="same.txt", sha=helper.get_blob_sha("same\n"), type="blob", mode="100644"),
+            Mock(path="changed.txt", sha=helper.get_blob_sha("old\n"), type="blob", mode="100644"),
+        ]
+        repo_mock.get_git_tree.return_value.raw_data = {"truncated": False}
+
+        # A file missing both locally and from the base tree is not a change either.
+        return_sha = helper.update_list_of_files(repo_mock, repo_root, ["same.txt", "gone.txt"], "commit", "abc123",
+                                                 "fakeusername100")
+        assert return_sha is None
+        assert not repo_mock.create_git_tree.called
+
+        return_sha = helper.update_list_of_files(repo_mock, repo_root, ["same.txt", "changed.txt"], "commit",
+                                                 "abc123", "fakeusername100")
+        assert return_sha is not None
+        git_tree_mock.assert_called_once_with("changed.txt", "100644", "blob", content="new\n")
+    # pylint: enable=unused-argument
+
+    @patch('jenkins.github_helpers.InputGitAuthor')
+    # pylint: disable=unused-argument,protected-access
+    def test_update_list_of_files_uploads_blobs_in_chunks(self, author_mock):
+        repo_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, repo_root)
+        file_path_list = ["file{}.txt".format(index) for index in range(7)]
+        for file_path in file_path_list:
+            with open(os.path.join(repo_root, file_path), "w") as f:
+                f.write(file_path)
+
+        helper = GitHubHelper()
+        helper.blob_upload_min_files = 5
+        helper.tree_chunk_size = 3
+        repo_mock = Mock()
+        repo_mock.get_git_tree.return_value.tree = []
+        repo_mock.get_git_tree.return_value.raw_data = {"truncated": False}
+        repo_mock.create_git_blob.side_effect = lambda content, encoding: Mock(sha=helper.get_blob_sha(content))
+        trees = [Mock(), Mock(), Mock()]
+        repo_mock.create_git_tree.side_effect = trees
+
+        helper.update_list_of_files(repo_mock, repo_root, file_path_list, "commit", "abc123", "fakeusername100")
+
+        assert repo_mock.create_git_blob.call_count == 7
+        # 7 entries in chunks of 3, each tree built on top of the previous one
+        base_trees = [call.kwargs['base_tree'] for call in repo_mock.create_git_tree.call_args_list]
+        assert base_trees == [repo_mock.get_git_tree.return_value] + trees[:2]
+        entries = [entry for call in repo_mock.create_git_tree.call_args_list for entry in call.args[0]]
+        assert sorted(entry._identity['path'] for entry in entries) == file_path_list
+        for entry in entries:
+            identity = entry._identity
+            assert identity['sha'] == helper.get_blob_sha(identity['path'])
+            assert 'content' not in identity
+        assert repo_mock.create_git_commit.call_args.args[1] is trees[2]
+    # pylint: enable=unused-argument,protected-access
+
+    @patch('jenkins.github_helpers.InputGitAuthor')
+    @patch('jenkins.github_helpers.InputGitTreeElement')
+    # pylint: disable=unused-argument
+    def test_update_list_of_files_renames_without_upload(self, git_tree_mock, author_mock):
+        """
+        A renamed file is re-pointed at its existing blob rather than uploaded again.
+        """
+        helper = GitHubHelper()
+        repo_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, repo_root)
+        with open(os.path.join(repo_root, "new.txt"), "w", encoding="utf-8") as new_file:
+            new_file.write("moved\n")
+
+        repo_mock = Mock()
+        repo_mock.get_git_tree.return_value.tree = [
+            Mock(path="old.txt", sha=helper.get_blob_sha("moved\n"), type="blob", mode="100644"),
+        ]
+        repo_mock.get_git_tree.return_value.raw_data = {"truncated": False}
+        repo_mock.create_git_commit.return_value.sha = "newsha"
+
+        changes = [FileChange(RENAMED, "new.txt", "old.txt", "100644")]
+        assert helper.update_list_of_files(repo_mock, repo_root, changes, "commit", "abc123", "user") == "newsha"
+        assert not repo_mock.create_git_blob.called
+        git_tree_mock.assert_any_call("new.txt", "100644", "blob", sha=helper.get_blob_sha("moved\n"))
+        git_tree_mock.assert_any_call("old.txt", "100644", "blob", sha=None)
+        assert git_tree_mock.call_count == 2
+    # pylint: enable=unused-argument
+
+    def test_create_blobs_reports_failures(self):
+        repo_mock = Mock()
+        repo_mock.create_git_blob.side_effect = Exception("secondary rate limit")
+        with self.assertRaises(Exception):
+            GitHubHelper().create_blobs(repo_mock, {"file.txt": "content"})
+
+    def test_base64_blob_payload(self):
+        data = bytes(range(256)) * 5000
+        payload = Base64BlobPayload(data)
+        body = b''
+        while True:
+            chunk = payload.read(8192)
+            if not chunk:
+                break
+            body += chunk
+        assert len(body) == len(Base64BlobPayload(data))
+        assert base64.b64decode(json.loads(body)['content']) == data
+        assert json.loads(Base64BlobPayload(b'').read()) == {'encoding': 'base64', 'content': ''}
+
+    def test_get_file_blob_sha_and_mode(self):
+        repo_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, repo_root)
+        binary_path = os.path.join(repo_root, "artifact.whl")
+        with open(binary_path, "wb") as f:
+            f.write(b"\x00\xff\xfe binary" * 1000)
+        os.chmod(binary_path, 0o755)
+        empty_path = os.path.join(repo_root, "empty")
+        open(empty_path, "wb").close()  # pylint: disable=consider-using-with
+
+        helper = GitHubHelper()
+        for full_path in (binary_path, empty_path):
+            expected = subprocess.check_output(["git", "hash-object", full_path]).decode().strip()
+            assert helper.get_file_blob_sha(full_path) == expected
+        assert helper.get_file_mode(repo_root, "artifact.whl") == "100755"
+        assert helper.get_file_mode(repo_root, "empty") == "100644"
+
+    @patch('jenkins.github_helpers.InputGitAuthor')
+    @patch('jenkins.github_helpers.InputGitTreeElement')
+    @patch('requests.Session.post')
+    # pylint: disable=unused-argument
+    def test_update_list_of_files_streams_binary_files(self, post_mock, git_tree_mock, author_mock):
+        repo_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, repo_root)
+        with open(os.path.join(repo_root, "artifact.whl"), "wb") as f:
+            f.write(b"\x00\xff\xfe binary")
+        with open(os.path.join(repo_root, "run.sh"), "w") as f:
+            f.write("#!/bin/sh\n")
+        os.chmod(os.path.join(repo_root, "run.sh"), 0o755)
+
+        helper = GitHubHelper()
+        repo_mock = Mock(url="https://api.github.com/repos/openedx/testeng-ci")
+        # run.sh only changes mode, which still needs a new tree entry
+        repo_mock.get_git_tree.return_value.tree = [
+            Mock(path="run.sh", sha=helper.get_blob_sha("#!/bin/sh\n"), type="blob", mode="100644"),
+        ]
+        repo_mock.get_git_tree.return_value.raw_data = {"truncated": False}
+        repo_mock.create_git_blob.return_value.sha = "textsha"
+        post_mock.return_value.json.return_value = {"sha": "binarysha"}
+
+        helper.update_list_of_files(repo_mock, repo_root, ["artifact.whl", "run.sh"], "commit", "abc123",
+                                    "fakeusername100")
+
+        assert post_mock.call_args.args[0] == "https://api.github.com/repos/openedx/testeng-ci/git/blobs"
+        assert isinstance(post_mock.call_args.kwargs['data'], Base64BlobPayload)
+        git_tree_mock.assert_any_call("artifact.whl", "100644", "blob", sha="binarysha")
+        # ...but its content is already in the repository, so nothing is uploaded for it.
+        git_tree_mock.assert_any_call("run.sh", "100755", "blob", sha=helper.get_blob_sha("#!/bin/sh\n"))
+        assert not repo_mock.create_git_blob.called
+    # pylint: enable=unused-argument
+
     def test_get_file_contents(self):
-        with patch("builtins.open", mock_open(read_data="data")) as mock_file:
+        with patch("builtins.open", mock_open(read_data=b"data")) as mock_file:
             contents = GitHubHelper().get_file_contents("../../edx-platform", "path/to/file")
-            mock_file.assert_called_with("../../edx-platform/path/to/file", "r", encoding='utf-8')
-            assert contents == "data"
+            mock_file.assert_called_with("../../edx-platform/path/to/file", "rb")
+            assert contents == b"data"
+
+    def test_read_local_file_keeps_line_endings(self):
+        repo_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, repo_root)
+        with open(os.path.join(repo_root, "windows.txt"), "wb") as opened_file:
+            opened_file.write(b"one\r\ntwo\r\n")
+        git_sha = subprocess.run(
+            ["git", "hash-object", "windows.txt"], cwd=repo_root, check=True, capture_output=True, text=True
+        ).stdout.strip()
+
+        helper = GitHubHelper()
+        content, blob_sha = helper._read_local_file(repo_root, "windows.txt")  # pylint: disable=protected-access
+        assert content == "one\r\ntwo\r\n"
+        assert blob_sha == git_sha
+
+    @patch.dict(os.environ, {'GITHUB_HTTP_POOL_SIZE': '4', 'GITHUB_HTTP_MAX_RETRIES': '2'})
+    def test_session_is_pooled_and_retries(self):
+        helper = GitHubHelper()
+        adapter = helper.session.get_adapter("https://api.github.com/")
+        assert adapter._pool_maxsize == 4  # pylint: disable=protected-access
+        assert adapter.max_retries.total == 2
+        assert 503 in adapter.max_retries.status_forcelist
+        assert 403 not in adapter.max_retries.status_forcelist
+
+    def test_session_retries_server_errors_on_one_connection(self):
+        statuses = [503, 200]
+        client_ports = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """
+                Answer with the next queued status, keeping the connection open.
+                """
+                client_ports.append(self.client_address[1])
+                body = b'{"value": "True"}'
+                self.send_response(statuses.pop(0))
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        server.daemon_threads = True
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        with patch.dict(os.environ, {'GITHUB_HTTP_RETRY_BACKOFF': '0'}):
+            helper = GitHubHelper()
+        try:
+            location = "http://127.0.0.1:{}/repos/edx/repo/pulls/1".format(server.server_port)
+            assert helper.check_automerge_variable_value(location) is True
+        finally:
+            helper.session.close()
+            server.shutdown()
+            server.server_close()
+        assert not statuses
+        # The retry went out over the same kept-alive connection.
+        assert len(set(client_ports)) == 1
@@ -0,0 +1,108 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+from requests.models import Response
+
+from jenkins.github_helpers import GitHubHelper
+from jenkins.http_cache import CachingHTTPAdapter, HttpCache
+
+
+def make_response(status_code, body=b'', headers=None):
+    """
+    Build a requests Response as the transport would return it.
+    """
+    response = Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = body  # pylint: disable=protected-access
+    response._content_consumed = True  # pylint: disable=protected-access
+    return response
+
+
+class HttpCacheTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        self.cache = HttpCache(self.cache_dir, scope='token')
+        self.session = requests.Session()
+        self.session.mount('https://', CachingHTTPAdapter(self.cache))
+
+    @patch('requests.adapters.HTTPAdapter.send')
+    def test_conditional_request_replays_cached_body(self, send_mock):
+        send_mock.side_effect = [
+            make_response(200, b'{"name": "testeng-ci"}', {'ETag': '"abc"', 'X-RateLimit-Remaining': '10'}),
+            make_response(304, headers={'ETag': '"abc"', 'X-RateLimit-Remaining': '10'}),
+        ]
+        first = self.session.get('https://api.github.com/repos/openedx/testeng-ci')
+        second = self.session.get('https://api.github.com/repos/openedx/testeng-ci')
+
+        assert first.json() == second.json() == {'name': 'testeng-ci'}
+        assert second.status_code == 200
+        assert second.headers['X-Cache'] == 'HIT'
+        conditional_request = send_mock.call_args_list[1].args[0]
+        assert conditional_request.headers['If-None-Match'] == '"abc"'
+        assert self.cache.stats()['hits'] == 1
+        assert self.cache.stats()['misses'] == 1
+
+    @patch('requests.adapters.HTTPAdapter.send')
+    def test_cache_is_keyed_by_scope_and_accept(self, send_mock):
+        send_mock.return_value = make_response(200, b'diff', {'ETag': '"abc"'})
+        self.session.get('https://api.github.com/repos/o/r/pulls/1', headers={'Accept': 'application/vnd.github.diff'})
+        self.session.get('https://api.github.com/repos/o/r/pulls/1', headers={'Accept': 'application/json'})
+        assert 'If-None-Match' not in send_mock.call_args.args[0].headers
+
+        other_scope = HttpCache(self.cache_dir, scope='other-token')
+        url = 'https://api.github.com/repos/o/r/pulls/1'
+        assert other_scope.get(other_scope.key(url, 'application/json')) is None
+        assert self.cache.get(self.cache.key(url, 'application/json')) is not None
+
+    @patch('requests.adapters.HTTPAdapter.send')
+    def test_uncacheable_responses_are_not_stored(self, send_mock):
+        send_mock.return_value = make_response(200, b'no validators')
+        self.session.get('https://api.github.com/rate_limit')
+        send_mock.return_value = make_response(404, b'missing', {'ETag': '"abc"'})
+        self.session.get('https://api.github.com/repos/o/missing')
+        assert self.cache.stats()['entries'] == 0
+
+    def test_eviction_removes_least_recently_used(self):
+        cache = HttpCache(self.cache_dir, max_bytes=2500)
+        for index, key in enumerate(('old', 'used', 'new')):
+            cache.set(key, {'etag': key, 'headers': {}}, b'x' * 1000)
+            os.utime(os.path.join(self.cache_dir, key + '.json'), (index, index))
+            if key == 'used':
+                cache.get('old')
+        assert cache.get('used') is None
+        assert cache.get('old') is not None
+        assert cache.get('new') is not None
+        assert cache.stats()['evictions'] == 1
+        # The running total matches what is on disk, also after an entry is overwritten.
+        cache.set('new', {'etag': 'newer', 'headers': {}}, b'x' * 500)
+        on_disk = sum(os.path.getsize(os.path.join(self.cache_dir, name)) for name in os.listdir(self.cache_dir))
+        assert cache.stats()['bytes'] == on_disk
+        # Sizes are picked up again from disk.
+        assert HttpCache(self.cache_dir).stats() == dict(cache.stats(), evictions=0, hits=0, misses=0)
+        assert HttpCache(self.cache_dir).stats()['entries'] == 2
+
+    def test_body_that_does_not_match_its_metadata_is_a_miss(self):
+        self.cache.set('key', {'etag': 'abc', 'headers': {}}, b'complete body')
+        assert self.cache.get('key') == ({'etag': 'abc', 'headers': {}, 'body_bytes': 13}, b'complete body')
+        with open(os.path.join(self.cache_dir, 'key.body'), 'wb') as body_file:
+            body_file.write(b'torn')
+        assert self.cache.get('key') is None
+        assert not [name for name in os.listdir(self.cache_dir) if name.endswith('.tmp')]
+
+    def test_github_helper_shares_session_with_pygithub(self):
+        with patch.dict(os.environ, {'GITHUB_HTTP_CACHE_DIR': self.cache_dir}):
+            helper = GitHubHelper()
+        requester = helper.github_instance._Github__requester  # pylint: disable=protected-access
+        connection = requester._Requester__createConnection()  # pylint: disable=protected-access
+        assert connection.session is helper.session
+        assert helper.get_http_cache_stats() == {'hits': 0, 'misses': 0, 'evictions': 0, 'entries': 0, 'bytes': 0}
+        assert GitHubHelper().get_http_cache_stats() is None
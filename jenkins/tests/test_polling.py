@@ -0,0 +1,52 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from jenkins.polling import poll_until
+
+
+class PollUntilTestCase(TestCase):
+
+    @patch('jenkins.polling.time.sleep')
+    def test_returns_immediately_when_ready(self, sleep_mock):
+        func = Mock(return_value='ready')
+        assert poll_until(func, 'thing') == 'ready'
+        assert func.call_count == 1
+        assert not sleep_mock.called
+
+    def test_retries_until_ready(self):
+        func = Mock(side_effect=[None, Exception("not yet"), 'ready'])
+        assert poll_until(func, 'thing', initial_delay=0.001) == 'ready'
+        assert func.call_count == 3
+
+    def test_backoff_grows_and_is_capped(self):
+        func = Mock(side_effect=[None] * 5 + ['ready'])
+        with patch('jenkins.polling.time.sleep') as sleep_mock:
+            poll_until(func, 'thing', initial_delay=1, max_delay=4, deadline=60)
+        delays = [call.args[0] for call in sleep_mock.call_args_list]
+        assert len(delays) == 5
+        for delay, base in zip(delays, [1, 2, 4, 4, 4]):
+            assert base / 2 <= delay <= base
+
+    def test_returns_last_result_at_deadline(self):
+        func = Mock(return_value=0)
+        assert poll_until(func, 'thing', deadline=0.02, initial_delay=0.001) == 0
+        assert func.call_count > 1
+
+    def test_reraises_last_error_at_deadline(self):
+        func = Mock(side_effect=ValueError("never ready"))
+        with self.assertRaises(ValueError):
+            poll_until(func, 'thing', deadline=0.02, initial_delay=0.001)
+
+    def test_closes_results_that_are_not_ready(self):
+        not_found, found = Mock(status_code=404), Mock(status_code=200)
+        func = Mock(side_effect=[not_found, found])
+        result = poll_until(func, 'thing', is_ready=lambda response: response.status_code == 200,
+                            initial_delay=0.001)
+        assert result is found
+        not_found.close.assert_called_once_with()
+        assert not found.close.called
+
+        last = Mock(status_code=404)
+        assert poll_until(Mock(return_value=last), 'thing', is_ready=lambda response: False, deadline=0) is last
+        assert not last.close.called
@@ -0,0 +1,122 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring
+import os
+import shutil
+import socket
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from click.testing import CliRunner
+
+from jenkins.daemon_client import submit_job
+from jenkins.pull_request_creator import main as creator_main
+from jenkins.pull_request_daemon import JobServer
+
+JOB = {
+    'branch_name': 'upgrade-python-requirements',
+    'commit_message': 'chore: upgrade',
+    'pr_title': 'Python Requirements Update',
+    'pr_body': 'make upgrade PR',
+}
+
+
+class PullRequestDaemonTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        self.socket_path = os.path.join(work_dir, 'daemon.sock')
+        self.github_helper = Mock()
+
+    def _start_server(self):
+        """
+        Serve jobs on a background thread until the test is over.
+        """
+        server = JobServer(self.socket_path, github_helper=self.github_helper, max_workers=2)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(thread.join)
+        self.addCleanup(server.shutdown)
+        return server
+
+    @patch('jenkins.pull_request_fleet.PullRequestCreator')
+    def test_jobs_run_concurrently(self, creator_mock):
+        both_running = threading.Barrier(2, timeout=10)
+
+        def create(**kwargs):  # pylint: disable=unused-argument
+            both_running.wait()
+            return Mock(number=7)
+
+        creator_mock.return_value.create.side_effect = create
+        creator_mock.return_value.repository.full_name = 'openedx/created'
+        self._start_server()
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(
+                lambda repo_root: submit_job(self.socket_path, dict(JOB, repo_root=repo_root), timeout=30),
+                ['one', 'two']
+            ))
+
+        assert [result['repo_root'] for result in results] == ['one', 'two']
+        assert [result['status'] for result in results] == ['created', 'created']
+        assert results[0]['pr_url'] == 'https://github.com/openedx/created/pull/7'
+        assert all(result['queued'] >= 0 and result['duration'] >= 0 for result in results)
+        for call in creator_mock.call_args_list:
+            assert call.kwargs['github_helper'] is self.github_helper
+
+    @patch('jenkins.pull_request_fleet.PullRequestCreator')
+    def test_invalid_jobs_are_rejected(self, creator_mock):
+        self._start_server()
+
+        result = submit_job(self.socket_path, {'repo_root': 'one'}, timeout=30)
+        assert result['status'] == 'failed'
+        assert 'Missing options' in result['error']
+        result = submit_job(self.socket_path, dict(JOB, repo_root='one', branch='typo'), timeout=30)
+        assert 'Unknown options' in result['error']
+        assert not creator_mock.called
+
+    def test_socket_is_private_and_replaces_a_stale_one(self):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+            stale.bind(self.socket_path)
+        server = self._start_server()
+        assert os.stat(self.socket_path).st_mode & 0o777 == 0o600
+
+        with self.assertRaises(Exception):
+            JobServer(self.socket_path, github_helper=self.github_helper)
+        assert server.socket.fileno() != -1
+
+    def test_unreachable_daemon(self):
+        with self.assertRaises(Exception):
+            submit_job(self.socket_path, JOB, timeout=1)
+
+    @patch('jenkins.pull_request_creator.submit_job')
+    def test_creator_submits_to_daemon(self, submit_job_mock):
+        submit_job_mock.return_value = {
+            'repo_root': '/repo', 'status': 'created', 'pr_url': 'https://github.com/openedx/repo/pull/3',
+            'error': None, 'duration': 1.5, 'queued': 0.1,
+        }
+        repo_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, repo_root)
+        args = [
+            '--repo-root', repo_root, '--base-branch-name', 'upgrade', '--commit-message', 'c',
+            '--pr-title', 't', '--pr-body', 'b', '--team-reviewers', 'arch', '--daemon-socket', self.socket_path,
+            '--output-pr-url-for-github-action',
+        ]
+        result = CliRunner().invoke(creator_main, args)
+
+        assert result.exit_code == 0, result.output
+        assert '::set-output name=generated_pr::https://github.com/openedx/repo/pull/3' in result.output
+        socket_path, job = submit_job_mock.call_args.args
+        assert socket_path == self.socket_path
+        assert job['repo_root'] == os.path.abspath(repo_root)
+        assert job['team_reviewers'] == 'arch'
+        assert job['delete_old_pull_requests'] is True
+
+        submit_job_mock.return_value = dict(submit_job_mock.return_value, status='failed', error='boom')
+        result = CliRunner().invoke(creator_main, args)
+        assert result.exit_code != 0
+        assert 'boom' in str(result.exception)
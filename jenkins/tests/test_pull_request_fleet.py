@@ -0,0 +1,82 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring
+import json
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from jenkins.pull_request_fleet import format_results, load_manifest, run_fleet
+
+
+class PullRequestFleetTestCase(TestCase):
+
+    def _write_manifest(self, manifest):
+        """
+        Write a manifest to a temporary file and return its path.
+        """
+        handle, manifest_path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(handle, 'w') as manifest_file:
+            json.dump(manifest, manifest_file)
+        self.addCleanup(os.remove, manifest_path)
+        return manifest_path
+
+    def _jobs(self, *repo_roots):
+        return load_manifest(self._write_manifest({
+            'defaults': {
+                'branch_name': 'upgrade-python-requirements',
+                'commit_message': 'chore: upgrade',
+                'pr_title': 'Python Requirements Update',
+                'pr_body': 'make upgrade PR',
+            },
+            'repos': [{'repo_root': repo_root} for repo_root in repo_roots],
+        }))
+
+    def test_load_manifest_merges_defaults(self):
+        manifest_path = self._write_manifest({
+            'defaults': {'branch_name': 'upgrade', 'commit_message': 'c', 'pr_title': 't', 'pr_body': 'b'},
+            'repos': [{'repo_root': 'one'}, {'repo_root': 'two', 'team_reviewers': 'arch-bom'}],
+        })
+        jobs = load_manifest(manifest_path)
+        assert [job['repo_root'] for job in jobs] == ['one', 'two']
+        assert jobs[0]['branch_name'] == 'upgrade'
+        assert 'team_reviewers' not in jobs[0]
+        assert jobs[1]['team_reviewers'] == 'arch-bom'
+
+    def test_load_manifest_rejects_unknown_and_missing_options(self):
+        with self.assertRaises(Exception):
+            load_manifest(self._write_manifest({'repos': [{'repo_root': 'one', 'branch': 'typo'}]}))
+        with self.assertRaises(Exception):
+            load_manifest(self._write_manifest({'repos': [{'repo_root': 'one'}]}))
+
+    @patch('jenkins.pull_request_fleet.PullRequestCreator')
+    def test_run_fleet_reports_each_repo(self, creator_mock):
+        """
+        A failing repository is reported without stopping the others.
+        """
+        def create(**kwargs):  # pylint: disable=unused-argument
+            repo_root = creator_mock.call_args.kwargs['repo_root']
+            if repo_root == 'broken':
+                raise Exception("boom")
+            if repo_root == 'unchanged':
+                return None
+            return Mock(number=7)
+
+        creator_mock.return_value.create.side_effect = create
+        creator_mock.return_value.repository.full_name = 'openedx/created'
+        github_helper = Mock()
+
+        # A single worker keeps creator_mock.call_args in step with create()
+        results = run_fleet(self._jobs('created', 'broken', 'unchanged'), github_helper=github_helper, max_workers=1)
+
+        assert [result.status for result in results] == ['created', 'failed', 'unchanged']
+        assert results[0].pr_url == 'https://github.com/openedx/created/pull/7'
+        assert results[1].error == 'boom'
+        for call in creator_mock.call_args_list:
+            assert call.kwargs['github_helper'] is github_helper
+        creator_mock.return_value.create.assert_called_with(
+            delete_old_pull_requests=True, untracked_files_required=False
+        )
+
+        table = format_results(results)
+        assert 'openedx/created/pull/7' in table
+        assert 'boom' in table
@@ -0,0 +1,153 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+
+from jenkins.rate_limit import (PRIORITY_HIGH, PRIORITY_LOW, GitHubHTTPAdapter,
+                                RateLimitScheduler, is_content_creating,
+                                rate_limit_resource, request_priority)
+from jenkins.tests.test_http_cache import make_response
+
+
+class RateLimitSchedulerTestCase(TestCase):
+
+    def test_rate_limit_resource(self):
+        assert rate_limit_resource('https://api.github.com/repos/o/r/pulls') == 'core'
+        assert rate_limit_resource('https://api.github.com/search/issues?q=x') == 'search'
+        assert rate_limit_resource('https://api.github.com/graphql') == 'graphql'
+
+    def test_update_tunes_bucket_from_headers(self):
+        scheduler = RateLimitScheduler(burst=10, reserve=50)
+        scheduler.update('core', {'X-RateLimit-Remaining': '1050', 'X-RateLimit-Reset': str(time.time() + 100)})
+        bucket = scheduler._bucket('core')  # pylint: disable=protected-access
+        assert 9 <= bucket.rate <= 10.5
+        assert bucket.blocked_until == 0
+
+        scheduler.update('core', {'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': str(time.time() + 100)})
+        assert bucket.tokens == 0
+        assert bucket.blocked_until > time.monotonic() + 90
+
+    def test_small_limits_keep_a_small_reserve(self):
+        scheduler = RateLimitScheduler(burst=10, reserve=50)
+        search_headers = {'X-RateLimit-Limit': '30', 'X-RateLimit-Remaining': '29',
+                          'X-RateLimit-Reset': str(time.time() + 60), 'X-RateLimit-Resource': 'search'}
+        scheduler.update('search', search_headers)
+        start = time.monotonic()
+        scheduler.acquire('search')
+        scheduler.acquire('search')
+        assert time.monotonic() - start < 0.5
+        bucket = scheduler._bucket('search')  # pylint: disable=protected-access
+        assert bucket.rate > 0
+        assert bucket.blocked_until == 0
+
+    def test_exhausted_bucket_waits_for_reset_and_recovers(self):
+        scheduler = RateLimitScheduler(burst=10, reserve=50)
+        scheduler.update('search', {'X-RateLimit-Limit': '30', 'X-RateLimit-Remaining': '0',
+                                    'X-RateLimit-Reset': str(time.time() - 1)})
+        bucket = scheduler._bucket('search')  # pylint: disable=protected-access
+        assert bucket.rate == 0
+        # The window ends within a second, as the reset is rounded up to one.
+        start = time.monotonic()
+        scheduler.acquire('search')
+        scheduler.acquire('search')
+        assert 0.5 < time.monotonic() - start < 3
+        assert bucket.tokens >= 1
+
+    def test_throttled_resource_does_not_hold_up_others(self):
+        scheduler = RateLimitScheduler()
+        scheduler.block('search', 1)
+        searcher = threading.Thread(target=scheduler.acquire, args=('search',))
+        searcher.start()
+        time.sleep(0.05)
+        start = time.monotonic()
+        scheduler.acquire('core')
+        assert time.monotonic() - start < 0.2
+        searcher.join()
+
+    def test_is_content_creating(self):
+        assert is_content_creating('POST', 'https://api.github.com/repos/o/r/pulls')
+        assert is_content_creating('POST', 'https://api.github.com/repos/o/r/issues/1/comments')
+        assert is_content_creating('POST', 'https://api.github.com/repos/o/r/pulls/1/requested_reviewers')
+        assert is_content_creating('POST', 'https://api.github.com/graphql', b'{"query": "mutation { x }"}')
+        assert not is_content_creating('POST', 'https://api.github.com/graphql', b'{"query": "query { x }"}')
+        assert not is_content_creating('POST', 'https://api.github.com/repos/o/r/git/blobs')
+        assert not is_content_creating('PATCH', 'https://api.github.com/repos/o/r/pulls/1')
+        assert not is_content_creating('GET', 'https://api.github.com/repos/o/r/pulls')
+
+    def test_remaining_budget_can_be_spent_at_once(self):
+        scheduler = RateLimitScheduler(burst=10, reserve=50)
+        scheduler.update('core', {'X-RateLimit-Remaining': '1000', 'X-RateLimit-Reset': str(time.time() + 3600)})
+        start = time.monotonic()
+        for _ in range(100):
+            scheduler.acquire()
+        assert time.monotonic() - start < 0.5
+
+    def test_writes_are_spaced_out(self):
+        scheduler = RateLimitScheduler(min_write_interval=0.05)
+        start = time.monotonic()
+        scheduler.acquire(is_write=True)
+        scheduler.acquire()
+        assert time.monotonic() - start < 0.05
+        scheduler.acquire(is_write=True)
+        assert time.monotonic() - start >= 0.05
+
+    def test_waiting_requests_are_served_by_priority(self):
+        scheduler = RateLimitScheduler()
+        scheduler.block('core', 0.2)
+        order = []
+
+        def request(priority, name):
+            with request_priority(priority):
+                scheduler.acquire('core')
+            order.append(name)
+
+        threads = []
+        for priority, name in ((PRIORITY_LOW, 'comment'), (PRIORITY_LOW, 'label'), (PRIORITY_HIGH, 'pull')):
+            thread = threading.Thread(target=request, args=(priority, name))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.02)
+        for thread in threads:
+            thread.join()
+        assert order == ['pull', 'comment', 'label']
+
+    def test_backoff_delay(self):
+        scheduler = RateLimitScheduler()
+        assert scheduler.backoff_delay(make_response(200), 0) is None
+        assert scheduler.backoff_delay(make_response(403, b'Must have admin rights'), 0) is None
+        assert scheduler.backoff_delay(make_response(403, headers={'Retry-After': '7'}), 0) == 7
+        assert scheduler.backoff_delay(make_response(429), 1) == 120
+        secondary = make_response(403, b'{"message": "You have exceeded a secondary rate limit."}')
+        assert scheduler.backoff_delay(secondary, 0) == 60
+        exhausted = make_response(
+            403, headers={'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(time.time() + 30)}
+        )
+        assert 28 <= scheduler.backoff_delay(exhausted, 0) <= 30
+
+
+class GitHubHTTPAdapterTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.session = requests.Session()
+        self.session.mount('https://', GitHubHTTPAdapter(scheduler=RateLimitScheduler(min_write_interval=0)))
+
+    @patch('requests.adapters.HTTPAdapter.send')
+    def test_retries_after_secondary_rate_limit(self, send_mock):
+        send_mock.side_effect = [
+            make_response(403, b'secondary rate limit', {'Retry-After': '0.01'}),
+            make_response(201, b'{"number": 1}'),
+        ]
+        response = self.session.post('https://api.github.com/repos/o/r/pulls', data=b'{}')
+        assert response.status_code == 201
+        assert send_mock.call_count == 2
+
+    @patch('requests.adapters.HTTPAdapter.send')
+    def test_does_not_resend_streamed_bodies(self, send_mock):
+        send_mock.return_value = make_response(429, headers={'Retry-After': '0.01'})
+        response = self.session.post('https://api.github.com/repos/o/r/git/blobs', data=iter([b'{}']))
+        assert response.status_code == 429
+        assert send_mock.call_count == 1
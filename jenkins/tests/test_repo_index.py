@@ -0,0 +1,89 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from jenkins.github_helpers import GitHubHelper
+from jenkins.repo_index import RepoIndex
+
+
+def github_with_repos(*full_names):
+    """
+    Return a mock Github instance whose user can see the given repositories.
+    """
+    github_instance = Mock()
+    github_instance.get_user.return_value.get_repos.return_value = [
+        Mock(full_name=full_name) for full_name in full_names
+    ]
+    return github_instance
+
+
+class RepoIndexTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_dir)
+        self.index_path = os.path.join(index_dir, 'repo-index.json')
+
+    def test_lookup_builds_and_persists_index(self):
+        github_instance = github_with_repos('openedx/edx-platform', 'openedx/testeng-ci', 'edx/testeng-ci')
+        index = RepoIndex(github_instance, self.index_path)
+
+        assert index.lookup('edx-platform') == 'openedx/edx-platform'
+        assert index.lookup('OpenEdx/Testeng-CI') == 'openedx/testeng-ci'
+        assert index.lookup('unknown') is None
+        with self.assertRaises(Exception):
+            index.lookup('testeng-ci')
+        assert github_instance.get_user.call_count == 1
+
+        # A fresh index loaded from disk needs no API calls at all.
+        other_github_instance = github_with_repos()
+        warm_index = RepoIndex(other_github_instance, self.index_path)
+        assert warm_index.lookup('edx-platform') == 'openedx/edx-platform'
+        assert not other_github_instance.get_user.called
+
+    def test_full_name_lookup_does_not_wait_for_cold_index(self):
+        github_instance = github_with_repos('openedx/edx-platform')
+        index = RepoIndex(github_instance, self.index_path)
+        with patch.object(index, 'refresh_in_background') as refresh_mock:
+            assert index.lookup('openedx/edx-platform') is None
+        assert refresh_mock.called
+        assert not github_instance.get_user.called
+
+    def test_stale_index_refreshes_in_background(self):
+        with open(self.index_path, 'w') as index_file:
+            json.dump({'built_at': time.time() - 10, 'full_names': ['openedx/old-repo']}, index_file)
+        github_instance = github_with_repos('openedx/new-repo')
+        index = RepoIndex(github_instance, self.index_path, ttl=1)
+
+        assert index.lookup('old-repo') == 'openedx/old-repo'
+        index._refresh_thread.join()  # pylint: disable=protected-access
+        assert index.lookup('new-repo') == 'openedx/new-repo'
+        assert not index.is_stale
+
+    def test_malformed_index_is_rebuilt(self):
+        for contents in ({'full_names': ['openedx/old-repo']}, {'built_at': 'yesterday', 'full_names': []},
+                         {'built_at': 1, 'full_names': 5}, ['openedx/old-repo'], None):
+            with open(self.index_path, 'w') as index_file:
+                json.dump(contents, index_file)
+            index = RepoIndex(github_with_repos('openedx/new-repo'), self.index_path)
+            assert index.is_stale, contents
+            assert index.lookup('new-repo') == 'openedx/new-repo'
+
+    def test_connect_to_repo(self):
+        github_instance = github_with_repos('openedx/edx-platform')
+        with patch.dict(os.environ, {'GITHUB_REPO_INDEX_DIR': os.path.dirname(self.index_path)}):
+            helper = GitHubHelper()
+            helper.connect_to_repo(github_instance, 'edx-platform')
+            github_instance.get_repo.assert_called_with('openedx/edx-platform', lazy=True)
+
+            helper.connect_to_repo(github_instance, 'openedx/not-indexed')
+            github_instance.get_repo.assert_called_with('openedx/not-indexed')
+
+            with self.assertRaises(Exception):
+                helper.connect_to_repo(github_instance, 'not-indexed')
@@ -0,0 +1,126 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring
+import random
+import re
+from unittest import TestCase
+from unittest.mock import patch
+
+from packaging.version import VERSION_PATTERN, Version
+
+from jenkins import requirement_line
+from jenkins.benchmarks.synthetic import make_adversarial_lines
+from jenkins.requirement_line import match_requirement_line
+
+PEP440_VERSION = re.compile(VERSION_PATTERN, re.VERBOSE | re.IGNORECASE)
+VERSION_ALPHABET = '0123456789.!+-_abcdeprvostlwiRCAVPD'
+
+
+def random_valid_version(rng):
+    """
+    Build a random version out of the pieces PEP 440 allows, in their various spellings.
+    """
+    def separator():
+        return rng.choice(['', '.', '-', '_'])
+
+    def number():
+        return rng.choice(['', str(rng.randint(0, 99))])
+
+    version = rng.choice(['', 'v', 'V'])
+    if rng.random() < 0.2:
+        version += '{}!'.format(rng.randint(0, 9))
+    version += '.'.join(str(rng.randint(0, 2030)) for _ in range(rng.randint(1, 5)))
+    if rng.random() < 0.4:
+        label = rng.choice(['a', 'b', 'c', 'rc', 'alpha', 'beta', 'pre', 'preview', 'RC', 'Alpha'])
+        version += separator() + label + separator() + number()
+    if rng.random() < 0.2:
+        version += '-{}'.format(rng.randint(0, 9))
+    elif rng.random() < 0.3:
+        version += separator() + rng.choice(['post', 'rev', 'r', 'POST']) + separator() + number()
+    if rng.random() < 0.3:
+        version += separator() + rng.choice(['dev', 'DEV']) + separator() + number()
+    if rng.random() < 0.2:
+        version += '+' + rng.choice(['-', '.', '_']).join(
+            rng.choice(['ubuntu', '1', 'abc123', 'Local']) for _ in range(rng.randint(1, 3))
+        )
+    return version
+
+
+class CountingPattern:
+    """
+    Stand-in for a compiled pattern that counts the characters its matches look at.
+    """
+
+    def __init__(self, pattern, counter):
+        self.pattern = pattern
+        self.counter = counter
+
+    def match(self, line, position):
+        """
+        Match as the pattern would, counting every character consumed plus the one that stopped it.
+        """
+        match = self.pattern.match(line, position)
+        self.counter['steps'] += match.end() - position + 1
+        return match
+
+
+class MatchRequirementLineTestCase(TestCase):
+
+    def test_pins(self):
+        assert match_requirement_line('+six==1.16.0') == ('+', 'six', '1.16.0')
+        assert match_requirement_line('-zope.interface==5.4.0\r\n') == ('-', 'zope.interface', '5.4.0')
+        assert match_requirement_line('+celery[redis]==5.2.7') == ('+', 'celery[redis]', '5.2.7')
+        assert match_requirement_line('+Django[argon2, bcrypt] == 4.2.1 ; python_version >= "3.8"') == \
+            ('+', 'Django[argon2,bcrypt]', '4.2.1')
+        assert match_requirement_line('+boto3==1.0rc1') == ('+', 'boto3', '1.0rc1')
+        assert match_requirement_line('+pytz==2023.3.post1    # via django') == ('+', 'pytz', '2023.3.post1')
+        assert match_requirement_line('+x==1!2.0.post3.dev4+ubuntu-1.2 \\') == ('+', 'x', '1!2.0.post3.dev4+ubuntu-1.2')
+        assert match_requirement_line('+x==2 --hash=sha256:abc') == ('+', 'x', '2')
+
+    def test_not_pins(self):
+        for line in (
+            '+++ b/requirements/base.txt',
+            '--- a/requirements/base.txt',
+            '+    # via six',
+            ' six==1.16.0',
+            '-e git+https://github.com/openedx/edx-lint.git',
+            '-r requirements/base.in',
+            '+six>=1.16.0',
+            '+six===1.16.0',
+            '+six==1.16.*',
+            '+six==1.16.0abc',
+            '+six==1.16.0 and more',
+            '+six-==1.16.0',
+            '+six[redis==1.16.0',
+            '+six==',
+            '+six==1.',
+            '',
+        ):
+            assert match_requirement_line(line) is None, line
+
+    def test_fuzz_random_versions_agree_with_packaging(self):
+        rng = random.Random(0)
+        for _ in range(20000):
+            version = ''.join(rng.choice(VERSION_ALPHABET) for _ in range(rng.randint(1, 12)))
+            match = match_requirement_line('+pkg==' + version)
+            accepted = match is not None and match[2] == version
+            assert accepted == bool(PEP440_VERSION.fullmatch(version)), version
+
+    def test_fuzz_valid_versions_are_matched(self):
+        rng = random.Random(0)
+        for _ in range(5000):
+            version = random_valid_version(rng)
+            assert match_requirement_line('-pkg==' + version) == ('-', 'pkg', version), version
+            Version(version)
+
+    def test_adversarial_lines_take_linear_time(self):
+        # Count the work instead of timing it, so that the bound holds however busy the machine is.
+        # The scanning is all done by the module's patterns; run.py has the timings.
+        patterns = ('DIGITS', 'RELEASE_CHARS', 'SPACES', 'NAME_CHARS', 'ALNUM_CHARS', 'EXTRAS_CHARS')
+        for length in (1000, 20000):
+            for name, line in make_adversarial_lines(length):
+                counter = {'steps': 0}
+                counting = {
+                    pattern: CountingPattern(getattr(requirement_line, pattern), counter) for pattern in patterns
+                }
+                with patch.multiple(requirement_line, **counting):
+                    match_requirement_line(line)
+                assert counter['steps'] <= 3 * len(line), (name, length, counter['steps'])
@@ -0,0 +1,63 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring
+import sys
+from os import path
+from unittest import TestCase
+
+from jenkins.github_helpers import GitHubHelper
+from jenkins.requirements_diff import (RequirementChange, iter_file_diffs,
+                                       iter_requirement_changes)
+
+DIFF_PATH = path.join(path.dirname(__file__), "test_data", "diff.txt")
+
+
+class RequirementsDiffTestCase(TestCase):
+
+    def test_streamed_bytes_match_whole_text(self):
+        with open(DIFF_PATH, "r") as f:
+            from_text = GitHubHelper().compare_pr_differnce(f.read())
+        with open(DIFF_PATH, "rb") as f:
+            from_stream = GitHubHelper().compare_pr_differnce(iter(f))
+        assert from_text == from_stream
+
+    def test_changes_are_paired_and_deduplicated(self):
+        diff = [
+            "diff --git a/requirements/base.txt b/requirements/base.txt",
+            "-six==1.15.0",
+            "+six==1.16.0",
+            "+attrs==22.1.0",
+            "diff --git a/requirements/dev.txt b/requirements/dev.txt",
+            "-six==1.15.0",
+            "+six==1.16.0",
+            "-tox==3.28.0",
+        ]
+        changes = list(iter_requirement_changes(diff))
+        assert changes == [
+            RequirementChange('six', '1.15.0', '1.16.0'),
+            RequirementChange('attrs', None, '22.1.0'),
+            RequirementChange('tox', '3.28.0', None),
+        ]
+        # Names are interned, so repeated names share one string.
+        assert changes[0].name is sys.intern('six')
+
+    def test_non_requirements_files_are_ignored(self):
+        diff = [
+            b"diff --git a/setup.py b/setup.py",
+            b"+six==1.16.0",
+            b"diff --git a/requirements/base.txt b/requirements/base.txt",
+            b"+attrs==22.1.0",
+        ]
+        assert [change.name for change in iter_requirement_changes(diff)] == ['attrs']
+
+    def test_file_diffs(self):
+        files = [
+            ('requirements/base.txt', 'requirements/base.txt',
+             'six==1.15.0\nattrs==22.1.0\n', 'six==1.16.0\nattrs==22.1.0\n'),
+            ('requirements/new.txt', 'requirements/new.txt', None, 'click==8.1.3\n'),
+            ('requirements/old.txt', 'requirements/old.txt', 'tox==3.0.0\n', None),
+        ]
+        changes = sorted(iter_requirement_changes(iter_file_diffs(files)), key=lambda change: change.name)
+        assert changes == [
+            RequirementChange('click', None, '8.1.3'),
+            RequirementChange('six', '1.15.0', '1.16.0'),
+            RequirementChange('tox', '3.0.0', None),
+        ]
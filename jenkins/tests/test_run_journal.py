@@ -0,0 +1,59 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from jenkins.run_journal import RunJournal
+
+
+class RunJournalTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir)
+        self.journal_path = os.path.join(self.work_dir, 'journal', 'runs.sqlite3')
+
+    def test_record_and_forget(self):
+        journal = RunJournal()
+        key = RunJournal.run_key('edx/repo', 'refs/heads/jenkins/upgrade-1234567', 'master', 'abc')
+        assert not journal.steps(key)
+
+        journal.record(key, 'commit', 'f00')
+        journal.record(key, 'closed_pull_requests', [3, 4])
+        journal.record(key, 'branch', 'refs/heads/jenkins/upgrade-1234567')
+        assert journal.steps(key) == {
+            'commit': 'f00', 'closed_pull_requests': [3, 4], 'branch': 'refs/heads/jenkins/upgrade-1234567',
+        }
+        assert not journal.steps(RunJournal.run_key('edx/repo', 'refs/heads/jenkins/upgrade-1234567', 'main', 'abc'))
+
+        journal.forget(key)
+        assert not journal.steps(key)
+
+    def test_steps_survive_the_process(self):
+        journal = RunJournal(self.journal_path)
+        journal.record('key', 'commit', 'f00')
+        journal.close()
+
+        assert RunJournal(self.journal_path).steps('key') == {'commit': 'f00'}
+
+    def test_old_runs_are_dropped(self):
+        journal = RunJournal(self.journal_path)
+        with patch('jenkins.run_journal.time.time', return_value=1000):
+            journal.record('old', 'commit', 'f00')
+        journal.record('new', 'commit', 'ba5')
+        journal.close()
+
+        journal = RunJournal(self.journal_path, max_age=60)
+        assert not journal.steps('old')
+        assert journal.steps('new') == {'commit': 'ba5'}
+
+    def test_unusable_path_falls_back_to_memory(self):
+        blocker = os.path.join(self.work_dir, 'file')
+        with open(blocker, 'w', encoding='utf-8') as blocker_file:
+            blocker_file.write('not a directory')
+        journal = RunJournal(os.path.join(blocker, 'runs.sqlite3'))
+        journal.record('key', 'commit', 'f00')
+        assert journal.steps('key') == {'commit': 'f00'}
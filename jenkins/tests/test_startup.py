@@ -0,0 +1,66 @@
+# pylint: disable=missing-module-docstring
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+
+# Runs pull_request_creator in a fresh interpreter and reports what it cost.
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from jenkins.pull_request_creator import main
+main(sys.argv[1:], standalone_mode=False)
+print(json.dumps({
+    'seconds': time.perf_counter() - start,
+    'heavy_modules': sorted(name for name in ('git', 'github', 'packaging', 'requests') if name in sys.modules),
+}))
+"""
+
+STARTUP_BUDGET_SECONDS = 2.0
+
+
+class StartupTestCase(TestCase):
+    """
+    Guard the fast path of pull_request_creator, which CI starts thousands of times a week.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.repo_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.repo_root)
+        subprocess.run(['git', 'init', '-q'], cwd=self.repo_root, check=True)
+        with open(os.path.join(self.repo_root, 'README'), 'w', encoding='utf-8') as readme:
+            readme.write('readme')
+        subprocess.run(['git', 'add', '.'], cwd=self.repo_root, check=True)
+        subprocess.run(
+            ['git', '-c', 'user.name=Test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', 'base'],
+            cwd=self.repo_root, check=True,
+        )
+
+    def run_creator(self, *args):
+        """
+        Run the CLI in a new interpreter, without GitHub credentials, and return its report.
+        """
+        env = dict(os.environ)
+        env.pop('GITHUB_TOKEN', None)
+        package_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        result = subprocess.run(
+            [sys.executable, '-c', STARTUP_SCRIPT, *args],
+            cwd=package_root, env=env, check=True, capture_output=True, text=True,
+        )
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def test_no_changes_skips_heavy_imports(self):
+        report = self.run_creator(
+            '--repo-root', self.repo_root, '--base-branch-name', 'upgrade', '--commit-message', 'message',
+            '--pr-title', 'title', '--pr-body', 'body',
+        )
+        assert not report['heavy_modules'], report
+        assert report['seconds'] < STARTUP_BUDGET_SECONDS, report
+
+    def test_help_skips_heavy_imports(self):
+        report = self.run_creator('--help')
+        assert not report['heavy_modules'], report
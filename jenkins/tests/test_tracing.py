@@ -0,0 +1,102 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring
+import json
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+
+from jenkins.rate_limit import GitHubHTTPAdapter, RateLimitScheduler
+from jenkins.tests.test_http_cache import make_response
+from jenkins.tracing import API, GIT, PHASE, WAIT, Tracer, tracer
+
+
+class TracerTestCase(TestCase):
+
+    def test_disabled_tracer_records_nothing(self):
+        disabled = Tracer()
+        with disabled.phase('discover'):
+            with disabled.span(API, 'GET /user') as span:
+                span['status'] = 200
+        assert not disabled.spans
+
+    def test_nested_phases_are_not_counted_twice(self):
+        enabled = Tracer()
+        enabled.enable()
+        start = time.perf_counter()
+        with enabled.phase('pr'):
+            time.sleep(0.05)
+            with enabled.phase('verify'):
+                time.sleep(0.1)
+        wall_seconds = time.perf_counter() - start
+
+        summary = enabled.summarize()
+        assert summary['verify']['seconds'] >= 0.1
+        assert 0.05 <= summary['pr']['seconds'] < 0.1
+        assert summary['pr']['seconds'] + summary['verify']['seconds'] <= wall_seconds
+
+    def test_spans_are_tagged_with_their_phase(self):
+        enabled = Tracer()
+        enabled.enable()
+        with enabled.span(GIT, 'status'):
+            pass
+        with enabled.phase('upload'):
+            with enabled.span(API, 'POST /repos/o/r/git/blobs', bytes_sent=10) as span:
+                span.update(status=201, bytes_received=50, cache='MISS')
+            with enabled.span(WAIT, 'checks'):
+                pass
+
+        kinds = [(span['kind'], span['phase']) for span in enabled.spans]
+        assert kinds == [(GIT, None), (API, 'upload'), (WAIT, 'upload'), (PHASE, 'upload')]
+        assert enabled.spans[1]['status'] == 201
+
+        summary = enabled.summarize()
+        assert summary['other']['git_calls'] == 1
+        assert summary['upload']['api_calls'] == 1
+        assert summary['upload']['bytes_sent'] == 10
+        assert summary['upload']['bytes_received'] == 50
+        assert summary['upload']['cache_hits'] == 0
+        assert summary['upload']['seconds'] >= summary['upload']['api_seconds']
+
+        document = json.loads(enabled.to_json())
+        assert len(document['spans']) == 4
+        assert set(document['summary']) == {'other', 'upload'}
+        table = enabled.format_summary().splitlines()
+        assert table[0].startswith('PHASE')
+        assert len(table) == 3
+
+    def test_enable_discards_earlier_spans(self):
+        enabled = Tracer()
+        enabled.enable()
+        with enabled.span(GIT, 'status'):
+            pass
+        enabled.enable()
+        assert not enabled.spans
+
+
+class GitHubHTTPAdapterTracingTestCase(TestCase):
+
+    def setUp(self):
+        self.session = requests.Session()
+        self.session.mount('https://', GitHubHTTPAdapter(scheduler=RateLimitScheduler(min_write_interval=0)))
+        tracer.enable()
+        self.addCleanup(setattr, tracer, 'enabled', False)
+
+    @patch('requests.adapters.HTTPAdapter.send')
+    def test_every_attempt_is_traced(self, send_mock):
+        send_mock.side_effect = [
+            make_response(403, b'secondary rate limit', {'Retry-After': '0.01'}),
+            make_response(201, b'{"number": 1}', {'X-RateLimit-Remaining': '4999'}),
+        ]
+        with tracer.phase('pr'):
+            self.session.post('https://api.github.com/repos/o/r/pulls', data=b'{}')
+
+        api_spans = [span for span in tracer.spans if span['kind'] == API]
+        assert [span['attempt'] for span in api_spans] == [0, 1]
+        assert [span['status'] for span in api_spans] == [403, 201]
+        assert api_spans[1]['name'] == 'POST /repos/o/r/pulls'
+        assert api_spans[1]['phase'] == 'pr'
+        assert api_spans[1]['bytes_sent'] == 2
+        assert api_spans[1]['bytes_received'] == len(b'{"number": 1}')
+        assert api_spans[1]['rate_limit_remaining'] == '4999'
+        assert tracer.summarize()['pr']['api_calls'] == 2
@@ -0,0 +1,95 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring
+import json
+import os
+import tempfile
+from os import path
+from unittest import TestCase
+
+from jenkins.requirements_diff import RequirementChange
+from jenkins.upgrade_policy import (DOWNGRADE, MAJOR, NEW, REMOVED, UNCHANGED,
+                                    UpgradePolicy, parse_version)
+
+DIFF_PATH = path.join(path.dirname(__file__), "test_data", "diff.txt")
+
+
+class UpgradePolicyTestCase(TestCase):
+
+    def test_default_rules(self):
+        policy = UpgradePolicy()
+        assert policy.reason(RequirementChange('six', '1.15.0', '1.16.0')) is None
+        assert policy.reason(RequirementChange('six', '1.16.0', '1.16.0')) == UNCHANGED
+        assert policy.reason(RequirementChange('django', '3.2', '4.0')) == MAJOR
+        assert policy.reason(RequirementChange('six', '1.16.0', '1.15.0')) == DOWNGRADE
+        assert policy.reason(RequirementChange('attrs', None, '22.1.0')) == NEW
+        assert policy.reason(RequirementChange('attrs', '22.1.0', None)) == REMOVED
+        assert policy.reason(RequirementChange('pkg', '0.3.0', '0.4.0')) is None
+
+    def test_package_rules(self):
+        policy = UpgradePolicy(
+            default={'zero_major_minor_is_major': True},
+            packages={
+                'boto3': {'allow_major': True},
+                'edx-*': {'allow_new': True, 'allow_major': True},
+                'edx-lint': {},
+            },
+        )
+        assert policy.reason(RequirementChange('boto3', '1.0.0', '2.0.0')) is None
+        assert policy.reason(RequirementChange('botocore', '1.0.0', '2.0.0')) == MAJOR
+        assert policy.reason(RequirementChange('pkg', '0.3.0', '0.4.0')) == MAJOR
+        assert policy.reason(RequirementChange('pkg', '0.3.0', '0.3.1')) is None
+        # Names are normalized before matching.
+        assert policy.reason(RequirementChange('Edx_Opaque.Keys', None, '2.3.0')) is None
+        # Pins with extras follow the rules of the package.
+        assert policy.reason(RequirementChange('boto3[crt]', '1.0.0', '2.0.0')) is None
+        assert policy.reason(RequirementChange('edx-lint[extra]', None, '5.3.0')) == NEW
+        # An exact name wins over a pattern.
+        assert policy.reason(RequirementChange('edx-lint', None, '5.3.0')) == NEW
+
+    def test_extras_pins_in_a_diff(self):
+        diff = (
+            'diff --git a/requirements/base.txt b/requirements/base.txt\n'
+            '-celery[redis]==4.4.7\n'
+            '+celery[redis]==5.2.7\n'
+        )
+        assert UpgradePolicy().classify_diff(diff)[1][0].reason == MAJOR
+        valid, suspicious = UpgradePolicy(packages={'celery': {'allow_major': True}}).classify_diff(diff)
+        assert [req.name for req in valid] == ['celery[redis]']
+        assert not suspicious
+
+    def test_unknown_rules_are_rejected(self):
+        with self.assertRaises(Exception):
+            UpgradePolicy(packages={'boto3': {'allow_majr': True}})
+
+    def test_load(self):
+        handle, policy_path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(handle, 'w') as policy_file:
+            json.dump({'packages': {'tox': {'allow_major': True}}}, policy_file)
+        self.addCleanup(os.remove, policy_path)
+
+        policy = UpgradePolicy.load(policy_path)
+        assert policy.reason(RequirementChange('tox', '3.0.0', '4.0.0')) is None
+        assert UpgradePolicy.load(None).reason(RequirementChange('tox', '3.0.0', '4.0.0')) == MAJOR
+        with self.assertRaises(Exception):
+            UpgradePolicy.load(policy_path + '.missing')
+
+    def test_classify_diffs(self):
+        with open(DIFF_PATH, "r") as f:
+            diff = f.read()
+        policy = UpgradePolicy(packages={'tox': {'allow_major': True}})
+        results = policy.classify_diffs([diff, '', diff.encode('utf-8').splitlines()])
+
+        assert results[1] == ([], [])
+        assert results[0] == results[2]
+        valid, suspicious = results[0]
+        assert 'tox' in [req.name for req in valid]
+        assert 'tox' not in [req.name for req in suspicious]
+        assert all(req.reason for req in suspicious)
+
+    def test_versions_are_parsed_once(self):
+        parse_version.cache_clear()
+        policy = UpgradePolicy()
+        for _ in range(3):
+            policy.reason(RequirementChange('six', '1.15.0', '1.16.0'))
+        info = parse_version.cache_info()
+        assert info.misses == 2
+        assert info.hits == 4
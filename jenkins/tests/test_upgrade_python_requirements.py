@@ -1,10 +1,16 @@
 # pylint: disable=missing-module-docstring,unused-argument
+import os
+import shutil
+import subprocess
+import tempfile
 from os import path
 from unittest import TestCase
 from unittest.mock import Mock, patch
 
+from jenkins.git_changes import get_working_tree_changes
 from jenkins.github_helpers import GitHubHelper
 from jenkins.pull_request_creator import PullRequestCreator
+from jenkins.requirements_diff import RequirementChange
 
 
 class UpgradePythonRequirementsPullRequestTestCase(TestCase):
@@ -12,14 +18,24 @@ class UpgradePythonRequirementsPullRequestTestCase(TestCase):
     Test Case class for PR creator.
     """
 
+    def setUp(self):
+        super().setUp()
+        # No open pull request proposes the same content, unless a test says otherwise.
+        patcher = patch(
+            'jenkins.pull_request_creator.PullRequestCreator.github_helper.find_pull_request_by_fingerprint',
+            return_value=None
+        )
+        self.find_by_fingerprint_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.close_existing_pull_requests',
            return_value=[])
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_github_instance', return_value=None)
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.repo_from_remote', return_value=None)
-    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_updated_files_list', return_value=None)
+    @patch('jenkins.pull_request_creator.get_working_tree_changes', return_value=None)
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_current_commit', return_value='1234567')
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.branch_exists', return_value=None)
-    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.update_list_of_files', return_value=None)
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.update_list_of_files', return_value='abc1234')
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.create_pull_request')
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.create_branch', return_value=None)
     @patch('jenkins.pull_request_creator.PullRequestCreator._get_user',
@@ -37,8 +53,9 @@ class UpgradePythonRequirementsPullRequestTestCase(TestCase):
                                                   'make upgrade PR')
         pull_request_creator.create(True)
 
-        assert authenticate_mock.called
-        assert repo_mock.called
+        # Nothing to commit, so GitHub is never contacted.
+        assert not authenticate_mock.called
+        assert not repo_mock.called
         assert modified_list_mock.called
         assert not branch_exists_mock.called
         assert not create_branch_mock.called
@@ -50,11 +67,11 @@ class UpgradePythonRequirementsPullRequestTestCase(TestCase):
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_github_instance',
            return_value=Mock())
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.repo_from_remote', return_value=Mock())
-    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_updated_files_list',
+    @patch('jenkins.pull_request_creator.get_working_tree_changes',
            return_value=["requirements/edx/base.txt", "requirements/edx/coverage.txt"])
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_current_commit', return_value='1234567')
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.branch_exists', return_value=False)
-    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.update_list_of_files', return_value=None)
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.update_list_of_files', return_value='abc1234')
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.create_pull_request')
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.create_branch', return_value=None)
     @patch('jenkins.pull_request_creator.PullRequestCreator._get_user',
@@ -88,8 +105,8 @@ class UpgradePythonRequirementsPullRequestTestCase(TestCase):
         filepath = path.abspath(path.join(basepath, "test_data", "diff.txt"))
         with open(filepath, "r") as f:
             content = f.read().encode('utf-8')
-            with patch('requests.get') as mock_request:
-                mock_request.return_value.content = content
+            with patch('requests.Session.get') as mock_request:
+                mock_request.return_value.iter_lines.return_value = content.splitlines()
                 mock_request.return_value.status_code = 200
                 GitHubHelper().verify_upgrade_packages(create_pr_mock)
             assert create_pr_mock.create_issue_comment.called
@@ -100,12 +117,12 @@ class UpgradePythonRequirementsPullRequestTestCase(TestCase):
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_github_instance',
            return_value=Mock())
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.repo_from_remote', return_value=Mock())
-    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_updated_files_list',
+    @patch('jenkins.pull_request_creator.get_working_tree_changes',
            return_value=["requirements/edx/base.txt", "requirements/edx/coverage.txt"])
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_current_commit', return_value='1234567')
     # all above this unused params, no need to interact with those mocks
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.branch_exists', return_value=False)
-    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.update_list_of_files', return_value=None)
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.update_list_of_files', return_value='abc1234')
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.create_pull_request')
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.create_branch', return_value=None)
     @patch('builtins.print')
@@ -136,11 +153,11 @@ class UpgradePythonRequirementsPullRequestTestCase(TestCase):
            return_value=[])
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_github_instance', return_value=None)
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.repo_from_remote', return_value=None)
-    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_updated_files_list',
+    @patch('jenkins.pull_request_creator.get_working_tree_changes',
            return_value=["requirements/edx/base.txt", "requirements/edx/coverage.txt"])
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_current_commit', return_value='1234567')
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.branch_exists', return_value=True)
-    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.update_list_of_files', return_value=None)
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.update_list_of_files', return_value='abc1234')
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.create_pull_request')
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.create_branch', return_value=None)
     @patch('jenkins.pull_request_creator.PullRequestCreator._get_user',
@@ -170,12 +187,12 @@ class UpgradePythonRequirementsPullRequestTestCase(TestCase):
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_github_instance',
            return_value=Mock())
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.repo_from_remote', return_value=Mock())
-    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_updated_files_list',
+    @patch('jenkins.pull_request_creator.get_working_tree_changes',
            return_value=["requirements/edx/base.txt", "requirements/edx/coverage.txt"])
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_current_commit', return_value='1234567')
     # all above this unused params, no need to interact with those mocks
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.branch_exists', return_value=True)
-    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.update_list_of_files', return_value=None)
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.update_list_of_files', return_value='abc1234')
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.create_pull_request')
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.create_branch', return_value=None)
     @patch('jenkins.github_helpers.GitHubHelper.delete_branch', return_value=None)
@@ -197,6 +214,39 @@ class UpgradePythonRequirementsPullRequestTestCase(TestCase):
         assert update_files_mock.called
         assert create_pr_mock.called
 
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.close_existing_pull_requests',
+           return_value=[])
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_github_instance',
+           return_value=Mock())
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.repo_from_remote', return_value=Mock())
+    @patch('jenkins.pull_request_creator.get_working_tree_changes',
+           return_value=["requirements/edx/base.txt"])
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_current_commit', return_value='1234567')
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.branch_exists', return_value=True)
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.update_list_of_files', return_value=None)
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.create_pull_request')
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.create_branch', return_value=None)
+    @patch('jenkins.pull_request_creator.PullRequestCreator._get_user',
+           return_value=Mock(name="fake name", login="fake login"))
+    @patch('jenkins.github_helpers.GitHubHelper.delete_branch', return_value=None)
+    def test_identical_content(self, delete_branch_mock, get_user_mock, create_branch_mock, create_pr_mock,
+                               update_files_mock, branch_exists_mock, current_commit_mock,
+                               modified_list_mock, repo_mock, authenticate_mock,
+                               close_existing_prs_mock):
+        """
+        Ensure files that match the base tree leave the branch and old PRs alone.
+        """
+        pull_request_creator = PullRequestCreator('--repo_root=../../edx-platform', 'upgrade-branch', [],
+                                                  [], 'Upgrade python requirements', 'Update python requirements',
+                                                  'make upgrade PR')
+        assert pull_request_creator.create(True) is None
+
+        assert update_files_mock.called
+        assert not close_existing_prs_mock.called
+        assert not delete_branch_mock.called
+        assert not create_branch_mock.called
+        assert not create_pr_mock.called
+
     def test_compare_upgrade_difference_with_major_changes(self):
         basepath = path.dirname(__file__)
         filepath = path.abspath(path.join(basepath, "test_data", "diff.txt"))
@@ -204,11 +254,11 @@ class UpgradePythonRequirementsPullRequestTestCase(TestCase):
             valid, suspicious = GitHubHelper().compare_pr_differnce(f.read())
             assert sorted(
                 ['certifi', 'chardet', 'filelock', 'pip-tools', 'platformdirs', 'pylint', 'virtualenv']
-            ) == [g['name'] for g in valid]
+            ) == [g.name for g in valid]
 
             assert sorted(
                 ['cachetools', 'six', 'tox', 'pyproject-api', 'colorama', 'py', 'chardet', 'pyparsing', 'packaging']
-            ) == [g['name'] for g in suspicious]
+            ) == [g.name for g in suspicious]
 
     def test_compare_upgrade_difference_with_minor_changes(self):
         basepath = path.dirname(__file__)
@@ -217,14 +267,14 @@ class UpgradePythonRequirementsPullRequestTestCase(TestCase):
             valid, suspicious = GitHubHelper().compare_pr_differnce(f.read())
             assert sorted(
                 ['packaging']
-            ) == [g['name'] for g in valid]
+            ) == [g.name for g in valid]
 
             assert sorted(
                 []
-            ) == [g['name'] for g in suspicious]
+            ) == [g.name for g in suspicious]
 
     def test_check_automerge_variable_value(self):
-        with patch('requests.get') as mock_request:
+        with patch('requests.Session.get') as mock_request:
             mock_request.return_value.status_code = 200
             mock_request.return_value.json.return_value = {
                 'name': 'ENABLE_AUTOMERGE_FOR_DEPENDENCIES_PRS', 'value': 'True',
@@ -263,11 +313,11 @@ class UpgradePythonRequirementsPullRequestTestCase(TestCase):
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_github_instance',
            return_value=Mock())
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.repo_from_remote', return_value=Mock())
-    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_updated_files_list',
+    @patch('jenkins.pull_request_creator.get_working_tree_changes',
            return_value=["requirements/edx/base.txt", "requirements/edx/coverage.txt"])
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_current_commit', return_value='1234567')
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.branch_exists', return_value=False)
-    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.update_list_of_files', return_value=None)
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.update_list_of_files', return_value='abc1234')
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.create_pull_request')
     @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.create_branch', return_value=None)
     @patch('jenkins.pull_request_creator.PullRequestCreator._get_user',
@@ -303,8 +353,8 @@ class UpgradePythonRequirementsPullRequestTestCase(TestCase):
         filepath = path.abspath(path.join(basepath, "test_data", "minor_diff.txt"))
         with open(filepath, "r") as f:
             content = f.read().encode('utf-8')
-            with patch('requests.get') as mock_request:
-                mock_request.return_value.content = content
+            with patch('requests.Session.get') as mock_request:
+                mock_request.return_value.iter_lines.return_value = content.splitlines()
                 mock_request.return_value.status_code = 200
 
                 # in case of `check_automerge_variable_value` false value label will not added.
@@ -314,3 +364,105 @@ class UpgradePythonRequirementsPullRequestTestCase(TestCase):
                     check_automerge_variable_value.return_value = False
                     GitHubHelper().verify_upgrade_packages(create_pr_mock)
                     assert not create_pr_mock.set_labels.called
+
+    def _checkout_diff(self, diff_path):
+        """
+        Commit the old side of every file in a diff to a new repository, then write the new side over it.
+        """
+        repo_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, repo_root)
+        files = {}
+        with open(diff_path, "r") as f:
+            for line in f:
+                if line.startswith('diff --git'):
+                    old, new = files.setdefault(line.split()[-1][2:], ([], []))
+                elif line.startswith(('index ', '---', '+++', '@@')):
+                    continue
+                elif line.startswith('-'):
+                    old.append(line[1:])
+                elif line.startswith('+'):
+                    new.append(line[1:])
+                else:
+                    old.append(line[1:])
+                    new.append(line[1:])
+
+        def write_side(side):
+            for file_path, sides in files.items():
+                os.makedirs(path.join(repo_root, path.dirname(file_path)), exist_ok=True)
+                with open(path.join(repo_root, file_path), "w") as f:
+                    f.write(''.join(sides[side]))
+
+        def git(*args):
+            subprocess.run(['git', *args], cwd=repo_root, check=True)
+
+        write_side(0)
+        git('init', '-q')
+        git('add', '.')
+        git('-c', 'user.name=Test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', 'base')
+        write_side(1)
+        return repo_root
+
+    def test_local_classification_matches_pr_diff(self):
+        helper = GitHubHelper()
+        for diff_name in ("diff.txt", "minor_diff.txt"):
+            diff_path = path.abspath(path.join(path.dirname(__file__), "test_data", diff_name))
+            repo_root = self._checkout_diff(diff_path)
+            with open(diff_path, "r") as f:
+                expected = helper.compare_pr_differnce(f.read())
+
+            local = helper.classify_local_requirement_changes(repo_root, get_working_tree_changes(repo_root))
+            assert local == expected
+
+    def test_verify_upgrade_packages_with_local_classification(self):
+        create_pr_mock = Mock()
+        # pylint: disable=protected-access
+        create_pr_mock._headers = {'location': 'https://api.github.com/repos/foo/bar/pulls/1'}
+        valid = [RequirementChange('packaging', '21.0', '21.3')]
+        with patch('requests.Session.get') as mock_request, patch(
+                'jenkins.github_helpers.GitHubHelper.check_automerge_variable_value', return_value=True
+        ):
+            GitHubHelper().verify_upgrade_packages(create_pr_mock, requirement_changes=(valid, []))
+            # The diff is never downloaded.
+            assert not mock_request.called
+        create_pr_mock.set_labels.assert_called_once_with('Ready to Merge')
+        assert create_pr_mock.create_issue_comment.call_count == 1
+
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_github_instance',
+           return_value=Mock())
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.repo_from_remote', return_value=Mock())
+    @patch('jenkins.pull_request_creator.get_working_tree_changes',
+           return_value=["requirements/edx/base.txt", "requirements/edx/coverage.txt"])
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.get_current_commit', return_value='1234567')
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.branch_exists', return_value=False)
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.update_list_of_files', return_value='abc1234')
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.close_existing_pull_requests')
+    @patch('jenkins.pull_request_creator.PullRequestCreator.github_helper.create_pull_request')
+    @patch('jenkins.pull_request_creator.PullRequestCreator._get_user',
+           return_value=Mock(name="fake name", login="fake login"))
+    def test_identical_pull_request_exists(self, get_user_mock, create_pr_mock, close_existing_prs_mock,
+                                           update_files_mock, branch_exists_mock, current_commit_mock,
+                                           modified_list_mock, repo_mock, authenticate_mock):
+        """
+        Ensure nothing is pushed, closed or created when an open PR already proposes the same files.
+        """
+        self.find_by_fingerprint_mock.return_value = Mock(number=12)
+        pull_request_creator = PullRequestCreator('--repo_root=../../edx-platform', 'upgrade-branch', [],
+                                                  [], 'Upgrade python requirements', 'Update python requirements',
+                                                  'make upgrade PR')
+        assert pull_request_creator.create(True) is None
+
+        args = self.find_by_fingerprint_mock.call_args.args
+        assert args[2] == 'jenkins/upgrade-branch-'
+        assert args[3] == pull_request_creator.fingerprint
+        assert not update_files_mock.called
+        assert not close_existing_prs_mock.called
+        assert not create_pr_mock.called
+
+    def test_make_readable_string(self):
+        helper = GitHubHelper()
+        assert helper.make_readable_string(RequirementChange('six', '1.15.0', '1.16.0')) == \
+            "- `six` changes from `1.15.0` to `1.16.0`"
+        assert helper.make_readable_string(RequirementChange('attrs', None, '22.1.0', 'NEW')) == \
+            "- **[NEW]**  `attrs` (`22.1.0`) added to the requirements"
+        assert helper.make_readable_string(RequirementChange('tox', '3.0.0', '4.0.0', 'MAJOR')) == \
+            "- **[MAJOR]** `tox` changes from `3.0.0` to `4.0.0`"
@@ -0,0 +1,152 @@
+"""
+Record where the time of a run goes, as spans for every GitHub API call, git command and wait.
+
+Tracing is off unless ``tracer.enable()`` is called, e.g. by the ``--profile``
+option of pull_request_creator, and spans cost nothing when it is off. Spans are
+tagged with the phase of the run they happened in (discover, upload, pr, verify),
+so that the summary can show which part of a run was slow and why.
+"""
+import contextlib
+import contextvars
+import json
+import threading
+import time
+from collections import defaultdict
+
+_current_phase = contextvars.ContextVar('trace_phase', default=None)
+# Seconds spent in phases nested in the current one, e.g. verify inside pr.
+_nested_phase_seconds = contextvars.ContextVar('trace_nested_phase_seconds', default=None)
+
+API = 'api'
+GIT = 'git'
+WAIT = 'wait'
+PHASE = 'phase'
+
+
+class Tracer:
+    """
+    Collect spans from every thread of a run.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.spans = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def enable(self):
+        """
+        Start recording, discarding any earlier spans.
+        """
+        with self._lock:
+            self.spans = []
+            self._origin = time.perf_counter()
+        self.enabled = True
+
+    @contextlib.contextmanager
+    def span(self, kind, name, **attributes):
+        """
+        Record the block as a span of ``kind``.
+
+        Yields a dict of attributes that the block can add to, e.g. the status or
+        size of a response.
+        """
+        if not self.enabled:
+            yield attributes
+            return
+        start = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            duration = time.perf_counter() - start
+            record = {
+                'kind': kind,
+                'name': name,
+                'phase': _current_phase.get(),
+                'start': start - self._origin,
+                'duration': duration,
+            }
+            record.update(attributes)
+            with self._lock:
+                self.spans.append(record)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Attribute the spans recorded in this block, on this thread, to phase ``name``.
+
+        A phase started inside another one is not counted in the time of the outer
+        phase, so that the phase totals add up to the time of the run.
+        """
+        outer_nested_seconds = _nested_phase_seconds.get()
+        nested_seconds = [0.0]
+        token = _current_phase.set(name)
+        nested_token = _nested_phase_seconds.set(nested_seconds)
+        start = time.perf_counter()
+        try:
+            with self.span(PHASE, name) as attributes:
+                try:
+                    yield
+                finally:
+                    attributes['own_seconds'] = time.perf_counter() - start - nested_seconds[0]
+        finally:
+            _nested_phase_seconds.reset(nested_token)
+            _current_phase.reset(token)
+            if outer_nested_seconds is not None:
+                outer_nested_seconds[0] += time.perf_counter() - start
+
+    def summarize(self):
+        """
+        Return the totals of the recorded spans for each phase.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        summary = defaultdict(lambda: {
+            'seconds': 0.0, 'api_calls': 0, 'api_seconds': 0.0, 'git_calls': 0, 'git_seconds': 0.0,
+            'wait_seconds': 0.0, 'bytes_sent': 0, 'bytes_received': 0, 'cache_hits': 0,
+        })
+        for span in spans:
+            totals = summary[span['phase'] or 'other']
+            if span['kind'] == PHASE:
+                totals['seconds'] += span.get('own_seconds', span['duration'])
+            elif span['kind'] == API:
+                totals['api_calls'] += 1
+                totals['api_seconds'] += span['duration']
+                totals['bytes_sent'] += span.get('bytes_sent') or 0
+                totals['bytes_received'] += span.get('bytes_received') or 0
+                totals['cache_hits'] += span.get('cache') == 'HIT'
+            elif span['kind'] == GIT:
+                totals['git_calls'] += 1
+                totals['git_seconds'] += span['duration']
+            elif span['kind'] == WAIT:
+                totals['wait_seconds'] += span['duration']
+        return dict(summary)
+
+    def to_json(self):
+        """
+        Return the spans and their summary as a JSON document.
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span['start'])
+        return json.dumps({'spans': spans, 'summary': self.summarize()}, indent=2)
+
+    def format_summary(self):
+        """
+        Render the summary as a plain text table, one row per phase.
+        """
+        headers = ('PHASE', 'SECONDS', 'API CALLS', 'API SECONDS', 'GIT CALLS', 'GIT SECONDS', 'WAIT SECONDS',
+                   'SENT', 'RECEIVED', 'CACHE HITS')
+        rows = [headers]
+        for phase, totals in self.summarize().items():
+            rows.append((
+                phase, '{:.2f}'.format(totals['seconds']), totals['api_calls'], '{:.2f}'.format(totals['api_seconds']),
+                totals['git_calls'], '{:.2f}'.format(totals['git_seconds']), '{:.2f}'.format(totals['wait_seconds']),
+                totals['bytes_sent'], totals['bytes_received'], totals['cache_hits'],
+            ))
+        widths = [max(len(str(row[column])) for row in rows) for column in range(len(headers))]
+        return '\n'.join(
+            '  '.join(str(value).ljust(width) for value, width in zip(row, widths)).rstrip() for row in rows
+        )
+
+
+tracer = Tracer()
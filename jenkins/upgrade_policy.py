@@ -0,0 +1,175 @@
+"""
+Decide which requirement changes are safe to merge without a human looking at them.
+
+The default policy is the one pull requests have always been judged by: an upgrade
+within the same major version is fine, while major bumps, downgrades and added or
+removed requirements need manual review. A policy file can change those rules for
+all packages or for particular ones, e.g.::
+
+    {
+        "default": {"zero_major_minor_is_major": true},
+        "packages": {
+            "boto3": {"allow_major": true},
+            "edx-*": {"allow_new": true}
+        }
+    }
+
+Package names are normalized as in PEP 503 and may be shell style patterns. An
+exact name wins over a pattern, and earlier patterns win over later ones. Every
+version string is parsed once per process, and the rule for every package is
+looked up once per policy, so large batches of diffs are cheap to classify.
+"""
+import fnmatch
+import functools
+import io
+import json
+import re
+from operator import attrgetter
+
+from packaging.version import Version
+
+from .requirements_diff import iter_requirement_changes
+
+MAJOR = 'MAJOR'
+DOWNGRADE = 'DOWNGRADE'
+NEW = 'NEW'
+REMOVED = 'REMOVED'
+# Not a change at all, e.g. a requirement that only moved to another place in the file.
+UNCHANGED = 'UNCHANGED'
+
+# Rules and their defaults. Each one allows a kind of change that needs manual review otherwise.
+DEFAULT_RULES = {
+    'allow_major': False,
+    'allow_downgrade': False,
+    'allow_new': False,
+    'allow_removed': False,
+    # Treat a minor bump of a 0.x version as a major one, as such packages often break on them.
+    'zero_major_minor_is_major': False,
+}
+
+VERSION_CACHE_SIZE = 16384
+
+
+@functools.lru_cache(maxsize=VERSION_CACHE_SIZE)
+def parse_version(version):
+    """
+    Return the Version for ``version``, parsing each distinct string only once.
+    """
+    return Version(version)
+
+
+def normalize_name(name):
+    """
+    Normalize a package name as in PEP 503, so that e.g. ``Django_Extensions`` matches ``django-extensions``.
+    """
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+class UpgradePolicy:
+    """
+    Classify requirement changes as valid or suspicious according to a set of rules.
+    """
+
+    def __init__(self, default=None, packages=None):
+        unknown_rules = set(default or {}).union(*(rules for rules in (packages or {}).values())) - set(DEFAULT_RULES)
+        if unknown_rules:
+            raise Exception("Unknown upgrade policy rules: {}".format(sorted(unknown_rules)))
+        self.default = dict(DEFAULT_RULES, **(default or {}))
+        self.exact_rules = {}
+        patterns = []
+        for name, rules in (packages or {}).items():
+            name = normalize_name(name)
+            if any(char in name for char in '*?['):
+                patterns.append((re.compile(fnmatch.translate(name)), dict(self.default, **rules)))
+            else:
+                self.exact_rules[name] = dict(self.default, **rules)
+        self.patterns = patterns
+        self._rules_by_name = {}
+
+    @classmethod
+    def load(cls, policy_path=None):
+        """
+        Read a policy from a JSON file, or return the default policy if no path is given.
+        """
+        if not policy_path:
+            return cls()
+        try:
+            with open(policy_path, 'r', encoding='utf-8') as policy_file:
+                policy = json.load(policy_file)
+        except Exception as error:
+            raise Exception(
+                "Unable to read upgrade policy: {}".format(policy_path)
+            ) from error
+        return cls(policy.get('default'), policy.get('packages'))
+
+    def rules_for(self, name):
+        """
+        Return the rules that apply to package ``name``.
+        """
+        rules = self._rules_by_name.get(name)
+        if rules is None:
+            # Pins with extras, e.g. ``celery[redis]``, follow the rules of the package itself.
+            normalized = normalize_name(name.split('[', 1)[0])
+            rules = self.exact_rules.get(normalized)
+            if rules is None:
+                rules = next((rules for pattern, rules in self.patterns if pattern.match(normalized)), self.default)
+            self._rules_by_name[name] = rules
+        return rules
+
+    def reason(self, req):
+        """
+        Return why ``req`` needs manual review, None if it does not, or UNCHANGED.
+        """
+        rules = self.rules_for(req.name)
+        if not req.old_version:
+            return None if rules['allow_new'] else NEW
+        if not req.new_version:
+            return None if rules['allow_removed'] else REMOVED
+
+        old_version = parse_version(req.old_version)
+        new_version = parse_version(req.new_version)
+        if old_version == new_version:
+            return UNCHANGED
+        if new_version < old_version:
+            return None if rules['allow_downgrade'] else DOWNGRADE
+        is_major = new_version.major != old_version.major or (
+            rules['zero_major_minor_is_major'] and old_version.major == 0 and new_version.minor != old_version.minor
+        )
+        return MAJOR if is_major and not rules['allow_major'] else None
+
+    def classify(self, changes):
+        """
+        Split requirement changes into valid and suspicious ones.
+
+        ``changes`` holds RequirementChange records, as yielded by iter_requirement_changes.
+        Suspicious changes are returned with their ``reason`` set, and both lists are sorted by name.
+        """
+        valid_reqs = []
+        suspicious_reqs = []
+        for req in changes:
+            reason = self.reason(req)
+            if reason == UNCHANGED:
+                continue
+            if reason is None:
+                valid_reqs.append(req)
+            else:
+                suspicious_reqs.append(req._replace(reason=reason))
+        return sorted(valid_reqs, key=attrgetter('name')), sorted(suspicious_reqs, key=attrgetter('name'))
+
+    def classify_diff(self, diff):
+        """
+        Classify the requirement changes in a pull request diff.
+
+        ``diff`` is either the whole diff as a string, or an iterable of its lines.
+        """
+        if not diff:
+            return [], []
+        if isinstance(diff, str):
+            diff = io.StringIO(diff)
+        return self.classify(iter_requirement_changes(diff))
+
+    def classify_diffs(self, diffs):
+        """
+        Classify each of ``diffs`` and return the results in the same order.
+        """
+        return [self.classify_diff(diff) for diff in diffs]